@@ -4,9 +4,12 @@ import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from database import engine, Base
+from database import init_db
+from routes.admin import router as admin_router
+from routes.batches import router as batches_router
 from routes.health import router as health_router
 from routes.jobs import router as jobs_router
+from services.storage import UploadSizeLimit
 
 logging.basicConfig(
     level=logging.INFO,
@@ -24,12 +27,16 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT"],
     allow_headers=["*"],
 )
+# Reject oversized audio while it arrives, not after it is spooled.
+app.add_middleware(UploadSizeLimit, path="/jobs")
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    Base.metadata.create_all(bind=engine)
+    init_db()
 
 
 app.include_router(health_router)
 app.include_router(jobs_router)
+app.include_router(batches_router)
+app.include_router(admin_router)
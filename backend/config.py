@@ -6,6 +6,10 @@ class Settings(BaseSettings):
     redis_url: str = "redis://redis:6379/0"
     data_dir: str = "/app/data"
     coach_provider: str = "rules"
+    # SQLAlchemy pool per process; async workers hold one connection per
+    # running job, so give them at least WORKER_CONCURRENCY.
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
 
     class Config:
         env_file = ".env"
@@ -1,15 +1,79 @@
-from sqlalchemy import create_engine
+import json
+from collections.abc import Sequence
+from functools import lru_cache
+
+import redis
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 from config import settings
 
-engine = create_engine(settings.database_url)
+
+def _json_dumps(obj) -> str:
+    """json.dumps for JSON columns.
+
+    Sequences that write their own JSON (services.klangio_columnar.LazyNotes)
+    are spliced in as text, so a columnar result is stored without building
+    a dict per note. Other sequences are stored as plain JSON lists.
+    """
+    spliced: dict[str, str] = {}
+
+    def default(o):
+        if hasattr(o, "to_json"):
+            token = f"\0json:{len(spliced)}"
+            spliced[json.dumps(token)] = o.to_json()
+            return token
+        if isinstance(o, Sequence):
+            return list(o)
+        raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+    text = json.dumps(obj, default=default)
+    for token, value in spliced.items():
+        text = text.replace(token, value, 1)
+    return text
+
+
+engine = create_engine(
+    settings.database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    json_serializer=_json_dumps,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
 
+def init_db() -> None:
+    """Create tables, then add any model columns (and their indexes) missing
+    from existing tables.
+
+    There are no migrations; this keeps databases created by older versions
+    in step with models.py for additive changes (new nullable columns).
+    """
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'
+                ))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
 def get_db():
     db: Session = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> redis.Redis:
+    """Process-wide Redis client (redis-py pools connections internally)."""
+    return redis.from_url(settings.redis_url)
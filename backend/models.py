@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, String, DateTime, Text
+from sqlalchemy import BigInteger, Column, DateTime, Float, Integer, String, Text
 from sqlalchemy.dialects.postgresql import JSON
 
 from database import Base
@@ -14,6 +14,80 @@ class Job(Base):
     status = Column(String, nullable=False, default="CREATED")
     instrument = Column(String, nullable=False)
     audio_path = Column(String, nullable=False)
+    # Probed from the container headers at upload (services/audio_probe.py);
+    # the duration scales stage timeouts. Null if the file was not recognised.
+    audio_format = Column(String, nullable=True)
+    audio_duration_sec = Column(Float, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     result_json = Column(JSON, nullable=True)
     error = Column(Text, nullable=True)
+    # Per-stage ingest checkpoint (see services/checkpoint.py), so a retried
+    # job resumes instead of re-uploading to Klangio.
+    pipeline_state = Column(JSON, nullable=True)
+    # Queue routing (workers/queues.py): priority lane and submitting
+    # tenant, whose stages are interleaved fairly with other tenants'.
+    lane = Column(String, nullable=True)
+    tenant = Column(String, nullable=True)
+    # Bulk imports (services/bulk_ingest.py): the batch, the file's name in
+    # the archive or folder, and its content hash. A file identical to an
+    # earlier one in the batch points at that job through duplicate_of and
+    # gets a copy of its result instead of a transcription of its own.
+    batch_id = Column(String, nullable=True, index=True)
+    source_name = Column(Text, nullable=True)
+    audio_sha256 = Column(String, nullable=True)
+    duplicate_of = Column(String, nullable=True, index=True)
+    # Deduplicates repeated POST /jobs submissions (services/idempotency.py).
+    idempotency_key = Column(String, nullable=True, unique=True, index=True)
+    # Revision of result_json, bumped by every change to a READY result, and
+    # the revision the precomputed read artifacts were built from
+    # (services/precompute.py).
+    result_rev = Column(Integer, nullable=True)
+    derived_rev = Column(Integer, nullable=True)
+    # Failure handling (services/failures.py): class and pipeline stage of
+    # the last failure, automatic retries used, and when the next one runs.
+    failure_class = Column(String, nullable=True, index=True)
+    failed_stage = Column(String, nullable=True)
+    retry_count = Column(Integer, nullable=True)
+    next_retry_at = Column(DateTime, nullable=True)
+
+
+class Batch(Base):
+    __tablename__ = "batches"
+
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, nullable=False, default="INGESTING")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    instrument = Column(String, nullable=False)
+    lane = Column(String, nullable=True)
+    tenant = Column(String, nullable=True)
+    # "zip" (archive_path is the uploaded archive) or "directory"
+    # (manifest holds the server-local directory and optional file list).
+    source = Column(String, nullable=False)
+    archive_path = Column(String, nullable=True)
+    manifest = Column(JSON, nullable=True)
+    file_count = Column(Integer, nullable=False, default=0)
+    duplicate_count = Column(Integer, nullable=False, default=0)
+    # [{"name": ..., "reason": ...}] for files that were skipped.
+    rejected = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+
+class Blob(Base):
+    """A file in the content-addressed store (services/blobstore.py)."""
+    __tablename__ = "blobs"
+
+    sha256 = Column(String, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    extension = Column(String, nullable=False)  # ".wav", ".musicxml", ...
+    media_type = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class BlobRef(Base):
+    """A job's use of a blob: one row per (job, role), so the rows for a
+    blob are its reference count."""
+    __tablename__ = "blob_refs"
+
+    job_id = Column(String, primary_key=True)
+    role = Column(String, primary_key=True)  # audio, stem, xml, pdf
+    sha256 = Column(String, nullable=False, index=True)
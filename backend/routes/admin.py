@@ -0,0 +1,110 @@
+import hmac
+import logging
+import os
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Job
+from schemas.admin import RequeueRequest
+from services import blobstore
+from services.failures import CLASSES
+from workers.tasks import pipeline_active, requeue_job
+
+router = APIRouter(prefix="/admin")
+logger = logging.getLogger(__name__)
+
+# Configuration (read from environment)
+_admin_token: str | None = os.getenv("ADMIN_TOKEN")
+
+
+def _require_admin(x_admin_token: str | None = Header(None)) -> None:
+    """The X-Admin-Token header must match ADMIN_TOKEN; without ADMIN_TOKEN
+    the admin API is off."""
+    if not _admin_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled (set ADMIN_TOKEN)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, _admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+def _dead_letters(db: Session):
+    """FAILED jobs with a transcription of their own (duplicates follow theirs)."""
+    return db.query(Job).filter(Job.status == "FAILED", Job.duplicate_of.is_(None))
+
+
+@router.get("/dead-letters", dependencies=[Depends(_require_admin)])
+def list_dead_letters(
+    failure_class: str | None = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+) -> dict:
+    """Dead letters, oldest first, with counts per failure class."""
+    if failure_class is not None and failure_class not in CLASSES:
+        raise HTTPException(status_code=400, detail=f"failure_class must be one of {list(CLASSES)}")
+    counts = dict(
+        _dead_letters(db)
+        .with_entities(func.coalesce(Job.failure_class, "unclassified"), func.count(Job.id))
+        .group_by(Job.failure_class)
+        .all()
+    )
+    query = _dead_letters(db).with_entities(
+        Job.id, Job.instrument, Job.batch_id, Job.created_at, Job.failure_class,
+        Job.failed_stage, Job.retry_count, Job.error,
+    )
+    if failure_class is not None:
+        query = query.filter(Job.failure_class == failure_class)
+    rows = query.order_by(Job.created_at, Job.id).offset(offset).limit(limit).all()
+    return {
+        "counts": counts,
+        "jobs": [
+            {
+                "id": row.id,
+                "instrument": row.instrument,
+                "batch_id": row.batch_id,
+                "created_at": row.created_at.isoformat() if row.created_at else None,
+                "failure_class": row.failure_class,
+                "failed_stage": row.failed_stage,
+                "retry_count": row.retry_count or 0,
+                "error": row.error,
+            }
+            for row in rows
+        ],
+    }
+
+
+@router.post("/dead-letters/requeue", dependencies=[Depends(_require_admin)])
+def requeue_dead_letters(body: RequeueRequest, db: Session = Depends(get_db)) -> dict:
+    """Requeue dead letters, e.g. once Klangio has recovered. Each job
+    resumes from its checkpoint with the audio already stored, and gets
+    its automatic retries back."""
+    query = _dead_letters(db)
+    if body.job_ids is not None:
+        query = query.filter(Job.id.in_(body.job_ids))
+    if body.failure_class is not None:
+        query = query.filter(Job.failure_class == body.failure_class)
+    jobs = query.order_by(Job.created_at, Job.id).limit(body.limit).all()
+
+    requeued, skipped = [], []
+    for job in jobs:
+        if pipeline_active(job.id):
+            skipped.append(job.id)
+            continue
+        requeue_job(db, job)
+        requeued.append(job.id)
+    logger.info("Requeued %d dead letters (%d still being processed)", len(requeued), len(skipped))
+    return {"requeued": requeued, "skipped": skipped}
+
+
+@router.get("/blobs", dependencies=[Depends(_require_admin)])
+def blob_stats(db: Session = Depends(get_db)) -> dict:
+    """Size of the blob store and how much deduplication saves."""
+    return blobstore.stats(db)
+
+
+@router.post("/blobs/collect", dependencies=[Depends(_require_admin)])
+def collect_blobs(db: Session = Depends(get_db)) -> dict:
+    """Delete blobs no job refers to any more."""
+    return blobstore.collect(db)
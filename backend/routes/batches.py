@@ -0,0 +1,159 @@
+import logging
+import os
+import shutil
+import uuid
+import zipfile
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, Request, UploadFile
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database import get_db
+from models import Batch, Job
+from routes.jobs import _tenant_of
+from schemas.batch import ManifestBatchRequest
+from services import bulk_ingest
+from workers.queues import BATCH, LANES, enqueue_stage
+from workers.tasks import ingest_batch
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+_FINISHED = ("READY", "FAILED")
+
+
+def _batch_to_dict(batch: Batch, counts: dict[str, int] | None = None) -> dict:
+    counts = counts or {}
+    finished = sum(counts.get(s, 0) for s in _FINISHED)
+    return {
+        "id": batch.id,
+        "status": batch.status,
+        "source": batch.source,
+        "instrument": batch.instrument,
+        "lane": batch.lane,
+        "created_at": batch.created_at.isoformat() if batch.created_at else None,
+        "file_count": batch.file_count or 0,
+        "duplicate_count": batch.duplicate_count or 0,
+        "rejected": batch.rejected or [],
+        "jobs_by_status": counts,
+        # Share of imported files that are finished; more files may still
+        # arrive while the batch is INGESTING.
+        "progress": round(100 * finished / batch.file_count) if batch.file_count else 0,
+        "error": batch.error,
+    }
+
+
+def _start_ingest(db: Session, batch: Batch) -> dict:
+    db.add(batch)
+    db.commit()
+    db.refresh(batch)
+    enqueue_stage("ingest", ingest_batch, batch.id, lane=batch.lane, tenant=batch.tenant)
+    logger.info("Created batch %s (%s, instrument=%s, lane=%s, tenant=%s)",
+                batch.id, batch.source, batch.instrument, batch.lane, batch.tenant)
+    return _batch_to_dict(batch)
+
+
+@router.post("/batches")
+def create_zip_batch(
+    request: Request,
+    archive: UploadFile = File(...),
+    instrument: str = Form(...),
+    lane: str = Form(BATCH),
+    db: Session = Depends(get_db),
+) -> dict:
+    """Import every audio file in a ZIP archive. The archive is stored and
+    unpacked by a worker; poll GET /batches/{id} for progress."""
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"lane must be one of {list(LANES)}")
+    batch_id = str(uuid.uuid4())
+    batch_dir = bulk_ingest.batch_dir(batch_id)
+    os.makedirs(batch_dir, exist_ok=True)
+    archive_path = os.path.join(batch_dir, "archive.zip")
+    with open(archive_path, "wb") as f:
+        shutil.copyfileobj(archive.file, f, 1024 * 1024)
+    if not zipfile.is_zipfile(archive_path):
+        shutil.rmtree(batch_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="archive is not a ZIP file")
+
+    return _start_ingest(db, Batch(
+        id=batch_id,
+        source="zip",
+        archive_path=archive_path,
+        instrument=instrument,
+        lane=lane,
+        tenant=_tenant_of(request),
+    ))
+
+
+@router.post("/batches/manifest")
+def create_manifest_batch(
+    body: ManifestBatchRequest, request: Request, db: Session = Depends(get_db),
+) -> dict:
+    """Import audio files from a directory on the server, all of them or
+    the listed ``items``."""
+    try:
+        directory = bulk_ingest.resolve_directory(body.directory)
+    except bulk_ingest.BulkIngestError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    if body.items is not None and len(body.items) > bulk_ingest.max_files:
+        raise HTTPException(
+            status_code=400, detail=f"At most {bulk_ingest.max_files} items per batch",
+        )
+
+    return _start_ingest(db, Batch(
+        source="directory",
+        manifest={
+            "directory": directory,
+            "items": [item.model_dump(exclude_none=True) for item in body.items]
+            if body.items is not None else None,
+        },
+        instrument=body.instrument,
+        lane=body.lane,
+        tenant=_tenant_of(request),
+    ))
+
+
+@router.get("/batches/{batch_id}")
+def get_batch(batch_id: str, db: Session = Depends(get_db)) -> dict:
+    """Batch status with job counts per status, from one grouped query."""
+    batch = db.query(Batch).filter(Batch.id == batch_id).first()
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    counts = dict(
+        db.query(Job.status, func.count(Job.id))
+        .filter(Job.batch_id == batch_id)
+        .group_by(Job.status)
+        .all()
+    )
+    return _batch_to_dict(batch, counts)
+
+
+@router.get("/batches/{batch_id}/jobs")
+def list_batch_jobs(
+    batch_id: str,
+    status: str | None = Query(None),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+) -> dict:
+    """The batch's jobs in import order, optionally of one status."""
+    if not db.query(Batch.id).filter(Batch.id == batch_id).first():
+        raise HTTPException(status_code=404, detail="Batch not found")
+    query = db.query(Job.id, Job.source_name, Job.status, Job.duplicate_of, Job.error) \
+        .filter(Job.batch_id == batch_id)
+    if status:
+        query = query.filter(Job.status == status)
+    rows = query.order_by(Job.created_at, Job.id).offset(offset).limit(limit).all()
+    return {
+        "batch_id": batch_id,
+        "jobs": [
+            {
+                "id": row.id,
+                "source_name": row.source_name,
+                "status": row.status,
+                "duplicate_of": row.duplicate_of,
+                "error": row.error,
+            }
+            for row in rows
+        ],
+    }
@@ -1,4 +1,14 @@
+import logging
+
+import redis
 from fastapi import APIRouter
+from rq.utils import utcnow
+
+from services import metrics
+from services.klangio import get_governor
+from workers.queues import ALL_QUEUES, LANES, lane_of, lane_queues
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -6,3 +16,64 @@ router = APIRouter()
 @router.get("/health")
 def health() -> dict:
     return {"status": "ok"}
+
+
+def _queue_lanes() -> dict:
+    """Per priority lane: jobs queued now and how long the longest-waiting
+    queue head has been there."""
+    now = utcnow()
+    lanes = {lane: {"queued": 0, "head_wait_sec": 0.0} for lane in LANES}
+    for queue in lane_queues(ALL_QUEUES):
+        stats = lanes[lane_of(queue.name)]
+        stats["queued"] += queue.count
+        head_ids = queue.get_job_ids(0, 1)
+        head = queue.fetch_job(head_ids[0]) if head_ids else None
+        if head is not None and head.enqueued_at is not None:
+            waited = round((now - head.enqueued_at).total_seconds(), 1)
+            stats["head_wait_sec"] = max(stats["head_wait_sec"], waited)
+    return lanes
+
+
+@router.get("/metrics")
+def get_metrics() -> dict:
+    """Cluster-wide worker counters (Klangio HTTP connections, etc.), current
+    Klangio budget utilisation and queue lanes. All of these live in Redis;
+    without it the sections are empty and ``redis`` is "degraded"."""
+    redis_status = "ok"
+    try:
+        counters = metrics.read_all()
+    except redis.RedisError as exc:
+        logger.warning("Metrics counters unavailable: %s", exc)
+        counters = {}
+        redis_status = "degraded"
+    derived: dict = {}
+    lookups = counters.get("klangio.cache.hits", 0) + counters.get("klangio.cache.misses", 0)
+    if lookups:
+        derived["klangio.cache.hit_rate"] = round(counters.get("klangio.cache.hits", 0) / lookups, 4)
+    for lane in LANES:
+        dequeued = counters.get(f"queue.{lane}.dequeued", 0)
+        if dequeued:
+            derived[f"queue.{lane}.mean_wait_sec"] = round(
+                counters.get(f"queue.{lane}.wait_seconds", 0) / dequeued, 2,
+            )
+    budgets: dict = {}
+    governor = get_governor()
+    if governor is not None:
+        try:
+            budgets = governor.utilisation()
+        except redis.RedisError as exc:
+            logger.warning("Klangio budget utilisation unavailable: %s", exc)
+            redis_status = "degraded"
+    try:
+        queue_lanes = _queue_lanes()
+    except redis.RedisError as exc:
+        logger.warning("Queue lane stats unavailable: %s", exc)
+        queue_lanes = {}
+        redis_status = "degraded"
+    return {
+        "redis": redis_status,
+        "counters": counters,
+        "derived": derived,
+        "klangio_budgets": budgets,
+        "queue_lanes": queue_lanes,
+    }
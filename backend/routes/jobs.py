@@ -6,10 +6,12 @@ from datetime import datetime, timezone
 from typing import List
 
 import redis
-from rq import Queue
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException, Query
-from fastapi.responses import FileResponse, Response
+from fastapi import (
+    APIRouter, UploadFile, File, Form, Depends, Header, HTTPException, Query, Request,
+)
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 
@@ -33,11 +35,12 @@ from schemas.selection import (
 from schemas.settings import JobSettings, SettingsUpdateRequest, SettingsResponse
 from schemas.transcription import TranscriptionResult, NoteEvent, ChordEvent
 from schemas.transpose import TransposeRequest, TransposeResponse
+from services import blobstore, idempotency, job_events, precompute
 from services.analysis import compute_coverage, detect_ii_v_i
 from services.coach_factory import get_coach_provider
 from services.musicxml import cleanup_notes_for_notation, generate_musicxml
 from services.practice_pack import build_practice_pack
-from services.storage import save_audio
+from services.storage import UploadTooLarge, discard_audio, save_audio
 from services.theory import (
     PITCH_CLASS,
     SEMITONE_TO_NAME,
@@ -46,7 +49,15 @@ from services.theory import (
     semitone_interval,
     transpose_chord_symbol,
 )
-from workers.tasks import process_job
+from workers.queues import INTERACTIVE, LANES, enqueue_stage
+from workers.tasks import (
+    enqueue_pdf_fetch,
+    enqueue_precompute,
+    pipeline_active,
+    requeue_job,
+    share_result,
+    start_job,
+)
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -58,67 +69,270 @@ def _job_to_dict(job: Job, validated_result: dict | None = None) -> dict:
         "status": job.status,
         "instrument": job.instrument,
         "audio_path": job.audio_path,
+        "audio_format": job.audio_format,
+        "audio_duration_sec": job.audio_duration_sec,
         "created_at": job.created_at.isoformat() if job.created_at else None,
         "result_json": validated_result,
         "error": job.error,
+        "failure_class": job.failure_class,
+        "next_retry_at": job.next_retry_at.isoformat() if job.next_retry_at else None,
     }
 
 
+def _tenant_of(request: Request) -> str:
+    """Who submitted a request, for fair queuing: the X-Tenant-ID header
+    (set by whatever authenticates users in front of the API), else the
+    client address."""
+    tenant = request.headers.get("X-Tenant-ID")
+    if tenant:
+        return tenant
+    return request.client.host if request.client else "anonymous"
+
+
 @router.post("/jobs")
 def create_job(
+    request: Request,
+    response: Response,
     audio: UploadFile = File(...),
     instrument: str = Form(...),
+    lane: str = Form(INTERACTIVE),
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db),
 ) -> dict:
+    """Create a job and enqueue it.
+
+    A repeat of an earlier submission (same Idempotency-Key, or without one
+    the same audio and instrument) within the window returns the earlier
+    job, flagged with an ``Idempotent-Replayed: true`` header.
+    """
+    if lane not in LANES:
+        raise HTTPException(status_code=400, detail=f"lane must be one of {list(LANES)}")
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= idempotency.MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1-{idempotency.MAX_KEY_LENGTH} characters",
+        )
+    tenant = _tenant_of(request)
     job_id = str(uuid.uuid4())
-    audio_path = save_audio(job_id, audio)
+    try:
+        audio_path, audio_sha256, audio_info = save_audio(job_id, audio)
+    except UploadTooLarge as exc:
+        raise HTTPException(status_code=413, detail=str(exc))
+
+    key = idempotency.submission_key(tenant, idempotency_key, audio_sha256, instrument)
+    existing = idempotency.find(db, key) if key else None
+    if existing is None:
+        job = Job(
+            id=job_id,
+            status="CREATED",
+            instrument=instrument,
+            audio_path=audio_path,
+            audio_format=audio_info.format if audio_info else None,
+            audio_duration_sec=audio_info.duration_sec if audio_info else None,
+            lane=lane,
+            tenant=tenant,
+            audio_sha256=audio_sha256,
+            idempotency_key=key,
+        )
+        blobstore.ref(db, job_id, "audio", audio_path, audio_sha256)
+        db.add(job)
+        try:
+            db.commit()
+        except IntegrityError:  # a concurrent duplicate got there first
+            db.rollback()
+            existing = db.query(Job).filter(Job.idempotency_key == key).first() if key else None
+            if existing is None:
+                raise
+
+    if existing is not None:
+        discard_audio(job_id)
+        if idempotency_key and (
+            existing.audio_sha256 != audio_sha256 or existing.instrument != instrument
+        ):
+            raise HTTPException(
+                status_code=409, detail="Idempotency-Key was already used for a different upload",
+            )
+        response.headers["Idempotent-Replayed"] = "true"
+        logger.info("Duplicate submission of job %s (tenant=%s)", existing.id, tenant)
+        return _job_to_dict(existing)
 
-    job = Job(
-        id=job_id,
-        status="CREATED",
-        instrument=instrument,
-        audio_path=audio_path,
-    )
-    db.add(job)
-    db.commit()
     db.refresh(job)
+    if key:
+        idempotency.remember(key, job_id)
+    enqueue_stage("start", start_job, job_id, lane=job.lane, tenant=job.tenant,
+                  audio_sec=job.audio_duration_sec)
+    job_events.publish(job_id, "CREATED", 0)
+
+    logger.info("Created and enqueued job %s (instrument=%s, lane=%s, tenant=%s, %s)",
+                job_id, instrument, lane, job.tenant,
+                f"{job.audio_format} {job.audio_duration_sec:.0f}s"
+                if job.audio_duration_sec is not None else "duration unknown")
+    return _job_to_dict(job)
 
-    conn = redis.from_url(settings.redis_url)
-    q = Queue(connection=conn)
-    q.enqueue(process_job, job_id, job_timeout=600)
 
-    logger.info("Created and enqueued job %s (instrument=%s)", job_id, instrument)
-    return _job_to_dict(job)
+@router.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str, db: Session = Depends(get_db)) -> dict:
+    """Re-enqueue a failed (or orphaned) job; it resumes from its checkpoint.
+
+    For a bulk-import duplicate the job it shares a result with is retried.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "READY":
+        raise HTTPException(status_code=409, detail="Job already finished")
+    duplicate = None
+    if job.duplicate_of:
+        duplicate, job = job, db.query(Job).filter(Job.id == job.duplicate_of).first()
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        if job.status == "READY":
+            share_result(db, job)
+            db.refresh(duplicate)
+            return _job_to_dict(duplicate)
+        job_id = job.id
+
+    if pipeline_active(job_id):
+        raise HTTPException(status_code=409, detail="Job is still being processed")
+
+    requeue_job(db, job)
+
+    logger.info("Re-enqueued job %s (resuming from checkpoint)", job_id)
+    return _job_to_dict(duplicate or job)
+
+
+@router.get("/jobs/{job_id}/events")
+def job_event_stream(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Server-Sent Events: the job's status and progress, pushed by the worker.
+
+    Each ``status`` event is {"job_id", "status", "progress", "error", "ts"};
+    the stream starts with the current status and ends at READY or FAILED.
+    """
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    current = {"job_id": job_id, "status": job.status, "progress": None,
+               "error": job.error, "ts": None}
+    return StreamingResponse(
+        job_events.stream(job_id, current, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Fields GET /jobs/{id}?fields= can project. "progress" only comes from the
+# worker's status snapshot; the rest are columns ("settings" is read out of
+# result_json in Postgres, so the transcription is not loaded for it).
+_PROJECTABLE_FIELDS = {
+    "id": Job.id,
+    "status": Job.status,
+    "instrument": Job.instrument,
+    "audio_path": Job.audio_path,
+    "audio_format": Job.audio_format,
+    "audio_duration_sec": Job.audio_duration_sec,
+    "created_at": Job.created_at,
+    "result_json": Job.result_json,
+    "error": Job.error,
+    "settings": Job.result_json["settings"],
+    "progress": None,
+}
+_SNAPSHOT_FIELDS = {"id", "status", "error", "progress"}
+
+
+def _parse_fields(fields: str) -> list[str]:
+    names = list(dict.fromkeys(f.strip() for f in fields.split(",") if f.strip()))
+    unknown = [f for f in names if f not in _PROJECTABLE_FIELDS]
+    if unknown or not names:
+        raise HTTPException(
+            status_code=400,
+            detail=f"fields must be a comma-separated subset of {sorted(_PROJECTABLE_FIELDS)}",
+        )
+    return names
+
+
+def _validate_settings(job_id: str, raw_settings: dict | None) -> dict | None:
+    if raw_settings is None:
+        return None
+    try:
+        return JobSettings(**raw_settings).model_dump()
+    except ValidationError as exc:
+        logger.error("Job %s: invalid settings schema: %s", job_id, exc)
+        raise HTTPException(
+            status_code=500,
+            detail="Invalid settings schema in result_json",
+        )
+
+
+def _validate_result(job_id: str, result_json: dict | None) -> dict | None:
+    if result_json is None:
+        return None
+    try:
+        return TranscriptionResult(**result_json).model_dump()
+    except ValidationError as exc:
+        logger.error("Job %s: invalid transcription schema: %s", job_id, exc)
+        raise HTTPException(
+            status_code=500,
+            detail="Invalid transcription schema in result_json",
+        )
+
+
+def _get_job_fields(job_id: str, names: list[str], db: Session) -> dict:
+    """Sparse GET /jobs/{id}: only the requested fields.
+
+    Status-only requests are answered from the Redis snapshot the worker
+    keeps; anything else selects just the needed columns.
+    """
+    if set(names) <= _SNAPSHOT_FIELDS:
+        snapshot = job_events.get_status(job_id)
+        if snapshot is not None:
+            snapshot["id"] = job_id
+            return {f: snapshot.get(f) for f in names}
+
+    columns = [f for f in names if f not in ("id", "progress")]
+    row = (
+        db.query(Job.id, *[_PROJECTABLE_FIELDS[f].label(f) for f in columns])
+        .filter(Job.id == job_id)
+        .first()
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    values = row._asdict()
+    out = {}
+    for f in names:
+        if f == "progress":
+            snapshot = job_events.get_status(job_id)
+            out[f] = snapshot.get("progress") if snapshot else None
+        elif f == "created_at":
+            out[f] = values[f].isoformat() if values[f] else None
+        elif f == "settings":
+            out[f] = _validate_settings(job_id, values[f])
+        elif f == "result_json":
+            out[f] = _validate_result(job_id, values[f])
+        else:
+            out[f] = values[f]
+    return out
 
 
 @router.get("/jobs/{job_id}")
-def get_job(job_id: str, db: Session = Depends(get_db)) -> dict:
+def get_job(
+    job_id: str,
+    fields: str | None = Query(
+        None, description="Comma-separated fields to return, e.g. status,settings,error",
+    ),
+    db: Session = Depends(get_db),
+) -> dict:
+    if fields is not None:
+        return _get_job_fields(job_id, _parse_fields(fields), db)
+
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    validated_result = None
+    validated_result = _validate_result(job_id, job.result_json)
     validated_settings = None
     if job.result_json is not None:
-        try:
-            validated_result = TranscriptionResult(**job.result_json).model_dump()
-        except ValidationError as exc:
-            logger.error("Job %s: invalid transcription schema: %s", job_id, exc)
-            raise HTTPException(
-                status_code=500,
-                detail="Invalid transcription schema in result_json",
-            )
-
-        raw_settings = job.result_json.get("settings")
-        if raw_settings is not None:
-            try:
-                validated_settings = JobSettings(**raw_settings).model_dump()
-            except ValidationError as exc:
-                logger.error("Job %s: invalid settings schema: %s", job_id, exc)
-                raise HTTPException(
-                    status_code=500,
-                    detail="Invalid settings schema in result_json",
-                )
+        validated_settings = _validate_settings(job_id, job.result_json.get("settings"))
 
     result = _job_to_dict(job, validated_result=validated_result)
     result["settings"] = validated_settings
@@ -181,6 +395,28 @@ def _load_ready_transcription_with_settings(
     return job, transcription, job_settings
 
 
+def _derived_artifact(job_id: str, name: str, db: Session) -> bytes | None:
+    """A precomputed read artifact (services/precompute.py) that is current
+    for the job's result, or None if the caller should compute inline.
+
+    Reads only the revision columns, not result_json.
+    """
+    row = db.query(Job.status, Job.result_rev, Job.derived_rev).filter(Job.id == job_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if row.status != "READY" or row.derived_rev is None or row.derived_rev != row.result_rev:
+        return None
+    try:
+        with open(precompute.artifact_path(job_id, name, row.derived_rev), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _json_artifact(data: bytes) -> Response:
+    return Response(content=data, media_type="application/json")
+
+
 def _extract_lick(
     transcription: TranscriptionResult, start_sec: float, end_sec: float
 ) -> tuple[list[NoteEvent], list[ChordEvent]]:
@@ -319,7 +555,9 @@ def update_settings(
     updated = {**job.result_json, "settings": validated.model_dump()}
     job.result_json = updated
     flag_modified(job, "result_json")
+    precompute.mark_changed(job)
     db.commit()
+    enqueue_precompute(job)
 
     return SettingsResponse(
         job_id=job.id,
@@ -407,9 +645,17 @@ def list_selections(
 @router.get("/jobs/{job_id}/analysis")
 def get_analysis(
     job_id: str,
-    selection_id: str,
+    selection_id: str | None = None,
     db: Session = Depends(get_db),
 ) -> dict:
+    """Analysis of a saved selection, or of the whole song without one."""
+    if selection_id is None:
+        data = _derived_artifact(job_id, "analysis", db)
+        if data is not None:
+            return _json_artifact(data)
+        job, transcription = _load_transcription(job_id, db)
+        return precompute.song_analysis(job.id, transcription).model_dump()
+
     job, transcription = _load_transcription(job_id, db)
 
     # Validate and find selection
@@ -495,36 +741,35 @@ def get_coaching(
 
 @router.get("/jobs/{job_id}/notes")
 def get_notes(job_id: str, db: Session = Depends(get_db)) -> dict:
+    data = _derived_artifact(job_id, "notes", db)
+    if data is not None:
+        return _json_artifact(data)
     job, transcription, job_settings = _load_ready_transcription_with_settings(job_id, db)
-    offset = job_settings.offset_sec
-
-    notes = [
-        NoteEvent(
-            pitch_midi=n.pitch_midi,
-            start_sec=n.start_sec - offset,
-            duration_sec=n.duration_sec,
-        )
-        for n in transcription.notes
-    ]
+    notes = precompute.display_notes(transcription.notes, job_settings.offset_sec)
     return {"job_id": job.id, "notes": [n.model_dump() for n in notes]}
 
 
 @router.get("/jobs/{job_id}/chords")
 def get_chords(job_id: str, db: Session = Depends(get_db)) -> dict:
+    data = _derived_artifact(job_id, "chords", db)
+    if data is not None:
+        return _json_artifact(data)
     job, transcription, job_settings = _load_ready_transcription_with_settings(job_id, db)
-    offset = job_settings.offset_sec
-
-    chords = [
-        ChordEvent(
-            symbol=c.symbol,
-            start_sec=c.start_sec - offset,
-            end_sec=(c.end_sec - offset) if c.end_sec is not None else None,
-        )
-        for c in transcription.chords
-    ]
+    chords = precompute.display_chords(transcription.chords, job_settings.offset_sec)
     return {"job_id": job.id, "chords": [c.model_dump() for c in chords]}
 
 
+@router.get("/jobs/{job_id}/beats")
+def get_beats(job_id: str, db: Session = Depends(get_db)) -> dict:
+    """Beat grid in display time: Klangio beat tracking, or one laid out
+    from the job's tempo and time signature."""
+    data = _derived_artifact(job_id, "beats", db)
+    if data is not None:
+        return _json_artifact(data)
+    job, transcription, job_settings = _load_ready_transcription_with_settings(job_id, db)
+    return precompute.beat_grid(job.id, job.result_json, transcription, job_settings)
+
+
 @router.put("/jobs/{job_id}/chords")
 def update_chords(
     job_id: str,
@@ -554,17 +799,12 @@ def update_chords(
     updated = {**job.result_json, "chords": [c.model_dump() for c in raw_chords]}
     job.result_json = updated
     flag_modified(job, "result_json")
+    precompute.mark_changed(job)
     db.commit()
+    enqueue_precompute(job)
 
     # Return in display-time (same as GET /chords)
-    display_chords = [
-        ChordEvent(
-            symbol=c.symbol,
-            start_sec=c.start_sec - offset,
-            end_sec=(c.end_sec - offset) if c.end_sec is not None else None,
-        )
-        for c in raw_chords
-    ]
+    display_chords = precompute.display_chords(raw_chords, offset)
     return {"job_id": job.id, "chords": [c.model_dump() for c in display_chords]}
 
 
@@ -801,19 +1041,11 @@ def get_score(job_id: str, db: Session = Depends(get_db)):
             filename="score.musicxml",
         )
 
-    # Fallback: generate from transcription data
-    transcription = TranscriptionResult(**{
-        k: v for k, v in job.result_json.items()
-        if k in TranscriptionResult.model_fields
-    })
-    job_settings = JobSettings(**(job.result_json.get("settings") or {}))
-    bpm = job_settings.bpm or 120.0
-    time_sig = job_settings.time_signature or "4/4"
-    notes = list(transcription.notes)
-    chords = list(transcription.chords)
-    notes = cleanup_notes_for_notation(notes)
-    xml = generate_musicxml(notes, chords, bpm=bpm, time_signature=time_sig, grid=16,
-                            key_sig=job_settings.key_signature)
+    # Fallback: generated from transcription data, precomputed or inline
+    xml = _derived_artifact(job_id, "score", db)
+    if xml is None:
+        transcription, job_settings = precompute.load_result(job.result_json)
+        xml = precompute.song_musicxml(transcription, job_settings)
     return Response(
         content=xml,
         media_type="application/vnd.recordare.musicxml+xml",
@@ -822,7 +1054,11 @@ def get_score(job_id: str, db: Session = Depends(get_db)):
 
 @router.get("/jobs/{job_id}/pdf")
 def get_pdf(job_id: str, db: Session = Depends(get_db)):
-    """Return Klangio PDF if available."""
+    """Return Klangio PDF if available.
+
+    The worker downloads it after READY. Until then this returns 202 (with
+    Retry-After) and makes sure the download is queued.
+    """
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -839,6 +1075,18 @@ def get_pdf(job_id: str, db: Session = Depends(get_db)):
             filename="transcription.pdf",
         )
 
+    # Not downloaded yet: the fetch_pdf_artifact job does it, off the request thread.
+    if artifacts.get("klangio_job_id"):
+        try:
+            enqueue_pdf_fetch(job)
+        except redis.RedisError as exc:
+            logger.warning("Job %s: could not queue the Klangio PDF fetch: %s", job_id, exc)
+        return JSONResponse(
+            status_code=202,
+            content={"detail": "Klangio PDF is being fetched"},
+            headers={"Retry-After": "5"},
+        )
+
     raise HTTPException(status_code=404, detail="Klangio PDF not available for this job")
 
 
@@ -958,15 +1206,13 @@ def get_audio(job_id: str, db: Session = Depends(get_db)):
     if not job.audio_path or not os.path.isfile(job.audio_path):
         raise HTTPException(status_code=404, detail="Audio file not found")
 
-    ext = os.path.splitext(job.audio_path)[1].lower()
-    media_type = {
-        ".mp3": "audio/mpeg",
-        ".wav": "audio/wav",
-        ".m4a": "audio/mp4",
-        ".flac": "audio/flac",
-        ".ogg": "audio/ogg",
-        ".aac": "audio/aac",
-    }.get(ext, "application/octet-stream")
+    # The blob store knows the real type; older jobs only have the file name.
+    blob = blobstore.get(db, job.audio_sha256)
+    if blob is not None:
+        ext, media_type = blob.extension, blob.media_type
+    else:
+        ext = os.path.splitext(job.audio_path)[1].lower()
+        media_type = blobstore.media_type(ext)
 
     filename = f"jazz_lick_lab_{job_id}{ext}"
     return FileResponse(
@@ -978,8 +1224,13 @@ def get_audio(job_id: str, db: Session = Depends(get_db)):
 
 @router.get("/jobs/{job_id}/stem-audio")
 def get_stem_audio(job_id: str, db: Session = Depends(get_db)):
-    """Serve the isolated stem audio (from source separation) for A/B comparison."""
+    """Serve the isolated stem audio (from source separation) for A/B comparison.
+
+    Serves the most compact stored form (Opus/FLAC when STEM_AUDIO_FORMAT
+    compression is on, otherwise the WAV).
+    """
     from pathlib import Path
+    from services.audio_codec import find_stem
     from services.klangio import _instrument_to_stem
 
     job = db.query(Job).filter(Job.id == job_id).first()
@@ -996,18 +1247,19 @@ def get_stem_audio(job_id: str, db: Session = Depends(get_db)):
         )
 
     stem_type, _ = stem_info
-    stem_path = str(Path(job.audio_path).parent / f"stem_{stem_type}.wav")
+    stem_path = find_stem(str(Path(job.audio_path).parent), stem_type)
 
-    if not os.path.isfile(stem_path):
+    if stem_path is None:
         raise HTTPException(
             status_code=404,
-            detail=f"Stem file not found at {stem_path}. "
+            detail=f"Stem file not found for stem '{stem_type}'. "
                    f"This job may have been created before source separation was enabled, "
                    f"or separation failed. Try re-uploading the audio.",
         )
 
+    ext = os.path.splitext(stem_path)[1]
     return FileResponse(
         path=stem_path,
-        media_type="audio/wav",
-        filename=f"jazz_lick_lab_{job_id}_stem_{stem_type}.wav",
+        media_type=blobstore.media_type(ext),
+        filename=f"jazz_lick_lab_{job_id}_stem_{stem_type}{ext}",
     )
@@ -0,0 +1,20 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from services.failures import CLASSES
+
+
+class RequeueRequest(BaseModel):
+    """Which dead letters to requeue: the listed ``job_ids``, or up to
+    ``limit`` of the oldest, optionally only of one ``failure_class``."""
+    job_ids: Optional[List[str]] = None
+    failure_class: Optional[str] = None
+    limit: int = Field(500, ge=1, le=5000)
+
+    @field_validator("failure_class")
+    @classmethod
+    def failure_class_must_exist(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and v not in CLASSES:
+            raise ValueError(f"failure_class must be one of {list(CLASSES)}")
+        return v
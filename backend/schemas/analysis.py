@@ -25,7 +25,7 @@ class IiVIEvent(BaseModel):
 
 class AnalysisResponse(BaseModel):
     job_id: str
-    selection_id: str
+    selection_id: Optional[str] = None  # None: the whole song
     window_start_sec: float
     window_end_sec: float
     metrics: CoverageMetrics
@@ -0,0 +1,28 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, field_validator
+
+from workers.queues import BATCH, LANES
+
+
+class ManifestItem(BaseModel):
+    path: str
+    instrument: Optional[str] = None
+
+
+class ManifestBatchRequest(BaseModel):
+    """A bulk import from a directory on the server (under BULK_IMPORT_ROOT).
+
+    Without ``items`` every file under ``directory`` is imported.
+    """
+    directory: str
+    instrument: str
+    lane: str = BATCH
+    items: Optional[List[ManifestItem]] = None
+
+    @field_validator("lane")
+    @classmethod
+    def lane_must_exist(cls, v: str) -> str:
+        if v not in LANES:
+            raise ValueError(f"lane must be one of {list(LANES)}")
+        return v
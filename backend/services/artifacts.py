@@ -0,0 +1,43 @@
+import logging
+import os
+
+from config import settings
+from database import get_redis
+from services.klangio import fetch_job_pdf
+
+logger = logging.getLogger(__name__)
+
+PDF_FILENAME = "transcription.pdf"
+
+
+def klangio_dir(job_id: str) -> str:
+    """Directory holding a job's downloaded Klangio artifacts."""
+    return os.path.join(settings.data_dir, "jobs", job_id, "klangio")
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def ensure_klangio_pdf(job_id: str, klangio_job_id: str) -> str:
+    """Return the local Klangio PDF for a job, downloading it on first use.
+
+    Single-flight across threads and processes: concurrent callers wait on a
+    Redis lock and the winner's download is reused by everyone else.
+    """
+    job_dir = klangio_dir(job_id)
+    pdf_path = os.path.join(job_dir, PDF_FILENAME)
+    if os.path.isfile(pdf_path):
+        return pdf_path
+
+    with get_redis().lock(f"klangio:pdf:{job_id}", timeout=180, blocking_timeout=190):
+        if os.path.isfile(pdf_path):
+            return pdf_path
+        pdf_bytes = fetch_job_pdf(klangio_job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        write_atomic(pdf_path, pdf_bytes)
+        logger.info("Job %s: saved Klangio PDF (%d bytes)", job_id, len(pdf_bytes))
+    return pdf_path
@@ -0,0 +1,69 @@
+import logging
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_stem_format: str = os.getenv("STEM_AUDIO_FORMAT", "wav").lower()
+_keep_wav: bool = os.getenv("STEM_KEEP_WAV", "0") == "1"
+_opus_bitrate: str = os.getenv("STEM_OPUS_BITRATE", "96k")
+
+# Stem formats, most compact first (media types: blobstore.MEDIA_TYPES)
+STEM_EXTENSIONS = (".opus", ".flac", ".wav")
+
+_ENCODERS = {
+    "flac": ["-c:a", "flac", "-compression_level", "8"],
+    "opus": ["-c:a", "libopus", "-b:a", _opus_bitrate],
+}
+
+
+def compress_stem(wav_path: str) -> str:
+    """Encode a separated stem as FLAC or Opus per STEM_AUDIO_FORMAT.
+
+    Returns the path to serve: the compressed file, or ``wav_path`` when
+    compression is off, ffmpeg is missing or encoding fails. The WAV is
+    removed after a successful encode unless STEM_KEEP_WAV=1.
+    """
+    if _stem_format == "wav":
+        return wav_path
+    if _stem_format not in _ENCODERS:
+        logger.warning("Unknown STEM_AUDIO_FORMAT %r, keeping WAV", _stem_format)
+        return wav_path
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        logger.warning("ffmpeg not found, keeping WAV stem %s", wav_path)
+        return wav_path
+
+    out_path = str(Path(wav_path).with_suffix(f".{_stem_format}"))
+    tmp_path = f"{out_path}.tmp"
+    cmd = [ffmpeg, "-y", "-loglevel", "error", "-i", wav_path,
+           *_ENCODERS[_stem_format], "-f", "ogg" if _stem_format == "opus" else "flac",
+           tmp_path]
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, timeout=300)
+        os.replace(tmp_path, out_path)
+    except (OSError, subprocess.SubprocessError) as exc:
+        logger.warning("Stem compression failed for %s: %s", wav_path, exc)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return wav_path
+
+    logger.info("Stem compressed: %s (%d → %d bytes)", out_path,
+                os.path.getsize(wav_path), os.path.getsize(out_path))
+    if not _keep_wav:
+        os.remove(wav_path)
+    return out_path
+
+
+def find_stem(audio_dir: str, stem_type: str) -> str | None:
+    """Most compact stem file present for a job (Opus, then FLAC, then WAV)."""
+    for ext in STEM_EXTENSIONS:
+        path = os.path.join(audio_dir, f"stem_{stem_type}{ext}")
+        if os.path.isfile(path):
+            return path
+    return None
@@ -0,0 +1,312 @@
+"""Audio format and duration from container headers, without decoding.
+
+Reads a few kilobytes at the start (and for Ogg the end) of the file:
+
+- MP3: Xing/Info or VBRI frame count, else the CBR bitrate and file size
+- WAV / RF64: ``fmt `` byte rate and ``data`` size
+- FLAC: STREAMINFO sample count
+- Ogg Vorbis / Opus: granule position of the last page
+- MP4 / M4A: ``mvhd`` duration, ``stsd`` sample rate and channels
+- ADTS AAC: estimated from the average size of the first frames
+
+probe() returns None for anything it does not recognise; callers then fall
+back to defaults that do not depend on duration.
+"""
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO
+
+logger = logging.getLogger(__name__)
+
+_HEAD = 64 * 1024
+_MOOV_MAX = 16 * 1024 * 1024  # larger moov boxes are not read
+
+
+@dataclass(frozen=True)
+class AudioInfo:
+    format: str  # mp3 | wav | flac | ogg | opus | mp4 | aac
+    duration_sec: float | None
+    sample_rate: int | None = None
+    channels: int | None = None
+
+
+def probe(path: str) -> AudioInfo | None:
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            head = f.read(_HEAD)
+            start = _id3v2_size(head)
+            if start:
+                f.seek(start)
+                head = f.read(_HEAD)
+            return _probe(f, head, start, size)
+    except (OSError, struct.error, ValueError, IndexError) as exc:
+        logger.debug("Could not probe %s: %s", path, exc)
+        return None
+
+
+def _probe(f: BinaryIO, head: bytes, start: int, size: int) -> AudioInfo | None:
+    if head[:4] in (b"RIFF", b"RF64") and head[8:12] == b"WAVE":
+        return _wav(head, size)
+    if head[:4] == b"fLaC":
+        return _flac(head)
+    if head[:4] == b"OggS":
+        return _ogg(f, head, size)
+    if head[4:8] == b"ftyp":
+        return _mp4(f, size)
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return _adts(head, size - start)
+    return _mp3(f, head, start, size)
+
+
+def _id3v2_size(head: bytes) -> int:
+    if head[:3] != b"ID3" or len(head) < 10:
+        return 0
+    size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+# -- WAV --------------------------------------------------------------------
+
+def _wav(head: bytes, size: int) -> AudioInfo | None:
+    pos = 12
+    byte_rate = rate = channels = None
+    rf64_data_size = None
+    while pos + 8 <= len(head):
+        chunk, length = head[pos:pos + 4], struct.unpack_from("<I", head, pos + 4)[0]
+        body = pos + 8
+        if chunk == b"ds64":
+            rf64_data_size = struct.unpack_from("<Q", head, body + 8)[0]
+        elif chunk == b"fmt ":
+            channels, rate, byte_rate = struct.unpack_from("<HII", head, body + 2)
+        elif chunk == b"data":
+            if rf64_data_size is not None:
+                length = rf64_data_size
+            # Streamed writers leave the size unset; the rest of the file is data.
+            if length in (0, 0xFFFFFFFF) or body + length > size:
+                length = size - body
+            duration = length / byte_rate if byte_rate else None
+            return AudioInfo("wav", duration, rate, channels)
+        pos = body + length + (length & 1)
+    return AudioInfo("wav", None, rate, channels) if rate else None
+
+
+# -- FLAC -------------------------------------------------------------------
+
+def _flac(head: bytes) -> AudioInfo | None:
+    # The first metadata block is always STREAMINFO.
+    if head[4] & 0x7F != 0:
+        return None
+    bits = int.from_bytes(head[8 + 10:8 + 18], "big")
+    rate = bits >> 44
+    channels = ((bits >> 41) & 0x7) + 1
+    samples = bits & ((1 << 36) - 1)
+    duration = samples / rate if rate and samples else None
+    return AudioInfo("flac", duration, rate or None, channels)
+
+
+# -- Ogg --------------------------------------------------------------------
+
+def _ogg(f: BinaryIO, head: bytes, size: int) -> AudioInfo | None:
+    segments = head[26]
+    packet = head[27 + segments:]
+    if packet[:7] == b"\x01vorbis":
+        fmt, channels, rate = "ogg", packet[11], struct.unpack_from("<I", packet, 12)[0]
+        pre_skip = 0
+        granule_rate = rate
+    elif packet[:8] == b"OpusHead":
+        fmt, channels = "opus", packet[9]
+        pre_skip = struct.unpack_from("<H", packet, 10)[0]
+        rate = struct.unpack_from("<I", packet, 12)[0] or None
+        granule_rate = 48000  # Opus granules are always at 48 kHz
+    else:
+        return AudioInfo("ogg", None)
+
+    f.seek(max(0, size - _HEAD))
+    tail = f.read(_HEAD)
+    last = tail.rfind(b"OggS")
+    if last < 0 or last + 14 > len(tail):
+        return AudioInfo(fmt, None, rate, channels)
+    granule = struct.unpack_from("<q", tail, last + 6)[0]
+    duration = (granule - pre_skip) / granule_rate if granule > 0 else None
+    return AudioInfo(fmt, duration, rate, channels)
+
+
+# -- MP4 / M4A --------------------------------------------------------------
+
+def _boxes(data: bytes, start: int = 0, end: int | None = None):
+    """(type, body start, body end) of the boxes in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        length, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if length == 1:
+            length = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif length == 0:
+            length = end - pos
+        if length < header:
+            return
+        yield kind, pos + header, min(pos + length, end)
+        pos += length
+
+
+def _find_box(data: bytes, path: list[bytes], start: int = 0, end: int | None = None):
+    for kind, body, body_end in _boxes(data, start, end):
+        if kind == path[0]:
+            if len(path) == 1:
+                return body, body_end
+            found = _find_box(data, path[1:], body, body_end)
+            if found:
+                return found
+    return None
+
+
+def _mp4(f: BinaryIO, size: int) -> AudioInfo | None:
+    # Walk the top-level boxes by seeking; only moov is read.
+    pos = 0
+    moov = None
+    while pos + 8 <= size:
+        f.seek(pos)
+        header = f.read(16)
+        length, kind = struct.unpack_from(">I4s", header)
+        if length == 1:
+            length = struct.unpack_from(">Q", header, 8)[0]
+        elif length == 0:
+            length = size - pos
+        if length < 8:
+            break
+        if kind == b"moov":
+            if length > _MOOV_MAX:
+                break
+            f.seek(pos)
+            moov = f.read(length)
+            break
+        pos += length
+    if moov is None:
+        return AudioInfo("mp4", None)
+
+    duration = None
+    mvhd = _find_box(moov, [b"moov", b"mvhd"])
+    if mvhd:
+        body = mvhd[0]
+        if moov[body] == 1:
+            timescale, length = struct.unpack_from(">IQ", moov, body + 20)
+        else:
+            timescale, length = struct.unpack_from(">II", moov, body + 12)
+        if timescale:
+            duration = length / timescale
+
+    rate = channels = None
+    for kind, body, body_end in _boxes(moov, *_find_box(moov, [b"moov"]) or (0, 0)):
+        if kind != b"trak":
+            continue
+        stsd = _find_box(moov, [b"mdia", b"minf", b"stbl", b"stsd"], body, body_end)
+        if stsd and moov[stsd[0] + 12:stsd[0] + 16] in (b"mp4a", b"alac", b"Opus", b"fLaC"):
+            entry = stsd[0] + 8  # version/flags, entry count
+            channels = struct.unpack_from(">H", moov, entry + 24)[0]
+            rate = struct.unpack_from(">I", moov, entry + 32)[0] >> 16
+            break
+    return AudioInfo("mp4", duration, rate or None, channels or None)
+
+
+# -- ADTS AAC ---------------------------------------------------------------
+
+_ADTS_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050,
+               16000, 12000, 11025, 8000, 7350)
+
+
+def _adts(head: bytes, audio_bytes: int) -> AudioInfo | None:
+    rate_index = (head[2] >> 2) & 0xF
+    if rate_index >= len(_ADTS_RATES):
+        return None
+    rate = _ADTS_RATES[rate_index]
+    channels = ((head[2] & 0x1) << 2) | (head[3] >> 6)
+    pos = frames = 0
+    while pos + 7 <= len(head) and head[pos] == 0xFF and head[pos + 1] & 0xF6 == 0xF0:
+        length = ((head[pos + 3] & 0x3) << 11) | (head[pos + 4] << 3) | (head[pos + 5] >> 5)
+        if length < 7:
+            break
+        pos += length
+        frames += 1
+    if not frames:
+        return AudioInfo("aac", None, rate, channels or None)
+    # 1024 samples per frame; the average frame size of the head stands in
+    # for the rest of the file.
+    duration = audio_bytes / (pos / frames) * 1024 / rate
+    return AudioInfo("aac", duration, rate, channels or None)
+
+
+# -- MP3 --------------------------------------------------------------------
+
+_MP3_BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MP3_RATES = (44100, 48000, 32000)
+
+
+def _mp3_header(data: bytes, pos: int) -> tuple | None:
+    """(version, layer, bitrate kbps, sample rate, channels, frame bytes,
+    samples per frame) of a frame header at ``pos``, or None."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+    version_bits = (data[pos + 1] >> 3) & 0x3  # 3: MPEG-1, 2: MPEG-2, 0: MPEG-2.5
+    layer = 4 - ((data[pos + 1] >> 1) & 0x3)
+    bitrate_index = data[pos + 2] >> 4
+    rate_index = (data[pos + 2] >> 2) & 0x3
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    version = 1 if version_bits == 3 else 2
+    bitrate = _MP3_BITRATES[version, layer][bitrate_index]
+    rate = _MP3_RATES[rate_index] >> {3: 0, 2: 1, 0: 2}[version_bits]
+    padding = (data[pos + 2] >> 1) & 0x1
+    channels = 1 if data[pos + 3] >> 6 == 3 else 2
+    if layer == 1:
+        samples = 384
+        frame = (12 * bitrate * 1000 // rate + padding) * 4
+    else:
+        samples = 1152 if layer == 2 or version == 1 else 576
+        frame = samples // 8 * bitrate * 1000 // rate + padding
+    return version, layer, bitrate, rate, channels, frame, samples
+
+
+def _mp3(f: BinaryIO, head: bytes, start: int, size: int) -> AudioInfo | None:
+    # The first header followed by another one where its length says.
+    pos = head.find(b"\xff")
+    while 0 <= pos < len(head) - 4:
+        header = _mp3_header(head, pos)
+        if header and (pos + header[5] + 4 > len(head) or _mp3_header(head, pos + header[5])):
+            break
+        pos = head.find(b"\xff", pos + 1)
+    else:
+        return None
+    version, layer, bitrate, rate, channels, _, samples = header
+
+    side_info = (17 if channels == 1 else 32) if version == 1 else (9 if channels == 1 else 17)
+    xing = pos + 4 + side_info
+    frames = None
+    if head[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", head, xing + 4)[0]
+        if flags & 0x1:
+            frames = struct.unpack_from(">I", head, xing + 8)[0]
+    elif head[pos + 36:pos + 40] == b"VBRI":
+        frames = struct.unpack_from(">I", head, pos + 36 + 14)[0]
+
+    if frames:
+        duration = frames * samples / rate
+    else:
+        audio_bytes = size - start - pos
+        f.seek(max(0, size - 128))
+        if f.read(3) == b"TAG":
+            audio_bytes -= 128
+        duration = audio_bytes * 8 / (bitrate * 1000)
+    return AudioInfo("mp3", duration, rate, channels)
@@ -0,0 +1,229 @@
+"""Content-addressed store for uploaded audio, stems and Klangio artifacts.
+
+Each distinct file is stored once, under ``data/blobs/ab/cd/<sha256>``,
+however many jobs use it. A job's own paths (``data/{job_id}/audio.wav``,
+``data/jobs/{id}/klangio/transcription.pdf``, ...) are hard links to the
+blob, as in the Klangio cache, so everything keeps reading files where it
+always has and a recording uploaded twice costs no extra disk.
+
+``blobs`` records each blob's size, extension and media type. ``blob_refs``
+holds one row per (job, role), and those rows are the blob's reference
+count. Blobs that no job refers to any more (the upload of a rejected
+duplicate submission, a job whose commit failed) are deleted by collect().
+ref() holds a share lock on the ``blobs`` row until its caller commits, and
+collect() deletes under an exclusive lock, so a blob is never collected
+while a new reference to it is being recorded.
+
+MEDIA_TYPES is the one extension → media type table; uploads to Klangio
+and every file route use it.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Blob, BlobRef
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+# Unreferenced blobs younger than this are kept: their job may not be
+# committed yet.
+_gc_grace: float = float(os.getenv("BLOB_GC_GRACE_SEC", "3600"))
+
+# File extension → media type
+MEDIA_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".musicxml": "application/vnd.recordare.musicxml+xml",
+    ".pdf": "application/pdf",
+}
+
+# Container probed by services/audio_probe.py → file extension
+FORMAT_EXTENSIONS = {
+    "mp3": ".mp3",
+    "wav": ".wav",
+    "flac": ".flac",
+    "ogg": ".ogg",
+    "opus": ".opus",
+    "mp4": ".m4a",
+    "aac": ".aac",
+}
+
+
+def _root() -> str:
+    return os.path.join(settings.data_dir, "blobs")
+
+
+def blob_path(sha256: str) -> str:
+    return os.path.join(_root(), sha256[:2], sha256[2:4], sha256)
+
+
+def media_type(extension: str) -> str:
+    return MEDIA_TYPES.get(extension.lower(), "application/octet-stream")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _link(src: str, dst: str) -> None:
+    """Atomically make ``dst`` a hard link to ``src``, copying across devices."""
+    tmp = f"{dst}.link-{uuid.uuid4().hex[:8]}"
+    try:
+        try:
+            os.link(src, tmp)
+        except OSError:
+            shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def put(path: str, sha256: str | None = None) -> str:
+    """Store the file at ``path`` and return its sha256.
+
+    If the content is already stored, ``path`` is replaced by a link to the
+    stored blob and its own copy is freed.
+    """
+    sha256 = sha256 or file_sha256(path)
+    blob = blob_path(sha256)
+    if os.path.isfile(blob):
+        os.utime(blob)  # referenced again: not collectable for BLOB_GC_GRACE_SEC
+        if not os.path.samefile(blob, path):
+            size = os.path.getsize(path)
+            _link(blob, path)
+            metrics.incr("blobs.dedup_hits")
+            metrics.incr("blobs.dedup_bytes", size)
+    else:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        _link(path, blob)
+    return sha256
+
+
+def _locked(db: Session, sha256: str, *, shared: bool) -> Blob | None:
+    return (
+        db.query(Blob).filter(Blob.sha256 == sha256)
+        .with_for_update(read=shared).one_or_none()
+    )
+
+
+def ref(db: Session, job_id: str, role: str, path: str, sha256: str | None = None) -> str:
+    """Store ``path`` as the job's ``role`` file and record the reference
+    (replacing an earlier blob in that role). The caller commits."""
+    sha256 = sha256 or file_sha256(path)
+    # Locked before put(): collect() either waits for our commit or has
+    # already removed the blob, and put() then stores it again.
+    blob = _locked(db, sha256, shared=True)
+    put(path, sha256)
+    if blob is None:
+        extension = os.path.splitext(path)[1].lower()
+        try:
+            with db.begin_nested():
+                db.add(Blob(
+                    sha256=sha256,
+                    size=os.path.getsize(path),
+                    extension=extension,
+                    media_type=media_type(extension),
+                ))
+        except IntegrityError:
+            pass  # another job stored the same content concurrently
+    db.merge(BlobRef(job_id=job_id, role=role, sha256=sha256))
+    return sha256
+
+
+def get(db: Session, sha256: str | None) -> Blob | None:
+    return db.get(Blob, sha256) if sha256 else None
+
+
+def stats(db: Session) -> dict:
+    """Stored bytes against the bytes jobs refer to; the difference is what
+    deduplication saved."""
+    blobs, stored = db.query(func.count(Blob.sha256), func.coalesce(func.sum(Blob.size), 0)).one()
+    refs, referenced = (
+        db.query(func.count(BlobRef.sha256), func.coalesce(func.sum(Blob.size), 0))
+        .join(Blob, Blob.sha256 == BlobRef.sha256)
+        .one()
+    )
+    return {
+        "blobs": blobs,
+        "refs": refs,
+        "stored_bytes": int(stored),
+        "referenced_bytes": int(referenced),
+        "saved_bytes": int(referenced) - int(stored),
+    }
+
+
+def collect(db: Session) -> dict:
+    """Delete blobs that no job refers to and that are older than
+    BLOB_GC_GRACE_SEC. Walks the store, so files whose row was rolled back
+    are found too.
+
+    Each deletion is its own transaction: the ``blobs`` row is locked, then
+    the references and the file's mtime are checked again, since ref() may
+    have picked the blob up since the walk.
+    """
+    cutoff = time.time() - _gc_grace
+    candidates: dict[str, str] = {}
+    for dirpath, _, filenames in os.walk(_root()):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if len(name) == 64 and os.stat(path).st_mtime < cutoff:
+                    candidates[name] = path
+            except OSError:
+                continue
+
+    removed = freed = 0
+    shas = list(candidates)
+    for i in range(0, len(shas), 500):
+        chunk = shas[i:i + 500]
+        referenced = {
+            sha for (sha,) in
+            db.query(BlobRef.sha256).filter(BlobRef.sha256.in_(chunk)).distinct()
+        }
+        for sha in chunk:
+            if sha in referenced:
+                continue
+            try:
+                row = _locked(db, sha, shared=False)
+                if db.query(BlobRef.sha256).filter(BlobRef.sha256 == sha).first() is not None:
+                    continue
+                stat = os.stat(candidates[sha])
+                if stat.st_mtime >= cutoff:
+                    continue  # put() touched it: a reference is on its way
+                if row is not None:
+                    db.delete(row)
+                    db.flush()
+                os.remove(candidates[sha])
+            except OSError:
+                continue
+            finally:
+                db.commit()
+            removed += 1
+            freed += stat.st_size
+    metrics.incr("blobs.collected", removed)
+    metrics.incr("blobs.collected_bytes", freed)
+    logger.info("Blob store: collected %d unreferenced blobs (%d bytes)", removed, freed)
+    return {"removed": removed, "freed_bytes": freed}
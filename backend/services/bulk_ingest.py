@@ -0,0 +1,250 @@
+"""Bulk import of recordings from a ZIP archive or a server-local directory.
+
+The ``ingest_batch`` task (workers/tasks.py) runs ``ingest`` over the files
+of a batch:
+
+- Each audio file is streamed into its job's directory while its sha256
+  is computed, so no file is ever held in memory. It is then probed and
+  named after its real format, as uploads are (services/storage.py).
+- Job rows are inserted ``_INSERT_CHUNK`` at a time, one commit per chunk.
+  The chunk's jobs are then enqueued together, with their durations for
+  stage timeouts and shortest-job-first ordering.
+- A file with the same hash (and instrument) as an earlier file in the
+  batch becomes a duplicate job. It shares that job's audio and, once
+  that job is READY, its result.
+- Audio goes into the blob store (services/blobstore.py), so a file that
+  was uploaded or imported before takes no extra disk either.
+
+Ingest can be resumed: files already imported for the batch are skipped.
+"""
+import hashlib
+import logging
+import os
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from models import Batch, Job
+from services import blobstore, job_events, storage
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac")
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+# Server-local imports are confined to this directory (disabled if unset).
+_import_root: str = os.getenv("BULK_IMPORT_ROOT", "")
+_max_file_bytes: int = int(os.getenv("BULK_MAX_FILE_MB", "200")) * 1024 * 1024
+max_files: int = int(os.getenv("BULK_MAX_FILES", "10000"))
+
+_INSERT_CHUNK = 200
+_COPY_CHUNK = 1024 * 1024
+
+
+class BulkIngestError(Exception):
+    """The batch source cannot be used at all (as opposed to one bad file)."""
+
+
+@dataclass(frozen=True)
+class SourceFile:
+    name: str                       # path within the archive or directory
+    size: int | None                # None if the file cannot be found
+    open: Callable[[], BinaryIO]
+    instrument: str | None = None   # overrides the batch instrument
+
+
+def batch_dir(batch_id: str) -> str:
+    return os.path.join(settings.data_dir, "batches", batch_id)
+
+
+def resolve_directory(directory: str) -> str:
+    """Real path of a manifest directory, which must lie inside
+    BULK_IMPORT_ROOT."""
+    if not _import_root:
+        raise BulkIngestError("Server-local imports are disabled (BULK_IMPORT_ROOT is not set)")
+    root = os.path.realpath(_import_root)
+    path = os.path.realpath(os.path.join(root, directory))
+    if os.path.commonpath([root, path]) != root:
+        raise BulkIngestError("directory must be inside BULK_IMPORT_ROOT")
+    if not os.path.isdir(path):
+        raise BulkIngestError(f"Not a directory: {directory}")
+    return path
+
+
+def _visible(name: str) -> bool:
+    """False for macOS resource forks and hidden files or directories."""
+    return not any(part.startswith(".") or part == "__MACOSX" for part in name.split("/"))
+
+
+def zip_files(archive_path: str) -> Iterator[SourceFile]:
+    """The files of a ZIP archive, in archive order."""
+    try:
+        zf = zipfile.ZipFile(archive_path)
+    except (OSError, zipfile.BadZipFile) as exc:
+        raise BulkIngestError(f"Cannot read ZIP archive: {exc}") from exc
+    with zf:
+        for info in zf.infolist():
+            if info.is_dir() or not _visible(info.filename):
+                continue
+            yield SourceFile(info.filename, info.file_size, lambda info=info: zf.open(info))
+
+
+def directory_files(directory: str, items: list[dict] | None = None) -> Iterator[SourceFile]:
+    """The files under ``directory`` (recursively, sorted), or just the
+    manifest ``items`` ({"path", "instrument"?}) relative to it."""
+    if items is None:
+        items = []
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames.sort()
+            rel = os.path.relpath(dirpath, directory)
+            items.extend(
+                {"path": name if rel == "." else f"{rel}/{name}"} for name in sorted(filenames)
+            )
+    for item in items:
+        path = os.path.realpath(os.path.join(directory, item["path"]))
+        if os.path.commonpath([directory, path]) != directory or not _visible(item["path"]):
+            continue
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = None
+        yield SourceFile(
+            item["path"], size, lambda path=path: open(path, "rb"), item.get("instrument"),
+        )
+
+
+def _copy_hashed(src: BinaryIO, dest: str) -> str:
+    """Stream ``src`` into ``dest`` (atomically) and return its sha256."""
+    h = hashlib.sha256()
+    tmp = f"{dest}.part"
+    written = 0
+    try:
+        with open(tmp, "wb") as out:
+            for chunk in iter(lambda: src.read(_COPY_CHUNK), b""):
+                written += len(chunk)
+                if written > _max_file_bytes:  # the size in a ZIP header can lie
+                    raise ValueError("file too large")
+                h.update(chunk)
+                out.write(chunk)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return h.hexdigest()
+
+
+def _reject_reason(src: SourceFile) -> str | None:
+    if not src.name.lower().endswith(AUDIO_EXTENSIONS):
+        return "not an audio file"
+    if src.size is None:
+        return "file not found"
+    if src.size > _max_file_bytes:
+        return "file too large"
+    return None
+
+
+def ingest(
+    db: Session, batch: Batch, files: Iterable[SourceFile],
+    enqueue: Callable[[dict[str, float | None]], None],
+) -> None:
+    """Import ``files`` into ``batch``. ``enqueue`` is called after each
+    commit with the jobs that need a transcription of their own, job ID →
+    audio duration (None if unknown)."""
+    existing = db.query(
+        Job.source_name, Job.id, Job.instrument, Job.audio_sha256, Job.audio_path, Job.duplicate_of,
+    ).filter(Job.batch_id == batch.id).all()
+    done = {row.source_name for row in existing}
+    # (sha256, instrument) → (job ID, audio path) of the first such job
+    primaries = {
+        (row.audio_sha256, row.instrument): (row.id, row.audio_path)
+        for row in existing if row.duplicate_of is None and row.audio_sha256
+    }
+    rejected = list(batch.rejected or [])
+    done.update(r["name"] for r in rejected)
+    pending: list[Job] = []
+
+    def flush() -> None:
+        if not pending:
+            return
+        db.add_all(pending)
+        batch.file_count = (batch.file_count or 0) + len(pending)
+        batch.duplicate_count = (batch.duplicate_count or 0) + sum(
+            1 for j in pending if j.duplicate_of is not None
+        )
+        batch.rejected = list(rejected)
+        primaries_sec = {
+            j.id: j.audio_duration_sec for j in pending if j.duplicate_of is None
+        }
+        db.commit()
+        # Status-only GET /jobs/{id} reads this snapshot, as for uploads.
+        job_events.publish_many([j.id for j in pending], "CREATED", 0)
+        enqueue(primaries_sec)
+        pending.clear()
+
+    for src in files:
+        if src.name in done:
+            continue
+        done.add(src.name)
+        if len(done) - len(rejected) > max_files:
+            rejected.append({"name": src.name, "reason": f"batch limit of {max_files} files reached"})
+            continue
+        reason = _reject_reason(src)
+        if reason is not None:
+            rejected.append({"name": src.name, "reason": reason})
+            continue
+
+        job_id = str(uuid.uuid4())
+        job_dir = os.path.join(settings.data_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        staged = os.path.join(job_dir, "audio.import")
+        try:
+            with src.open() as fh:
+                sha = _copy_hashed(fh, staged)
+        except (OSError, ValueError, zipfile.BadZipFile) as exc:
+            os.rmdir(job_dir)
+            rejected.append({"name": src.name, "reason": str(exc)})
+            continue
+        ext, info = storage.audio_extension(staged, src.name)
+
+        instrument = src.instrument or batch.instrument
+        duplicate_of = None
+        if (sha, instrument) in primaries:
+            duplicate_of, audio_path = primaries[sha, instrument]
+            os.remove(staged)
+            os.rmdir(job_dir)
+        else:
+            audio_path = os.path.join(job_dir, f"audio{ext}")
+            os.replace(staged, audio_path)
+            primaries[sha, instrument] = (job_id, audio_path)
+        # Into the blob store; a file imported before costs no extra disk.
+        blobstore.ref(db, job_id, "audio", audio_path, sha)
+
+        pending.append(Job(
+            id=job_id,
+            status="CREATED",
+            instrument=instrument,
+            audio_path=audio_path,
+            audio_format=info.format if info else None,
+            audio_duration_sec=info.duration_sec if info else None,
+            lane=batch.lane,
+            tenant=batch.tenant,
+            batch_id=batch.id,
+            source_name=src.name,
+            audio_sha256=sha,
+            duplicate_of=duplicate_of,
+        ))
+        if len(pending) >= _INSERT_CHUNK:
+            flush()
+
+    flush()
+    batch.rejected = rejected
+    db.commit()
+    logger.info("Batch %s: %d files imported (%d duplicates), %d rejected",
+                batch.id, batch.file_count, batch.duplicate_count, len(rejected))
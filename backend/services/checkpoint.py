@@ -0,0 +1,113 @@
+import copy
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineCheckpoint:
+    """Per-stage progress of one Klangio ingest, persisted on every change.
+
+    State shape (stored in ``Job.pipeline_state``)::
+
+        {"stages": {"transcription": {"klangio_job_id": "...",
+                                      "status": "SUBMITTED" | "COMPLETED" | "SKIPPED",
+                                      "artifact": "/path/or/null",
+                                      "error": "why it was skipped"}, ...}}
+
+    JSON payloads of completed stages are written to ``work_dir`` so that a
+    resumed run reads them from disk instead of downloading them again.
+    Thread-safe: DAG stages update it concurrently. ``persist`` receives
+    (stage name, that stage's fields) so that RQ stages running in other
+    processes can merge their own entries without overwriting each other's.
+    """
+
+    def __init__(
+        self,
+        state: dict | None = None,
+        work_dir: str | None = None,
+        persist: Callable[[str, dict], None] | None = None,
+    ):
+        self._state = copy.deepcopy(state) if state else {}
+        self._state.setdefault("stages", {})
+        self._work_dir = work_dir
+        self._persist = persist
+        self._payloads: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> dict:
+        with self._lock:
+            return copy.deepcopy(self._state)
+
+    def stage(self, name: str) -> dict:
+        with self._lock:
+            return dict(self._state["stages"].get(name) or {})
+
+    def _update(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self._state["stages"].setdefault(name, {}).update(fields)
+            snapshot = dict(self._state["stages"][name])
+        if self._persist is not None:
+            try:
+                self._persist(name, snapshot)
+            except Exception as exc:
+                logger.warning("Failed to persist pipeline checkpoint (%s): %s", name, exc)
+
+    def submitted(self, name: str, klangio_job_id: str) -> None:
+        self._update(name, klangio_job_id=klangio_job_id, status="SUBMITTED", artifact=None)
+
+    def payload_path(self, name: str) -> str | None:
+        """Where a stage's JSON payload is saved (None without work_dir).
+        A stage may write its payload there itself and pass it as
+        ``artifact``, e.g. to keep it undecoded."""
+        if self._work_dir is None:
+            return None
+        os.makedirs(self._work_dir, exist_ok=True)
+        return os.path.join(self._work_dir, f"{name}.json")
+
+    def completed(self, name: str, *, artifact: str | None = None, payload: Any = None) -> None:
+        """Mark a stage done. ``payload`` (JSON) is saved under work_dir."""
+        if payload is not None:
+            self._payloads[name] = payload
+            if self._work_dir is not None:
+                artifact = self.payload_path(name)
+                tmp = f"{artifact}.tmp"
+                with open(tmp, "w") as fh:
+                    json.dump(payload, fh)
+                os.replace(tmp, artifact)
+        self._update(name, status="COMPLETED", artifact=artifact)
+
+    def reset(self, name: str) -> None:
+        self._payloads.pop(name, None)
+        self._update(name, klangio_job_id=None, status=None, artifact=None)
+
+    def skipped(self, name: str, error: str) -> None:
+        """Mark an optional stage given up on; the result goes without it."""
+        self._payloads.pop(name, None)
+        self._update(name, klangio_job_id=None, status="SKIPPED", artifact=None, error=error)
+
+    def finished_artifact(self, name: str) -> str | None:
+        """Path of a completed stage's artifact, if it is still on disk."""
+        stage = self.stage(name)
+        artifact = stage.get("artifact")
+        if stage.get("status") == "COMPLETED" and artifact and os.path.isfile(artifact):
+            return artifact
+        return None
+
+    def payload(self, name: str) -> Any:
+        """JSON payload of a completed stage, from memory or disk (else None)."""
+        if name in self._payloads:
+            return self._payloads[name]
+        artifact = self.finished_artifact(name)
+        if artifact is None:
+            return None
+        try:
+            with open(artifact) as fh:
+                return json.load(fh)
+        except (OSError, ValueError) as exc:
+            logger.warning("Unreadable checkpoint payload %s: %s", artifact, exc)
+            return None
@@ -0,0 +1,85 @@
+import logging
+import threading
+from typing import Callable
+
+import redis
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Failure counter shared by all workers through Redis.
+
+    After ``threshold`` upstream failures within ``window`` seconds the
+    circuit opens for ``cooldown`` seconds and callers fail fast. Once the
+    cooldown ends a single probe request is let through (half-open); its
+    success closes the circuit, its failure opens it again.
+
+    Fails open: without Redis every request is allowed.
+
+    A success only writes to Redis if the preceding check() on the same
+    thread saw failures (closed with a count, or half-open), so the healthy
+    path costs one read per request.
+    """
+
+    def __init__(
+        self, name: str, get_redis: Callable[[], redis.Redis],
+        threshold: int = 5, window: float = 60.0, cooldown: float = 30.0,
+    ):
+        self._get_redis = get_redis
+        self._threshold = threshold
+        self._window_ms = int(window * 1000)
+        self._cooldown_ms = int(cooldown * 1000)
+        self._failures_key = f"{name}:circuit:failures"
+        self._open_key = f"{name}:circuit:open"
+        self._probe_key = f"{name}:circuit:probe"
+        self._name = name
+        self._local = threading.local()  # .has_failures, as of this thread's last check()
+
+    def check(self) -> float | None:
+        """None if a request may go ahead, else seconds until the next try."""
+        if self._threshold <= 0:
+            return None
+        self._local.has_failures = False
+        try:
+            r = self._get_redis()
+            open_ms, failures = r.pipeline().pttl(self._open_key).get(self._failures_key).execute()
+            self._local.has_failures = failures is not None
+            if open_ms > 0:
+                return open_ms / 1000
+            if failures is not None and int(failures) >= self._threshold:
+                # Half-open: only one caller probes the upstream.
+                if not r.set(self._probe_key, 1, nx=True, px=self._cooldown_ms):
+                    return max(r.pttl(self._probe_key), 1000) / 1000
+        except redis.RedisError as exc:
+            logger.debug("Circuit breaker %s unavailable: %s", self._name, exc)
+        return None
+
+    def record_success(self) -> None:
+        # Without a check() on this thread, clear to be safe.
+        if not getattr(self._local, "has_failures", True):
+            return
+        try:
+            self._get_redis().delete(self._failures_key, self._probe_key)
+            self._local.has_failures = False
+        except redis.RedisError:
+            pass
+
+    def record_failure(self) -> None:
+        self._local.has_failures = True
+        try:
+            r = self._get_redis()
+            failures, _ = r.pipeline().incr(self._failures_key).pexpire(
+                self._failures_key, self._window_ms,
+            ).execute()
+            if failures >= self._threshold and r.set(
+                self._open_key, 1, nx=True, px=self._cooldown_ms,
+            ):
+                r.delete(self._probe_key)
+                metrics.incr(f"{self._name}.circuit.opened")
+                logger.warning("Circuit %s open after %d failures; failing fast for %.0fs",
+                               self._name, failures, self._cooldown_ms / 1000)
+        except redis.RedisError:
+            pass
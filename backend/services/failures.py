@@ -0,0 +1,63 @@
+"""Failure classification and automatic retry policy for jobs.
+
+A failed job is filed under one of three classes:
+
+- ``upstream_timeout``: Klangio was slow, unreachable or overloaded
+  (timeouts, 5xx, 429, open circuit, a Klangio job that TIMED_OUT).
+  Retried automatically with exponential backoff.
+- ``upstream_rejected``: Klangio refused the request (4xx) or the Klangio
+  job FAILED. Sending the same audio again would fail the same way.
+- ``local``: anything else, usually a bug on our side.
+
+A job that runs out of automatic retries, or fails with a class that is
+not retried, is a dead letter: FAILED with its class and failing stage
+recorded (GET /admin/dead-letters). Every retry, automatic or through
+POST /admin/dead-letters/requeue, resumes from the job's checkpoint.
+"""
+import os
+import random
+
+from rq.timeouts import JobTimeoutException
+
+from services.klangio import KlangioError, KlangioJobFailed
+from services.klangio_poller import PollTimeout
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_retry_attempts: int = int(os.getenv("AUTO_RETRY_ATTEMPTS", "5"))
+_retry_base: float = float(os.getenv("AUTO_RETRY_BASE_SEC", "60"))
+_retry_max: float = float(os.getenv("AUTO_RETRY_MAX_SEC", "3600"))
+
+UPSTREAM_TIMEOUT = "upstream_timeout"
+UPSTREAM_REJECTED = "upstream_rejected"
+LOCAL = "local"
+CLASSES = (UPSTREAM_TIMEOUT, UPSTREAM_REJECTED, LOCAL)
+RETRYABLE = frozenset({UPSTREAM_TIMEOUT})
+
+
+def classify(exc: BaseException, upstream_stage: bool = False) -> str:
+    """Failure class of ``exc``. ``upstream_stage``: it was raised in a stage
+    that waits on Klangio, so a stage timeout counts as Klangio's."""
+    if isinstance(exc, KlangioJobFailed):
+        return UPSTREAM_TIMEOUT if exc.job_status == "TIMED_OUT" else UPSTREAM_REJECTED
+    if isinstance(exc, KlangioError):
+        if exc.transient or (exc.status is not None and exc.status >= 500):
+            return UPSTREAM_TIMEOUT
+        if exc.status is not None:
+            return UPSTREAM_REJECTED
+        return LOCAL  # e.g. an unusable response body
+    if isinstance(exc, PollTimeout):
+        return UPSTREAM_TIMEOUT
+    if isinstance(exc, JobTimeoutException) and upstream_stage:
+        return UPSTREAM_TIMEOUT
+    return LOCAL
+
+
+def retry_delay(failure: str, retries_used: int, exc: BaseException) -> float | None:
+    """Seconds until the next automatic retry, or None if the job is dead."""
+    if failure not in RETRYABLE or retries_used >= _retry_attempts:
+        return None
+    delay = min(_retry_max, _retry_base * 2 ** retries_used) * random.uniform(0.8, 1.2)
+    # An open circuit knows when Klangio is worth trying again.
+    return max(delay, getattr(exc, "retry_after", 0.0))
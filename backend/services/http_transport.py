@@ -0,0 +1,195 @@
+import http.client
+import logging
+import threading
+import time
+import urllib.parse
+from typing import IO, Protocol
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+_REDIRECTS = frozenset({301, 302, 303, 307, 308})
+_MAX_REDIRECTS = 5
+
+# Errors that mean an idle keep-alive connection was closed by the server.
+# Usually it had not read our request, but it may have: only idempotent
+# requests are resent on a fresh connection, other methods only when
+# nothing was sent (CannotSendRequest).
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+)
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+_CHUNK = 64 * 1024
+
+
+class Transport(Protocol):
+    def request(
+        self, method: str, url: str, *,
+        body: bytes | IO[bytes] | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float = 120,
+        sink: IO[bytes] | None = None,
+    ) -> tuple[int, bytes]: ...
+
+
+class _HostPool:
+    """Idle keep-alive connections for one (scheme, host, port)."""
+
+    def __init__(self, scheme: str, host: str, port: int | None, max_size: int):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle: list[tuple[http.client.HTTPConnection, float]] = []
+        self.lock = threading.Lock()
+
+    def new_connection(self, timeout: float) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return cls(self.host, self.port, timeout=timeout, blocksize=_CHUNK)
+
+
+class PooledTransport:
+    """HTTP/1.1 transport with a bounded keep-alive connection pool per host.
+
+    One request is in flight per connection at a time and the response is
+    fully read before the connection goes back to the pool, so reuse never
+    interleaves responses. Safe to share between threads.
+    """
+
+    def __init__(self, max_per_host: int = 8, idle_timeout: float = 60.0):
+        self._max_per_host = max_per_host
+        self._idle_timeout = idle_timeout
+        self._pools: dict[tuple[str, str, int | None], _HostPool] = {}
+        self._lock = threading.Lock()
+
+    def _pool_for(self, scheme: str, host: str, port: int | None) -> _HostPool:
+        key = (scheme, host, port)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = _HostPool(scheme, host, port, self._max_per_host)
+                self._pools[key] = pool
+            return pool
+
+    def _checkout(self, pool: _HostPool, timeout: float) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with pool.lock:
+            while pool.idle:
+                conn, last_used = pool.idle.pop()
+                if now - last_used < self._idle_timeout and conn.sock is not None:
+                    conn.timeout = timeout
+                    conn.sock.settimeout(timeout)
+                    metrics.incr("klangio.http.connections_reused")
+                    return conn, True
+                conn.close()
+        metrics.incr("klangio.http.connections_opened")
+        return pool.new_connection(timeout), False
+
+    def _checkin(self, pool: _HostPool, conn: http.client.HTTPConnection) -> None:
+        with pool.lock:
+            pool.idle.append((conn, time.monotonic()))
+
+    def _send(
+        self, pool: _HostPool, method: str, target: str,
+        body: bytes | IO[bytes] | None, headers: dict[str, str], timeout: float,
+        sink: IO[bytes] | None,
+    ) -> tuple[int, dict[str, str], bytes]:
+        if not pool.slots.acquire(timeout=timeout):
+            raise TimeoutError(f"No free connection to {pool.host} within {timeout}s")
+        # Where this response starts in the sink, to drop a partial body
+        # before resending.
+        sink_start = sink.tell() if sink is not None else None
+        try:
+            for attempt in (1, 2):
+                conn, reused = self._checkout(pool, timeout)
+                try:
+                    conn.request(method, target, body=body, headers=headers)
+                    resp = conn.getresponse()
+                    if sink is not None and 200 <= resp.status < 300:
+                        data = b""
+                        while chunk := resp.read(_CHUNK):
+                            sink.write(chunk)
+                    else:
+                        data = resp.read()
+                except _STALE_ERRORS as exc:
+                    conn.close()
+                    resendable = (method in _IDEMPOTENT_METHODS
+                                  or isinstance(exc, http.client.CannotSendRequest))
+                    if not reused or attempt == 2 or not resendable:
+                        raise
+                    logger.debug("Stale keep-alive connection to %s, reconnecting", pool.host)
+                    if hasattr(body, "seek"):
+                        body.seek(0)
+                    if sink is not None:
+                        sink.seek(sink_start)
+                        sink.truncate()
+                    continue
+                except BaseException:
+                    conn.close()
+                    raise
+                if resp.will_close:
+                    conn.close()
+                else:
+                    self._checkin(pool, conn)
+                return resp.status, dict(resp.getheaders()), data
+        finally:
+            pool.slots.release()
+        raise AssertionError("unreachable")
+
+    def request(
+        self, method: str, url: str, *,
+        body: bytes | IO[bytes] | None = None,
+        headers: dict[str, str] | None = None,
+        timeout: float = 120,
+        sink: IO[bytes] | None = None,
+    ) -> tuple[int, bytes]:
+        """Send a request and return (status, body). Follows redirects.
+
+        With ``sink``, a successful response body is streamed into it in
+        chunks and the returned body is empty.
+        """
+        hdrs = dict(headers or {})
+        for _ in range(_MAX_REDIRECTS + 1):
+            parts = urllib.parse.urlsplit(url)
+            pool = self._pool_for(parts.scheme, parts.hostname or "", parts.port)
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+
+            metrics.incr("klangio.http.requests")
+            status, resp_headers, data = self._send(
+                pool, method, target, body, hdrs, timeout, sink,
+            )
+            location = resp_headers.get("Location") or resp_headers.get("location")
+            if status not in _REDIRECTS or not location:
+                return status, data
+
+            next_url = urllib.parse.urljoin(url, location)
+            if urllib.parse.urlsplit(next_url).netloc != parts.netloc:
+                # Never forward credentials to a different host (e.g. a
+                # presigned storage URL).
+                hdrs = {k: v for k, v in hdrs.items() if k.lower() != "kl-api-key"}
+            if status == 303 or (status in (301, 302) and method == "POST"):
+                method, body = "GET", None
+                hdrs = {k: v for k, v in hdrs.items()
+                        if k.lower() not in ("content-type", "content-length")}
+            if hasattr(body, "seek"):
+                body.seek(0)
+            url = next_url
+        raise RuntimeError(f"Too many redirects for {method} {url}")
+
+    def close(self) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            with pool.lock:
+                for conn, _ in pool.idle:
+                    conn.close()
+                pool.idle.clear()
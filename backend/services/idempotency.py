@@ -0,0 +1,90 @@
+"""Deduplication of repeated POST /jobs submissions.
+
+Every submission gets a key, scoped to its tenant. It is either the
+client's ``Idempotency-Key`` header or, without one, the sha256 of the
+uploaded audio plus the instrument. A second submission with the same key
+within the window returns the first job instead of creating another one
+(and paying Klangio twice).
+
+Redis maps keys to job IDs for the fast path. ``jobs.idempotency_key`` has
+a unique index, and that is what settles concurrent duplicates: the
+losing insert fails, and the route returns the winner's job.
+"""
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+
+import redis
+from sqlalchemy.orm import Session
+
+from database import get_redis
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_window_sec: int = int(os.getenv("IDEMPOTENCY_WINDOW_SEC", str(24 * 3600)))
+_dedup_uploads: bool = os.getenv("UPLOAD_DEDUP_ENABLED", "1") != "0"
+
+MAX_KEY_LENGTH = 255
+
+
+def _redis_key(key: str) -> str:
+    return f"jobs:idempotency:{key}"
+
+
+def submission_key(
+    tenant: str, header_key: str | None, audio_sha256: str, instrument: str,
+) -> str | None:
+    """Key for a submission, or None if it should never be deduplicated."""
+    if header_key:
+        raw = f"{tenant}\0key\0{header_key}"
+    elif _dedup_uploads:
+        raw = f"{tenant}\0audio\0{audio_sha256}\0{instrument.lower()}"
+    else:
+        return None
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def find(db: Session, key: str) -> Job | None:
+    """The job submitted under ``key`` within the window, if any.
+
+    A key held by a job outside the window, or by one that FAILED (so a
+    resubmission can start over), is released here.
+    """
+    job = None
+    try:
+        job_id = get_redis().get(_redis_key(key))
+        if job_id is not None:
+            job = db.query(Job).filter(Job.id == job_id.decode()).first()
+    except redis.RedisError as exc:
+        logger.debug("Idempotency lookup in Redis failed: %s", exc)
+    if job is None or job.idempotency_key != key:
+        job = db.query(Job).filter(Job.idempotency_key == key).first()
+    if job is None:
+        return None
+
+    expired = job.created_at and job.created_at < datetime.utcnow() - timedelta(seconds=_window_sec)
+    if expired or job.status == "FAILED":
+        job.idempotency_key = None
+        db.commit()
+        forget(key)
+        return None
+    return job
+
+
+def remember(key: str, job_id: str) -> None:
+    try:
+        get_redis().set(_redis_key(key), job_id, ex=_window_sec)
+    except redis.RedisError as exc:
+        logger.debug("Failed to cache idempotency key: %s", exc)
+
+
+def forget(key: str) -> None:
+    try:
+        get_redis().delete(_redis_key(key))
+    except redis.RedisError as exc:
+        logger.debug("Failed to drop idempotency key: %s", exc)
@@ -0,0 +1,141 @@
+import json
+import logging
+import time
+from typing import AsyncIterator
+
+import redis
+import redis.asyncio as aioredis
+
+from config import settings
+from database import get_redis
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = frozenset({"READY", "FAILED"})
+
+_SNAPSHOT_TTL = 24 * 3600
+_KEEPALIVE_SEC = 15.0
+
+
+def _channel(job_id: str) -> str:
+    return f"jobs:{job_id}:events"
+
+
+def _snapshot_key(job_id: str) -> str:
+    return f"jobs:{job_id}:status"
+
+
+def _to_hash(event: dict) -> dict:
+    # Redis hashes hold strings only; "" stands for None.
+    return {k: "" if v is None else v for k, v in event.items()}
+
+
+def _from_hash(raw: dict) -> dict | None:
+    if not raw:
+        return None
+    event = {k.decode(): v.decode() or None for k, v in raw.items()}
+    if event.get("progress") is not None:
+        event["progress"] = int(event["progress"])
+    if event.get("ts") is not None:
+        event["ts"] = float(event["ts"])
+    return event
+
+
+def publish(job_id: str, status: str, progress: int | None = None, error: str | None = None) -> None:
+    """Announce a job status change to /jobs/{id}/events subscribers.
+
+    The latest event is also kept in the hash ``jobs:{id}:status`` for
+    clients that connect later and for status-only GET /jobs/{id}
+    requests. Best-effort: a Redis outage never fails the pipeline.
+    """
+    try:
+        _queue_event(get_redis().pipeline(), job_id, status, progress, error).execute()
+    except redis.RedisError as exc:
+        logger.debug("Job %s: failed to publish %s event: %s", job_id, status, exc)
+
+
+def publish_many(job_ids: list[str], status: str, progress: int | None = None) -> None:
+    """publish() for many jobs in one Redis round trip (e.g. a bulk import)."""
+    if not job_ids:
+        return
+    try:
+        pipe = get_redis().pipeline()
+        for job_id in job_ids:
+            _queue_event(pipe, job_id, status, progress, None)
+        pipe.execute()
+    except redis.RedisError as exc:
+        logger.debug("Failed to publish %s events for %d jobs: %s", status, len(job_ids), exc)
+
+
+def _queue_event(
+    pipe: redis.client.Pipeline, job_id: str, status: str, progress: int | None, error: str | None,
+) -> redis.client.Pipeline:
+    event = {
+        "job_id": job_id,
+        "status": status,
+        "progress": progress,
+        "error": error,
+        "ts": round(time.time(), 3),
+    }
+    key = _snapshot_key(job_id)
+    return (pipe
+            .hset(key, mapping=_to_hash(event))
+            .expire(key, _SNAPSHOT_TTL)
+            .publish(_channel(job_id), json.dumps(event)))
+
+
+def get_status(job_id: str) -> dict | None:
+    """Latest published event for a job, or None if there is none (or Redis
+    is unreachable)."""
+    try:
+        return _from_hash(get_redis().hgetall(_snapshot_key(job_id)))
+    except redis.RedisError as exc:
+        logger.debug("Job %s: status snapshot unavailable: %s", job_id, exc)
+        return None
+
+
+_async_client: aioredis.Redis | None = None
+
+
+def _get_async_redis() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.redis_url)
+    return _async_client
+
+
+def _sse(data: str) -> str:
+    return f"event: status\ndata: {data}\n\n"
+
+
+async def stream(job_id: str, fallback: dict, is_disconnected) -> AsyncIterator[str]:
+    """SSE frames for one job: the current status first, then every change
+    until the job is READY or FAILED.
+
+    ``fallback`` is the event sent first when no snapshot is in Redis (e.g.
+    a job created before this existed); ``is_disconnected`` is the request's
+    coroutine of that name.
+    """
+    r = _get_async_redis()
+    pubsub = r.pubsub()
+    try:
+        # Subscribe before reading the snapshot so no transition falls between.
+        await pubsub.subscribe(_channel(job_id))
+        current = _from_hash(await r.hgetall(_snapshot_key(job_id))) or fallback
+        yield _sse(json.dumps(current))
+        if current["status"] in TERMINAL_STATUSES:
+            return
+
+        while not await is_disconnected():
+            message = await pubsub.get_message(
+                ignore_subscribe_messages=True, timeout=_KEEPALIVE_SEC,
+            )
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            data = message["data"].decode()
+            yield _sse(data)
+            if json.loads(data)["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        await pubsub.aclose()
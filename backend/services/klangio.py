@@ -1,11 +1,25 @@
+import http.client
 import json
 import logging
 import os
+import random
+import socket
+import threading
 import time
-import urllib.error
 import urllib.parse
-import urllib.request
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
+from typing import IO, Any, Callable
+
+from database import get_redis
+from services import blobstore, metrics
+from services.checkpoint import PipelineCheckpoint
+from services.circuit_breaker import CircuitBreaker
+from services.http_transport import PooledTransport, Transport
+from services.klangio_columnar import LazyNotes, parse_transcription
+from services.klangio_poller import KlangioPoller, get_poller
+from services.rate_limit import KlangioGovernor, parse_budgets
 
 logger = logging.getLogger(__name__)
 
@@ -16,11 +30,81 @@ _api_key: str | None = os.getenv("KLANGIO_API_KEY")
 _base_url: str = os.getenv("KLANGIO_BASE_URL", "https://api.klang.io").rstrip("/")
 _model: str = os.getenv("KLANGIO_MODEL", "universal")
 _poll_interval: int = int(os.getenv("KLANGIO_POLL_INTERVAL_SEC", "2"))
+_poll_max_interval: int = int(os.getenv("KLANGIO_POLL_MAX_INTERVAL_SEC", "15"))
+_poll_workers: int = int(os.getenv("KLANGIO_POLL_WORKERS", "4"))
 _poll_timeout: int = int(os.getenv("KLANGIO_POLL_TIMEOUT_SEC", "180"))
+_poll_timeout_per_min: int = int(os.getenv("KLANGIO_POLL_TIMEOUT_PER_AUDIO_MIN_SEC", "45"))
+_pool_size: int = int(os.getenv("KLANGIO_POOL_SIZE", "8"))
+_pool_idle: float = float(os.getenv("KLANGIO_POOL_IDLE_SEC", "60"))
+_rate_limit_enabled: bool = os.getenv("KLANGIO_RATE_LIMIT_ENABLED", "1") != "0"
+# kind=requests_per_sec:burst:max_in_flight, shared by all workers
+_budgets: str = os.getenv(
+    "KLANGIO_BUDGETS", "upload=1:4:4,poll=10:20:16,download=4:8:8"
+)
+_budget_wait: float = float(os.getenv("KLANGIO_BUDGET_WAIT_SEC", "300"))
+_retry_attempts: int = int(os.getenv("KLANGIO_RETRY_ATTEMPTS", "4"))
+_retry_base: float = float(os.getenv("KLANGIO_RETRY_BASE_SEC", "0.5"))
+_retry_max: float = float(os.getenv("KLANGIO_RETRY_MAX_SEC", "8"))
+_circuit_threshold: int = int(os.getenv("KLANGIO_CIRCUIT_THRESHOLD", "5"))
+_circuit_window: float = float(os.getenv("KLANGIO_CIRCUIT_WINDOW_SEC", "60"))
+_circuit_cooldown: float = float(os.getenv("KLANGIO_CIRCUIT_COOLDOWN_SEC", "30"))
+_columnar_adapter: bool = os.getenv("KLANGIO_COLUMNAR_ADAPTER", "0") == "1"
+
+_CHORD_VOCABULARY = "full"
 
 _BOUNDARY = "----KlangioFormBoundary9f3c2a"
 _TERMINAL = frozenset({"COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT"})
 
+# Responses worth another try; 429/503 also mean the request was not acted on.
+_RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+_NOT_PROCESSED_STATUSES = frozenset({429, 503})
+# Transport errors raised before any request bytes reached the server.
+_NOT_SENT_ERRORS = (ConnectionRefusedError, socket.gaierror, http.client.CannotSendRequest)
+
+
+class KlangioError(RuntimeError):
+    """A failed Klangio API call.
+
+    ``transient`` errors (timeouts, resets, 5xx, 429) are expected to go away
+    on their own; the worker parks the job instead of failing it.
+    """
+
+    def __init__(
+        self, message: str, *, status: int | None = None,
+        transient: bool = False, resendable: bool = False,
+    ):
+        super().__init__(message)
+        self.status = status
+        self.transient = transient
+        # True when the server certainly did not act on the request, so even
+        # a non-idempotent submission may be sent again.
+        self.resendable = resendable
+
+
+class KlangioJobFailed(KlangioError):
+    """A Klangio job ended FAILED, CANCELLED or TIMED_OUT (``job_status``)."""
+
+    def __init__(self, message: str, job_status: str):
+        super().__init__(message)
+        self.job_status = job_status
+
+
+class KlangioUnavailable(KlangioError):
+    """The circuit breaker is open: Klangio is failing, calls fail fast."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, transient=True)
+        self.retry_after = retry_after
+
+
+class KlangioBudgetExhausted(KlangioError):
+    """No request budget freed up within KLANGIO_BUDGET_WAIT_SEC; nothing
+    was sent (raised by the governor, services/rate_limit.py)."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message, transient=True, resendable=True)
+        self.retry_after = retry_after
+
 
 def _require_api_key() -> str:
     if not _api_key:
@@ -32,10 +116,94 @@ def _require_api_key() -> str:
 # HTTP helpers (stdlib only — no new dependencies)
 # ---------------------------------------------------------------------------
 
+# Shared by every call in this worker process so status polls, uploads and
+# downloads reuse keep-alive connections instead of paying a TLS handshake each.
+_transport: Transport = PooledTransport(max_per_host=_pool_size, idle_timeout=_pool_idle)
+
+
+# Cluster-wide request budgets (token bucket + in-flight cap per request kind).
+_governor: KlangioGovernor | None = (
+    KlangioGovernor(parse_budgets(_budgets), get_redis, exhausted=KlangioBudgetExhausted)
+    if _rate_limit_enabled else None
+)
+
+
+# Shared across workers: repeated upstream failures make every caller fail fast.
+_breaker = CircuitBreaker(
+    "klangio", get_redis,
+    threshold=_circuit_threshold, window=_circuit_window, cooldown=_circuit_cooldown,
+)
+
+
+def get_governor() -> KlangioGovernor | None:
+    return _governor
+
+
+def get_transport() -> Transport:
+    return _transport
+
+
+def set_transport(transport: Transport) -> None:
+    """Swap the HTTP transport (e.g. for a fake in load tests)."""
+    global _transport
+    _transport = transport
+
+
+class _MultipartStream:
+    """Read-only file object yielding a multipart/form-data body.
+
+    The audio file is streamed from disk in the transport's block size, so
+    memory use does not grow with the upload. ``len()`` is the exact body
+    size, used as Content-Length.
+    """
+
+    def __init__(self, head: bytes, audio_path: str, tail: bytes):
+        self._head = head
+        self._tail = tail
+        self._fh = open(audio_path, "rb")
+        file_size = os.fstat(self._fh.fileno()).st_size
+        self._file_start = len(head)
+        self._file_end = self._file_start + file_size
+        self._length = self._file_end + len(tail)
+        self._pos = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self._length - self._pos
+        if self._pos < self._file_start:
+            chunk = self._head[self._pos:self._pos + size]
+        elif self._pos < self._file_end:
+            chunk = self._fh.read(min(size, self._file_end - self._pos))
+        else:
+            offset = self._pos - self._file_end
+            chunk = self._tail[offset:offset + size]
+        self._pos += len(chunk)
+        return chunk
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if (offset, whence) != (0, 0):
+            raise OSError("_MultipartStream only supports rewinding to the start")
+        self._pos = 0
+        self._fh.seek(0)
+        return 0
+
+    def close(self) -> None:
+        self._fh.close()
+
+    def __enter__(self) -> "_MultipartStream":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
 def _multipart_body(
     audio_path: str, extra_fields: dict[str, str] | None = None
-) -> tuple[bytes, str]:
-    """Build a multipart/form-data body with the audio file + optional fields."""
+) -> tuple[_MultipartStream, str]:
+    """Build a streaming multipart/form-data body with the audio file + optional fields."""
     parts: list[bytes] = []
 
     for name, value in (extra_fields or {}).items():
@@ -49,13 +217,7 @@ def _multipart_body(
 
     filename = Path(audio_path).name
     ext = Path(audio_path).suffix.lower()
-    mime = {
-        ".mp3": "audio/mpeg", ".wav": "audio/wav", ".flac": "audio/flac",
-        ".ogg": "audio/ogg", ".m4a": "audio/mp4", ".aac": "audio/aac",
-    }.get(ext, "application/octet-stream")
-
-    with open(audio_path, "rb") as fh:
-        file_bytes = fh.read()
+    mime = blobstore.media_type(ext)
 
     parts.append(
         f"--{_BOUNDARY}\r\n"
@@ -63,43 +225,122 @@ def _multipart_body(
         f"Content-Type: {mime}\r\n"
         f"\r\n"
         .encode()
-        + file_bytes
-        + b"\r\n"
     )
+    tail = f"\r\n--{_BOUNDARY}--\r\n".encode()
+    body = _MultipartStream(b"".join(parts), audio_path, tail)
+    return body, f"multipart/form-data; boundary={_BOUNDARY}"
 
-    parts.append(f"--{_BOUNDARY}--\r\n".encode())
-    return b"".join(parts), f"multipart/form-data; boundary={_BOUNDARY}"
+
+def _send_once(
+    method: str, path: str, body: bytes | _MultipartStream | None,
+    headers: dict[str, str], timeout: int, sink: IO[bytes] | None, kind: str,
+) -> bytes:
+    """One attempt of a Klangio request; failures become KlangioError and
+    are reported to the circuit breaker."""
+    url = f"{_base_url}{path}"
+    try:
+        if _governor is None:
+            status, data = _transport.request(
+                method, url, body=body, headers=headers, timeout=timeout, sink=sink,
+            )
+        else:
+            with _governor.acquire(kind, _budget_wait, lease_ttl=timeout + 30):
+                status, data = _transport.request(
+                    method, url, body=body, headers=headers, timeout=timeout, sink=sink,
+                )
+    except (OSError, http.client.HTTPException) as exc:
+        _breaker.record_failure()
+        raise KlangioError(
+            f"Klangio request failed on {method} {path}: {exc!r}",
+            transient=True, resendable=isinstance(exc, _NOT_SENT_ERRORS),
+        ) from exc
+
+    if status >= 500:
+        _breaker.record_failure()
+    else:
+        _breaker.record_success()
+    if status >= 400:
+        err = data.decode(errors="replace")
+        raise KlangioError(
+            f"Klangio API {status} on {method} {path}: {err}", status=status,
+            transient=status in _RETRY_STATUSES,
+            resendable=status in _NOT_PROCESSED_STATUSES,
+        )
+    return data
 
 
 def _request(
-    method: str, path: str, *, body: bytes | None = None,
+    method: str, path: str, *, body: bytes | _MultipartStream | None = None,
     headers: dict[str, str] | None = None,
     timeout: int = 120,
+    sink: IO[bytes] | None = None,
+    kind: str | None = None,
+    idempotent: bool | None = None,
 ) -> bytes:
-    """Authenticated Klangio API request → raw response bytes."""
-    url = f"{_base_url}{path}"
+    """Authenticated Klangio API request → raw response bytes.
+
+    With ``sink`` the response body is streamed into it and b"" is returned.
+    ``kind`` picks the rate-limit budget ("upload", "poll" or "download");
+    by default it is derived from the method and path.
+
+    Transient failures are retried with jittered exponential backoff.
+    Idempotent requests (GETs by default) retry on any transient failure;
+    submissions only when the server certainly did not act on them. Raises
+    KlangioUnavailable without calling out while the circuit is open.
+    """
     hdrs: dict[str, str] = {"kl-api-key": _require_api_key()}
     if headers:
         hdrs.update(headers)
-
-    req = urllib.request.Request(url, data=body, method=method, headers=hdrs)
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            return resp.read()
-    except urllib.error.HTTPError as exc:
-        err = exc.read().decode(errors="replace")
-        raise RuntimeError(
-            f"Klangio API {exc.code} on {method} {path}: {err}"
-        ) from exc
-
-
-def _post_json(path: str, body: bytes, content_type: str) -> dict:
-    raw = _request("POST", path, body=body, headers={"Content-Type": content_type})
+    if kind is None:
+        if method == "POST":
+            kind = "upload"
+        elif path.endswith("/status"):
+            kind = "poll"
+        else:
+            kind = "download"
+    if idempotent is None:
+        idempotent = method == "GET"
+
+    sink_start = sink.tell() if sink is not None else None
+    for attempt in range(1, _retry_attempts + 1):
+        retry_after = _breaker.check()
+        if retry_after is not None:
+            metrics.incr("klangio.circuit.rejected")
+            raise KlangioUnavailable(
+                f"Klangio unavailable (circuit open) on {method} {path}", retry_after,
+            )
+        if attempt > 1:
+            if hasattr(body, "seek"):
+                body.seek(0)
+            if sink is not None:
+                sink.seek(sink_start)
+                sink.truncate()
+        try:
+            return _send_once(method, path, body, hdrs, timeout, sink, kind)
+        except KlangioError as exc:
+            retryable = exc.transient and (idempotent or exc.resendable)
+            if isinstance(exc, KlangioBudgetExhausted):
+                retryable = False  # it has waited long enough; RQ parks the stage
+            if not retryable or attempt == _retry_attempts:
+                raise
+            # Full jitter, so workers hit by the same blip spread out.
+            delay = random.uniform(0, min(_retry_max, _retry_base * 2 ** (attempt - 1)))
+            metrics.incr("klangio.http.retries")
+            logger.warning("%s; retrying in %.1fs (attempt %d/%d)",
+                           exc, delay, attempt + 1, _retry_attempts)
+            time.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def _post_json(path: str, body: _MultipartStream, content_type: str) -> dict:
+    raw = _request("POST", path, body=body, headers={
+        "Content-Type": content_type, "Content-Length": str(len(body)),
+    })
     return json.loads(raw)
 
 
-def _get_json(path: str) -> dict:
-    raw = _request("GET", path)
+def _get_json(path: str, timeout: int = 120) -> dict:
+    raw = _request("GET", path, timeout=timeout)
     return json.loads(raw)
 
 
@@ -130,7 +371,8 @@ def _submit_source_separation(audio_path: str, model: str = "four-stems") -> str
     """Upload audio and create a Klangio source separation job. Returns job_id."""
     body, ct = _multipart_body(audio_path)
     sep_model = urllib.parse.quote(model)
-    data = _post_json(f"/source-separation?model={sep_model}&output=wav", body, ct)
+    with body:
+        data = _post_json(f"/source-separation?model={sep_model}&output=wav", body, ct)
 
     job_id = data.get("job_id")
     if not job_id:
@@ -140,17 +382,26 @@ def _submit_source_separation(audio_path: str, model: str = "four-stems") -> str
     return str(job_id)
 
 
-def _fetch_stem_audio(klangio_job_id: str, stem_type: str) -> bytes:
-    """Download a separated stem as raw audio bytes."""
+def _fetch_stem_audio(klangio_job_id: str, stem_type: str, dest_path: str) -> int:
+    """Stream a separated stem straight to ``dest_path``. Returns its size."""
     stem = urllib.parse.quote(stem_type)
-    return _request("GET", f"/job/{klangio_job_id}/audio?stem_type={stem}")
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _request("GET", f"/job/{klangio_job_id}/audio?stem_type={stem}", sink=f)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return os.path.getsize(dest_path)
 
 
 def submit_transcription(audio_path: str) -> str:
     """Upload audio and create a Klangio transcription job. Returns job_id."""
     body, ct = _multipart_body(audio_path, extra_fields={"outputs": "midi,mxml,pdf"})
     model = urllib.parse.quote(_model)
-    data = _post_json(f"/transcription?model={model}", body, ct)
+    with body:
+        data = _post_json(f"/transcription?model={model}", body, ct)
 
     job_id = data.get("job_id")
     if not job_id:
@@ -163,7 +414,8 @@ def submit_transcription(audio_path: str) -> str:
 def _submit_beat_tracking(audio_path: str) -> str:
     """Upload audio and create a Klangio beat tracking job. Returns job_id."""
     body, ct = _multipart_body(audio_path)
-    data = _post_json("/beat-tracking", body, ct)
+    with body:
+        data = _post_json("/beat-tracking", body, ct)
 
     job_id = data.get("job_id")
     if not job_id:
@@ -176,7 +428,9 @@ def _submit_beat_tracking(audio_path: str) -> str:
 def _submit_chord_recognition(audio_path: str) -> str:
     """Upload audio and create a Klangio chord recognition job. Returns job_id."""
     body, ct = _multipart_body(audio_path)
-    data = _post_json("/chord-recognition?vocabulary=full", body, ct)
+    vocabulary = urllib.parse.quote(_CHORD_VOCABULARY)
+    with body:
+        data = _post_json(f"/chord-recognition?vocabulary={vocabulary}", body, ct)
 
     job_id = data.get("job_id")
     if not job_id:
@@ -188,7 +442,7 @@ def _submit_chord_recognition(audio_path: str) -> str:
 
 def poll_status(klangio_job_id: str) -> tuple[str, str | None]:
     """Check Klangio job status. Returns (status, error_message)."""
-    data = _get_json(f"/job/{klangio_job_id}/status")
+    data = _get_json(f"/job/{klangio_job_id}/status", timeout=30)
     status = data.get("status", "UNKNOWN")
     if status == "FAILED":
         logger.error("Klangio status response for %s: %s", klangio_job_id, data)
@@ -202,6 +456,19 @@ def fetch_result_json(klangio_job_id: str) -> dict:
     return json.loads(raw)
 
 
+def fetch_result_json_to(klangio_job_id: str, dest_path: str) -> None:
+    """Stream the JSON result of a completed Klangio job to ``dest_path``,
+    undecoded (for the columnar adapter)."""
+    tmp_path = f"{dest_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _request("GET", f"/job/{klangio_job_id}/json", sink=f)
+        os.replace(tmp_path, dest_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def fetch_job_xml(klangio_job_id: str) -> bytes:
     """Download MusicXML result for a completed Klangio job."""
     return _request("GET", f"/job/{klangio_job_id}/xml")
@@ -212,27 +479,144 @@ def fetch_job_pdf(klangio_job_id: str) -> bytes:
     return _request("GET", f"/job/{klangio_job_id}/pdf")
 
 
-def _poll_until_terminal(job_id: str, label: str) -> tuple[str, str | None]:
-    """Block-poll a Klangio job until terminal status or timeout.
+def _make_poller() -> KlangioPoller:
+    return KlangioPoller(
+        lambda job_id: poll_status(job_id), _TERMINAL,
+        min_interval=_poll_interval, max_interval=_poll_max_interval,
+        workers=_poll_workers,
+        is_transient=lambda exc: isinstance(exc, KlangioError) and exc.transient,
+    )
+
+
+def poll_timeout(audio_sec: float | None) -> float:
+    """How long to wait for one Klangio job on a recording of ``audio_sec``
+    seconds: KLANGIO_POLL_TIMEOUT_SEC plus so much per minute of audio."""
+    if not audio_sec:
+        return _poll_timeout
+    return _poll_timeout + _poll_timeout_per_min * audio_sec / 60
+
+
+def _poll_until_terminal(
+    job_id: str, label: str, cancel: threading.Event | None = None,
+    timeout: float | None = None,
+) -> tuple[str, str | None]:
+    """Block until a Klangio job reaches terminal status or times out
+    (after ``timeout`` seconds, default KLANGIO_POLL_TIMEOUT_SEC).
+
+    Polling is delegated to the process-wide KlangioPoller, which spaces
+    status requests by historical stage duration. If ``cancel`` is set while
+    waiting (e.g. a sibling stage failed), this raises RuntimeError early.
 
     Returns (status, error_message).
     """
-    deadline = time.monotonic() + _poll_timeout
-    while True:
-        status, error_msg = poll_status(job_id)
-        logger.info("Klangio %s %s → %s%s", label, job_id, status,
-                     f" ({error_msg})" if error_msg else "")
-        if status in _TERMINAL:
-            return status, error_msg
-        if time.monotonic() >= deadline:
-            raise RuntimeError("Klangio job timed out")
-        time.sleep(_poll_interval)
+    return get_poller(_make_poller).wait(job_id, label, timeout or _poll_timeout, cancel)
+
+
+# ---------------------------------------------------------------------------
+# Stage DAG executor
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class _Stage:
+    """One node of the ingest DAG.
+
+    ``run`` receives the results of its ``deps`` keyed by stage name.
+    Optional stages log and resolve to None on failure instead of
+    aborting the whole pipeline — unless Klangio itself is unavailable, in
+    which case the pipeline stops so the retried job runs them again.
+    """
+    name: str
+    run: Callable[[dict[str, Any]], Any]
+    deps: tuple[str, ...] = ()
+    optional: bool = False
+
+
+def _run_stages(
+    stages: list[_Stage], cancel: threading.Event | None = None,
+) -> dict[str, Any]:
+    """Run stages concurrently, each one as soon as its dependencies finish.
+
+    Returns {stage_name: result}. A failing required stage sets ``cancel``
+    (so in-flight polls stop) and its exception is re-raised.
+    """
+    cancel = cancel or threading.Event()
+    pending = {s.name: s for s in stages}
+    unknown = {d for s in stages for d in s.deps} - pending.keys()
+    if unknown:
+        raise ValueError(f"Unknown stage dependencies: {sorted(unknown)}")
+
+    results: dict[str, Any] = {}
+    running: dict[Future, tuple[_Stage, float]] = {}
+    t0 = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix="klangio-stage")
+    try:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(d in results for d in stage.deps):
+                    del pending[name]
+                    deps = {d: results[d] for d in stage.deps}
+                    running[pool.submit(stage.run, deps)] = (stage, time.monotonic())
+            if not running:
+                raise RuntimeError(f"Stage dependency cycle: {sorted(pending)}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                stage, started = running.pop(fut)
+                try:
+                    results[stage.name] = fut.result()
+                except Exception as exc:
+                    if not stage.optional or isinstance(exc, KlangioUnavailable):
+                        raise
+                    logger.warning("Klangio %s failed, continuing without: %s", stage.name, exc)
+                    results[stage.name] = None
+                logger.info("Klangio stage %s finished in %.1fs", stage.name,
+                            time.monotonic() - started)
+    except BaseException:
+        cancel.set()
+        raise
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    logger.info("Klangio stages finished in %.1fs (wall clock)", time.monotonic() - t0)
+    return results
 
 
 # ---------------------------------------------------------------------------
 # Adapter
 # ---------------------------------------------------------------------------
 
+def _adapt_chords(chord_payload: list | dict | None) -> list[dict]:
+    """Klangio chord recognition JSON → [{symbol, start_sec, end_sec}, ...]."""
+    chords: list[dict] = []
+    chord_src = chord_payload if chord_payload is not None else []
+    if isinstance(chord_src, list):
+        for c in chord_src:
+            if isinstance(c, list) and len(c) >= 3:
+                sym = str(c[2])
+                if sym.upper() in ("N", "N.C.", "NC", "NONE"):
+                    continue
+                chords.append({
+                    "symbol": sym,
+                    "start_sec": round(float(c[0]), 4),
+                    "end_sec": round(float(c[1]), 4),
+                })
+    elif isinstance(chord_src, dict):
+        for c in chord_src.get("chords", []):
+            sym = str(c.get("symbol", ""))
+            start = c.get("start_sec") or c.get("start")
+            end = c.get("end_sec") or c.get("end")
+            if not sym or start is None:
+                continue
+            if sym.upper() in ("N", "N.C.", "NC", "NONE"):
+                continue
+            chords.append({
+                "symbol": sym,
+                "start_sec": round(float(start), 4),
+                "end_sec": round(float(end), 4) if end is not None else None,
+            })
+    return chords
+
+
 def adapt_klangio_json_to_transcription_result(
     payload: dict, chord_payload: list | dict | None = None,
 ) -> dict:
@@ -291,34 +675,7 @@ def adapt_klangio_json_to_transcription_result(
                     pos += dur_frac
             measure_start += measure_sec
 
-    # --- Chords ---
-    chords: list[dict] = []
-    chord_src = chord_payload if chord_payload is not None else []
-    if isinstance(chord_src, list):
-        for c in chord_src:
-            if isinstance(c, list) and len(c) >= 3:
-                sym = str(c[2])
-                if sym.upper() in ("N", "N.C.", "NC", "NONE"):
-                    continue
-                chords.append({
-                    "symbol": sym,
-                    "start_sec": round(float(c[0]), 4),
-                    "end_sec": round(float(c[1]), 4),
-                })
-    elif isinstance(chord_src, dict):
-        for c in chord_src.get("chords", []):
-            sym = str(c.get("symbol", ""))
-            start = c.get("start_sec") or c.get("start")
-            end = c.get("end_sec") or c.get("end")
-            if not sym or start is None:
-                continue
-            if sym.upper() in ("N", "N.C.", "NC", "NONE"):
-                continue
-            chords.append({
-                "symbol": sym,
-                "start_sec": round(float(start), 4),
-                "end_sec": round(float(end), 4) if end is not None else None,
-            })
+    chords = _adapt_chords(chord_payload)
 
     return {
         "notes": notes,
@@ -330,112 +687,327 @@ def adapt_klangio_json_to_transcription_result(
     }
 
 
+def adapt_klangio_json_columnar(
+    payload: dict | bytes | str | IO[bytes], chord_payload: list | dict | None = None,
+) -> dict:
+    """Same result as adapt_klangio_json_to_transcription_result, for large
+    transcriptions.
+
+    ``payload`` may also be the raw JSON (bytes, file path or file object),
+    parsed incrementally when ijson is installed. Notes are kept as packed
+    columns (``note_columns``); ``notes`` is a LazyNotes sequence that
+    builds the per-note dicts only when first indexed or serialised.
+    """
+    columns, info = parse_transcription(payload)
+    return {
+        "notes": LazyNotes(columns),
+        "note_columns": columns,
+        "chords": _adapt_chords(chord_payload),
+        "audio_offset": info["audio_offset"],
+        "tempo_bpm": info["tempo"],
+        "time_signature": info["time_signature"],
+        "audio_offset_sec": info["audio_offset"],
+    }
+
+
 # ---------------------------------------------------------------------------
 # Public entry point (called by workers/tasks.py)
 # ---------------------------------------------------------------------------
 
-def transcribe(audio_path: str, instrument: str) -> dict:
-    """Full Klangio transcription pipeline.
-
-    If the instrument maps to a known stem, runs source separation first,
-    then transcribes the isolated stem. Otherwise transcribes the original audio.
-
-    Pipeline: [source separation] → transcription + chord recognition → adapt.
+def _submit_and_wait(
+    name: str, label: str, submit: Callable[[], str],
+    checkpoint: PipelineCheckpoint, cancel: threading.Event, timeout: float | None = None,
+) -> tuple[str, str, str | None]:
+    """Submit a Klangio job — or resume the one recorded in the checkpoint —
+    and wait for it to finish. Returns (klangio_job_id, status, error)."""
+    job_id = checkpoint.stage(name).get("klangio_job_id")
+    if job_id:
+        logger.info("Resuming Klangio %s job %s", label, job_id)
+        try:
+            status, err = _poll_until_terminal(job_id, label, cancel, timeout)
+            if status == "COMPLETED":
+                return job_id, status, err
+            logger.warning("Resumed Klangio %s job %s ended %s, resubmitting", label, job_id, status)
+        except RuntimeError as exc:
+            if cancel.is_set() or (isinstance(exc, KlangioError) and exc.transient):
+                raise  # Klangio is flaky, not the job: keep it for the next attempt
+            logger.warning("Cannot resume Klangio %s job %s (%s), resubmitting", label, job_id, exc)
+
+    job_id = submit()
+    checkpoint.submitted(name, job_id)
+    status, err = _poll_until_terminal(job_id, label, cancel, timeout)
+    return job_id, status, err
+
+
+def _pipeline_stages(
+    audio_path: str, instrument: str, checkpoint: PipelineCheckpoint,
+    out_dir: str, cancel: threading.Event, audio_sec: float | None = None,
+) -> tuple[list[_Stage], dict[str, Callable[[], Any]]]:
+    """The ingest DAG for one recording, plus for every stage a function that
+    returns its result from ``checkpoint`` (None if it has not completed).
+
+    ``audio_sec``, the recording's length if known, sets the poll timeout.
     """
-    logger.info(
-        "Starting Klangio transcription: audio_path=%s instrument=%s",
-        audio_path, instrument,
-    )
-
-    # 0. Source separation (if instrument maps to a stem)
-    transcribe_path = audio_path
     stem_info = _instrument_to_stem(instrument)
-    if stem_info:
+    timeout = poll_timeout(audio_sec)
+
+    def transcription_done() -> str | None:
+        stage = checkpoint.stage("transcription")
+        return stage.get("klangio_job_id") if stage.get("status") == "COMPLETED" else None
+
+    def transcription_json() -> Any:
+        # The columnar adapter parses the saved file itself, incrementally.
+        if _columnar_adapter:
+            path = checkpoint.finished_artifact("transcription")
+            if path:
+                return path
+        return checkpoint.payload("transcription")
+
+    restore: dict[str, Callable[[], Any]] = {
+        "separation": lambda: checkpoint.finished_artifact("separation"),
+        "transcription": transcription_done,
+        "transcription_json": transcription_json,
+        "xml": lambda: checkpoint.finished_artifact("xml"),
+        "chords": lambda: checkpoint.payload("chords"),
+        "beats": lambda: checkpoint.payload("beats"),
+    }
+
+    def run_separation(_deps: dict) -> str:
         stem_type, sep_model = stem_info
+        stem_path = restore["separation"]()
+        if stem_path:
+            logger.info("Source separation already done: %s", stem_path)
+            return stem_path
+
         logger.info("Running source separation: stem=%s model=%s", stem_type, sep_model)
-        sep_id = _submit_source_separation(audio_path, model=sep_model)
-        sep_status, sep_err = _poll_until_terminal(sep_id, "source-separation")
+        sep_id, sep_status, sep_err = _submit_and_wait(
+            "separation", "source-separation",
+            lambda: _submit_source_separation(audio_path, model=sep_model),
+            checkpoint, cancel, timeout,
+        )
         if sep_status != "COMPLETED":
-            raise RuntimeError(
-                f"Source separation failed: {sep_err or sep_status}"
+            raise KlangioJobFailed(
+                f"Source separation failed: {sep_err or sep_status}", sep_status,
             )
         # Download the stem and save next to the original audio
-        stem_bytes = _fetch_stem_audio(sep_id, stem_type)
         stem_path = str(Path(audio_path).parent / f"stem_{stem_type}.wav")
-        with open(stem_path, "wb") as f:
-            f.write(stem_bytes)
-        logger.info("Stem saved: %s (%d bytes)", stem_path, len(stem_bytes))
-        transcribe_path = stem_path
+        stem_size = _fetch_stem_audio(sep_id, stem_type, stem_path)
+        logger.info("Stem saved: %s (%d bytes)", stem_path, stem_size)
+        checkpoint.completed("separation", artifact=stem_path)
+        return stem_path
+
+    def run_transcription(deps: dict) -> str:
+        done_id = restore["transcription"]()
+        if done_id:
+            return done_id
+
+        transcribe_path = deps.get("separation") or audio_path
+        transcription_id, status, error_msg = _submit_and_wait(
+            "transcription", "transcription",
+            lambda: submit_transcription(transcribe_path),
+            checkpoint, cancel, timeout,
+        )
+        if status == "FAILED":
+            raise KlangioJobFailed(f"Klangio job failed: {error_msg or 'unknown error'}", status)
+        if status != "COMPLETED":
+            raise KlangioJobFailed(f"Klangio transcription ended with status: {status}", status)
+        checkpoint.completed("transcription")
+        return transcription_id
+
+    def run_transcription_json(deps: dict) -> dict | str:
+        payload = restore["transcription_json"]()
+        if payload is not None:
+            return payload
+        path = checkpoint.payload_path("transcription") if _columnar_adapter else None
+        if path is not None:
+            # Never decoded here: build_result hands the file to the columnar adapter.
+            fetch_result_json_to(deps["transcription"], path)
+            checkpoint.completed("transcription", artifact=path)
+            return path
+        payload = fetch_result_json(deps["transcription"])
+        checkpoint.completed("transcription", payload=payload)
+        return payload
+
+    def run_transcription_xml(deps: dict) -> str:
+        xml_path = restore["xml"]()
+        if xml_path:
+            return xml_path
+        xml_bytes = fetch_job_xml(deps["transcription"])
+        os.makedirs(out_dir, exist_ok=True)
+        xml_path = os.path.join(out_dir, "transcription.musicxml")
+        tmp_path = f"{xml_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(xml_bytes)
+        os.replace(tmp_path, xml_path)
+        logger.info("Klangio XML saved: %s (%d bytes)", xml_path, len(xml_bytes))
+        checkpoint.completed("xml", artifact=xml_path)
+        return xml_path
+
+    def best_effort(name: str, submit: Callable[[str], str], label: str) -> Callable[[dict], Any]:
+        def run(_deps: dict) -> Any:
+            payload = restore[name]()
+            if payload is not None:
+                return payload
+            job_id, status, err = _submit_and_wait(
+                name, label, lambda: submit(audio_path), checkpoint, cancel, timeout,
+            )
+            if status != "COMPLETED":
+                logger.warning("%s ended with status: %s (%s)", label, status, err)
+                checkpoint.reset(name)
+                return None
+            payload = fetch_result_json(job_id)
+            checkpoint.completed(name, payload=payload)
+            return payload
+        return run
+
+    stages = [
+        _Stage("chords", best_effort("chords", _submit_chord_recognition, "chord-recognition"),
+               optional=True),
+        _Stage("beats", best_effort("beats", _submit_beat_tracking, "beat-tracking"),
+               optional=True),
+    ]
+    if stem_info:
+        stages.append(_Stage("separation", run_separation))
+        stages.append(_Stage("transcription", run_transcription, deps=("separation",)))
     else:
         logger.info("No source separation needed for instrument=%s", instrument)
+        stages.append(_Stage("transcription", run_transcription))
+    # JSON and MusicXML are fetched concurrently once transcription completes.
+    stages.append(_Stage("transcription_json", run_transcription_json, deps=("transcription",)))
+    stages.append(_Stage("xml", run_transcription_xml, deps=("transcription",), optional=True))
+    return stages, restore
 
-    # 1. Submit transcription job (on stem or original)
-    transcription_id = submit_transcription(transcribe_path)
 
-    # 2. Submit chord recognition on ORIGINAL audio (best-effort)
-    #    Chords are best detected from the full mix, not an isolated stem.
-    chord_id: str | None = None
-    try:
-        chord_id = _submit_chord_recognition(audio_path)
-    except Exception as exc:
-        logger.warning("Chord recognition submission failed, continuing without: %s", exc)
+def _pipeline_payloads(outputs: dict[str, Any], instrument: str) -> dict:
+    stem_info = _instrument_to_stem(instrument)
+    return {
+        "transcription_id": outputs["transcription"],
+        "transcription": outputs["transcription_json"],
+        "xml_path": outputs["xml"],
+        "chords": outputs["chords"],
+        "beats": outputs["beats"],
+        "stem_type": stem_info[0] if stem_info else None,
+        "stem_path": outputs.get("separation"),
+    }
 
-    # 2b. Submit beat tracking on ORIGINAL audio (best-effort)
-    beat_id: str | None = None
-    try:
-        beat_id = _submit_beat_tracking(audio_path)
-    except Exception as exc:
-        logger.warning("Beat tracking submission failed, continuing without: %s", exc)
 
-    # 3. Poll transcription to completion
-    status, error_msg = _poll_until_terminal(transcription_id, "transcription")
-    if status == "FAILED":
-        raise RuntimeError(f"Klangio job failed: {error_msg or 'unknown error'}")
-    if status != "COMPLETED":
-        raise RuntimeError(f"Klangio transcription ended with status: {status}")
+def result_settings() -> tuple[str, str]:
+    """What decides a Klangio result besides the audio and instrument:
+    (KLANGIO_MODEL, chord vocabulary)."""
+    return _model, _CHORD_VOCABULARY
 
-    # 4. Fetch transcription JSON
-    transcription_payload = fetch_result_json(transcription_id)
 
-    # 5. Poll + fetch chord recognition (best-effort)
-    chord_payload: dict | None = None
-    if chord_id is not None:
-        try:
-            chord_status, chord_err = _poll_until_terminal(chord_id, "chord-recognition")
-            if chord_status == "COMPLETED":
-                chord_payload = fetch_result_json(chord_id)
-            else:
-                logger.warning(
-                    "Chord recognition ended with status: %s (%s)",
-                    chord_status, chord_err,
-                )
-        except Exception as exc:
-            logger.warning("Chord recognition failed, continuing without: %s", exc)
+def needs_separation(instrument: str) -> bool:
+    """Whether ``instrument`` is transcribed from a separated stem."""
+    return _instrument_to_stem(instrument) is not None
 
-    # 5b. Poll + fetch beat tracking (best-effort)
-    beat_payload: list | None = None
-    if beat_id is not None:
-        try:
-            beat_status, beat_err = _poll_until_terminal(beat_id, "beat-tracking")
-            if beat_status == "COMPLETED":
-                beat_payload = fetch_result_json(beat_id)
-            else:
-                logger.warning(
-                    "Beat tracking ended with status: %s (%s)",
-                    beat_status, beat_err,
-                )
-        except Exception as exc:
-            logger.warning("Beat tracking failed, continuing without: %s", exc)
 
-    # 6. Adapt to our schema and return
-    result = adapt_klangio_json_to_transcription_result(
-        transcription_payload, chord_payload
+def run_pipeline(
+    audio_path: str, instrument: str, checkpoint: PipelineCheckpoint | None = None,
+    artifact_dir: str | None = None,
+) -> dict:
+    """Run every Klangio stage for one recording and return the raw payloads.
+
+    If the instrument maps to a known stem, runs source separation first,
+    then transcribes the isolated stem. Otherwise transcribes the original audio.
+
+    Stages run as a DAG so that independent Klangio jobs overlap::
+
+        [source separation] → transcription
+        chord recognition
+        beat tracking
+
+    Chord recognition and beat tracking use the ORIGINAL audio (chords are
+    best detected from the full mix), so they are submitted immediately
+    instead of waiting for the stem. Both are best-effort. Once transcription
+    completes, its JSON and MusicXML (saved to ``artifact_dir``, default: next
+    to the audio) are downloaded in parallel; the PDF is left for later.
+
+    Progress is recorded in ``checkpoint``. When it comes from an earlier,
+    interrupted run, finished stages are skipped and submitted Klangio jobs
+    are polled again instead of re-uploading the audio.
+
+    Returns {"transcription_id", "transcription", "xml_path", "chords",
+    "beats", "stem_type", "stem_path"}; all but the first two may be None.
+    """
+    logger.info(
+        "Starting Klangio transcription: audio_path=%s instrument=%s",
+        audio_path, instrument,
+    )
+    checkpoint = checkpoint or PipelineCheckpoint()
+    out_dir = artifact_dir or str(Path(audio_path).parent)
+    cancel = threading.Event()
+    stages, _ = _pipeline_stages(audio_path, instrument, checkpoint, out_dir, cancel)
+    outputs = _run_stages(stages, cancel)
+    return _pipeline_payloads(outputs, instrument)
+
+
+def run_pipeline_stages(
+    audio_path: str, instrument: str, checkpoint: PipelineCheckpoint,
+    names: list[str], artifact_dir: str | None = None, audio_sec: float | None = None,
+) -> None:
+    """Run only the named DAG stages (one RQ pipeline stage).
+
+    Their dependencies outside ``names`` must already be complete in
+    ``checkpoint``; results are recorded there for the next RQ stage.
+    """
+    out_dir = artifact_dir or str(Path(audio_path).parent)
+    cancel = threading.Event()
+    stages, restore = _pipeline_stages(
+        audio_path, instrument, checkpoint, out_dir, cancel, audio_sec,
+    )
+    selected = [s for s in stages if s.name in names]
+    if len(selected) != len(set(names)):
+        raise ValueError(f"Unknown pipeline stages for {instrument}: {sorted(names)}")
+
+    def restored(name: str) -> Callable[[dict], Any]:
+        def run(_deps: dict) -> Any:
+            result = restore[name]()
+            if result is None:
+                raise RuntimeError(f"Klangio stage {name} has not completed")
+            return result
+        return run
+
+    upstream = {d for s in selected for d in s.deps} - set(names)
+    _run_stages(selected + [_Stage(d, restored(d)) for d in upstream], cancel)
+
+
+def payloads_from_checkpoint(
+    audio_path: str, instrument: str, checkpoint: PipelineCheckpoint,
+) -> dict:
+    """run_pipeline's return value, assembled from a completed checkpoint."""
+    stages, restore = _pipeline_stages(
+        audio_path, instrument, checkpoint, "", threading.Event(),
     )
+    outputs = {s.name: restore[s.name]() for s in stages}
+    missing = [s.name for s in stages if not s.optional and outputs[s.name] is None]
+    if missing:
+        raise RuntimeError(f"Klangio stages have not completed: {', '.join(missing)}")
+    return _pipeline_payloads(outputs, instrument)
+
+
+def build_result(payloads: dict) -> dict:
+    """Adapt raw pipeline payloads (see run_pipeline) to our result schema.
+
+    ``payloads["transcription"]`` is the decoded JSON or, with the columnar
+    adapter, the path of the saved JSON file.
+    """
+    transcription = payloads["transcription"]
+    if _columnar_adapter:
+        result = adapt_klangio_json_columnar(transcription, payloads.get("chords"))
+    else:
+        if isinstance(transcription, str):
+            with open(transcription) as fh:
+                transcription = json.load(fh)
+        result = adapt_klangio_json_to_transcription_result(transcription, payloads.get("chords"))
+    # Columns are an in-memory view only; result dicts are stored as JSON.
+    result.pop("note_columns", None)
 
     # Include Klangio job ID so callers can fetch additional artifacts (XML, etc.)
-    result["klangio_transcription_id"] = transcription_id
+    result["klangio_transcription_id"] = payloads["transcription_id"]
 
     # Include beat tracking data if available
+    beat_payload = payloads.get("beats")
     if beat_payload is not None:
         result["beat_tracking"] = beat_payload
 
@@ -445,3 +1017,8 @@ def transcribe(audio_path: str, instrument: str) -> dict:
         "yes" if beat_payload else "no",
     )
     return result
+
+
+def transcribe(audio_path: str, instrument: str) -> dict:
+    """Full Klangio transcription pipeline: run_pipeline → build_result."""
+    return build_result(run_pipeline(audio_path, instrument))
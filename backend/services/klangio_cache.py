@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+from config import settings
+from services import metrics
+from services.blobstore import file_sha256
+from services.klangio import result_settings
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_enabled: bool = os.getenv("KLANGIO_CACHE_ENABLED", "1") != "0"
+_max_bytes: int = int(os.getenv("KLANGIO_CACHE_MAX_MB", "5120")) * 1024 * 1024
+_max_age: float = float(os.getenv("KLANGIO_CACHE_MAX_AGE_DAYS", "30")) * 86400
+
+_PAYLOADS = "payloads.json"
+_TRANSCRIPTION = "transcription.json"  # undecoded, kept by the columnar adapter
+_STEM = "stem"  # + the stem's own extension (.wav, .flac, .opus)
+_XML = "transcription.musicxml"
+_PDF = "transcription.pdf"
+
+
+def _root() -> Path:
+    return Path(settings.data_dir) / "klangio_cache"
+
+
+def _entry_dir(key: str) -> Path:
+    return _root() / key[:2] / key
+
+
+def cache_key(audio_path: str, instrument: str, audio_sha256: str | None = None) -> str:
+    """Key = sha256(audio bytes, instrument, KLANGIO_MODEL, chord vocabulary).
+
+    ``audio_sha256`` is the audio's hash if already known (Job.audio_sha256);
+    only without it is the file read and hashed.
+    """
+    h = hashlib.sha256()
+    audio_sha256 = audio_sha256 or file_sha256(audio_path)
+    for part in (audio_sha256, instrument.lower(), *result_settings()):
+        h.update(part.encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _place(src: Path, dst: str) -> None:
+    """Hard-link a cached file into a job directory, copying across devices."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def restore(key: str, audio_path: str, klangio_dir: str) -> tuple[dict, dict] | None:
+    """Materialise a cached result for a job.
+
+    On a hit, places the stem next to ``audio_path`` and the XML/PDF in
+    ``klangio_dir`` and returns (payloads, artifact_paths) — the same shapes
+    run_pipeline and the worker's artifact fetch produce. Returns None on a
+    miss.
+    """
+    if not _enabled:
+        return None
+    entry = _entry_dir(key)
+    try:
+        with open(entry / _PAYLOADS) as fh:
+            payloads = json.load(fh)
+    except (OSError, ValueError):
+        metrics.incr("klangio.cache.misses")
+        return None
+
+    stem_type = payloads.get("stem_type")
+    payloads["stem_path"] = None
+    cached_stem = next(entry.glob(f"{_STEM}.*"), None)
+    if stem_type and cached_stem is not None:
+        stem_path = str(Path(audio_path).parent / f"stem_{stem_type}{cached_stem.suffix}")
+        _place(cached_stem, stem_path)
+        payloads["stem_path"] = stem_path
+
+    os.makedirs(klangio_dir, exist_ok=True)
+    if (entry / _TRANSCRIPTION).is_file():
+        transcription_path = os.path.join(klangio_dir, _TRANSCRIPTION)
+        _place(entry / _TRANSCRIPTION, transcription_path)
+        payloads["transcription"] = transcription_path
+    artifacts: dict = {}
+    for name, field in ((_XML, "xml_path"), (_PDF, "pdf_path")):
+        if (entry / name).is_file():
+            dst = os.path.join(klangio_dir, name)
+            _place(entry / name, dst)
+            artifacts[field] = dst
+    payloads["xml_path"] = artifacts.get("xml_path")
+
+    os.utime(entry / _PAYLOADS)  # last access, for LRU eviction
+    metrics.incr("klangio.cache.hits")
+    logger.info("Klangio cache hit: %s", key[:12])
+    return payloads, artifacts
+
+
+def store(key: str, payloads: dict, artifacts: dict) -> None:
+    """Save raw payloads plus stem/XML/PDF under ``key`` (best-effort)."""
+    if not _enabled:
+        return
+    if payloads.get("chords") is None or payloads.get("beats") is None:
+        # Best-effort stages failed; let a retry try them again.
+        logger.info("Klangio cache: not storing incomplete result %s", key[:12])
+        return
+
+    entry = _entry_dir(key)
+    if entry.exists():
+        return
+    tmp = entry.with_name(f"{key}.tmp-{os.getpid()}")
+    try:
+        tmp.mkdir(parents=True, exist_ok=True)
+        stem_path = payloads.get("stem_path")
+        # A path here is the transcription JSON file the columnar adapter kept.
+        transcription = payloads.get("transcription")
+        transcription_file = transcription if isinstance(transcription, str) else None
+        for src, name in (
+            (transcription_file, _TRANSCRIPTION),
+            (stem_path, _STEM + Path(stem_path or "").suffix),
+            (artifacts.get("xml_path"), _XML),
+            (artifacts.get("pdf_path"), _PDF),
+        ):
+            if src and os.path.isfile(src):
+                _place(Path(src), str(tmp / name))
+        with open(tmp / _PAYLOADS, "w") as fh:
+            json.dump({k: v for k, v in payloads.items()
+                       if k not in ("stem_path", "xml_path")
+                       and not (k == "transcription" and transcription_file)}, fh)
+        os.rename(tmp, entry)
+        metrics.incr("klangio.cache.stores")
+    except OSError as exc:
+        logger.warning("Klangio cache store failed for %s: %s", key[:12], exc)
+        shutil.rmtree(tmp, ignore_errors=True)
+        return
+    evict()
+
+
+def attach(key: str, artifact: str, path: str) -> None:
+    """Add a late artifact ("pdf") to an existing entry (best-effort)."""
+    if not _enabled:
+        return
+    name = {"pdf": _PDF, "xml": _XML}[artifact]
+    entry = _entry_dir(key)
+    if not entry.is_dir() or (entry / name).exists():
+        return
+    try:
+        _place(Path(path), str(entry / name))
+    except OSError as exc:
+        logger.warning("Klangio cache attach failed for %s: %s", key[:12], exc)
+
+
+def evict() -> None:
+    """Drop entries older than the max age, then least recently used ones
+    until the cache fits in KLANGIO_CACHE_MAX_MB."""
+    entries: list[tuple[float, int, Path]] = []
+    for payloads in _root().glob(f"*/*/{_PAYLOADS}"):
+        entry = payloads.parent
+        try:
+            last_used = payloads.stat().st_mtime
+            size = sum(f.stat().st_size for f in entry.iterdir())
+        except OSError:
+            continue
+        entries.append((last_used, size, entry))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    now = time.time()
+    for last_used, size, entry in entries:
+        if now - last_used <= _max_age and total <= _max_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        metrics.incr("klangio.cache.evictions")
+        metrics.incr("klangio.cache.evicted_bytes", size)
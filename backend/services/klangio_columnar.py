@@ -0,0 +1,220 @@
+import io
+import json
+import logging
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import IO, Any, Iterator
+
+try:  # in requirements.txt; without it raw payloads are decoded whole
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+_warned_no_ijson = False
+
+_PART = "Parts.item"
+_MEASURE = "Parts.item.Measures.item"
+_VOICE = "Parts.item.Measures.item.Voices.item"
+_NOTE = "Parts.item.Measures.item.Voices.item.Notes.item"
+_NOTE_MIDI = _NOTE + ".Midi.item"
+_NOTE_DURATION = _NOTE + ".Duration"
+
+
+class NoteColumns:
+    """Transcribed notes as packed columns: pitch int16, start/duration float64.
+
+    About 18 bytes per note instead of a ~400-byte dict. The times are
+    computed exactly as the dict adapter computes them, so the rounded
+    values match it note for note.
+    """
+
+    __slots__ = ("pitch", "start", "duration")
+
+    def __init__(self, pitch: array, start: array, duration: array):
+        self.pitch = pitch
+        self.start = start
+        self.duration = duration
+
+    def __len__(self) -> int:
+        return len(self.pitch)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(a) * a.itemsize for a in (self.pitch, self.start, self.duration))
+
+    def note(self, i: int) -> dict:
+        return {
+            "pitch_midi": self.pitch[i],
+            "start_sec": round(self.start[i], 4),
+            "duration_sec": round(self.duration[i], 4),
+        }
+
+    def to_dicts(self) -> list[dict]:
+        """Notes in the TranscriptionResult shape (what the dict adapter returns)."""
+        return [
+            {"pitch_midi": p, "start_sec": round(s, 4), "duration_sec": round(d, 4)}
+            for p, s, d in zip(self.pitch, self.start, self.duration)
+        ]
+
+    def to_json(self) -> str:
+        """``json.dumps(self.to_dicts())``, written straight from the columns."""
+        out = io.StringIO()
+        out.write("[")
+        for i, (p, s, d) in enumerate(zip(self.pitch, self.start, self.duration)):
+            out.write(", " if i else "")
+            out.write(f'{{"pitch_midi": {p}, "start_sec": {round(s, 4)!r}, '
+                      f'"duration_sec": {round(d, 4)!r}}}')
+        out.write("]")
+        return out.getvalue()
+
+
+class LazyNotes(Sequence):
+    """Read-only ``notes`` list backed by NoteColumns.
+
+    ``len()`` and single-item access read the columns directly; iterating or
+    slicing builds the list of dicts once and reuses it. database.py stores
+    it through to_json(), so writing the result never builds the dicts.
+    """
+
+    def __init__(self, columns: NoteColumns):
+        self.columns = columns
+        self._dicts: list[dict] | None = None
+
+    def materialize(self) -> list[dict]:
+        if self._dicts is None:
+            self._dicts = self.columns.to_dicts()
+        return self._dicts
+
+    def to_json(self) -> str:
+        return self.columns.to_json()
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def __getitem__(self, index):
+        if isinstance(index, int) and self._dicts is None:
+            return self.columns.note(index)
+        return self.materialize()[index]
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.materialize())
+
+    def __repr__(self) -> str:
+        return f"LazyNotes({len(self)} notes)"
+
+
+class _ColumnBuilder:
+    """Collects notes as (measure, position, duration fraction) while
+    parsing; seconds are only computed in finish(), once MusicInfo is known —
+    it may come after Parts in the document."""
+
+    def __init__(self):
+        self.pitch = array("h")
+        self.measure = array("l")  # measure index within the part
+        self.pos = array("d")  # fraction into the measure
+        self.dur = array("d")  # fraction of a measure
+
+    def add(self, measure: int, pos: float, midi_vals, dur_frac: float) -> None:
+        for midi in midi_vals:
+            if midi >= 0:
+                self.pitch.append(int(midi))
+                self.measure.append(measure)
+                self.pos.append(pos)
+                self.dur.append(dur_frac)
+
+    def finish(self, music_info: dict) -> tuple[NoteColumns, dict]:
+        tempo = float(music_info.get("Tempo", 120.0))
+        time_sig = str(music_info.get("TimeSignature", "4/4"))
+        audio_offset = float(music_info.get("AudioOffset", 0.0))
+        measure_sec = (int(time_sig.split("/")[0]) / tempo) * 60.0
+
+        # Measure starts summed one measure at a time, as the dict adapter
+        # does, so both round to the same values.
+        measure_start = array("d")
+        t = audio_offset
+        for _ in range(max(self.measure, default=-1) + 1):
+            measure_start.append(t)
+            t += measure_sec
+        columns = NoteColumns(
+            self.pitch,
+            array("d", (measure_start[m] + p * measure_sec for m, p in zip(self.measure, self.pos))),
+            array("d", (d * measure_sec for d in self.dur)),
+        )
+        info = {"tempo": tempo, "time_signature": time_sig, "audio_offset": audio_offset}
+        return columns, info
+
+
+def _from_dict(payload: dict) -> tuple[NoteColumns, dict]:
+    builder = _ColumnBuilder()
+    for part in payload.get("Parts", []):
+        for m, measure in enumerate(part.get("Measures", [])):
+            for voice in measure.get("Voices", []):
+                pos = 0.0
+                for n in voice.get("Notes", []):
+                    dur_frac = float(n.get("Duration", 0.0))
+                    builder.add(m, pos, n.get("Midi", [-1]), dur_frac)
+                    pos += dur_frac
+    return builder.finish(payload.get("MusicInfo", {}))
+
+
+def _from_stream(fh: IO[bytes]) -> tuple[NoteColumns, dict]:
+    builder = _ColumnBuilder()
+    music_info: dict[str, Any] = {}
+    measure = 0
+    pos = 0.0
+    midi: list = []
+    dur_frac = 0.0
+    for prefix, event, value in ijson.parse(fh, use_float=True):
+        if prefix == _NOTE_MIDI:
+            midi.append(value)
+        elif prefix == _NOTE_DURATION:
+            dur_frac = float(value)
+        elif prefix == _NOTE:
+            if event == "start_map":
+                midi, dur_frac = [], 0.0
+            elif event == "end_map":
+                builder.add(measure, pos, midi, dur_frac)
+                pos += dur_frac
+        elif prefix == _VOICE and event == "start_map":
+            pos = 0.0
+        elif prefix == _MEASURE and event == "end_map":
+            measure += 1
+        elif prefix == _PART and event == "start_map":
+            measure = 0
+        elif prefix.startswith("MusicInfo.") and event in ("number", "string"):
+            music_info[prefix[len("MusicInfo."):]] = value
+    return builder.finish(music_info)
+
+
+def parse_transcription(source: dict | bytes | str | Path | IO[bytes]) -> tuple[NoteColumns, dict]:
+    """Klangio transcription JSON → (NoteColumns, music info).
+
+    ``source`` is an already-decoded payload, raw bytes, a path to the JSON
+    file or a binary file object. Raw sources are parsed incrementally when
+    ijson is installed, so the Klangio document is never held as Python
+    objects; otherwise they are decoded with json first.
+    """
+    if isinstance(source, dict):
+        return _from_dict(source)
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fh:
+            return parse_transcription(fh)
+    if ijson is None:
+        _warn_no_ijson()
+        if isinstance(source, (bytes, bytearray)):
+            return _from_dict(json.loads(source))
+        return _from_dict(json.load(source))
+    if isinstance(source, (bytes, bytearray)):
+        return _from_stream(io.BytesIO(source))
+    return _from_stream(source)
+
+
+def _warn_no_ijson() -> None:
+    global _warned_no_ijson
+    if not _warned_no_ijson:
+        _warned_no_ijson = True
+        logger.warning("ijson is not installed: Klangio transcriptions are decoded whole "
+                       "instead of parsed incrementally")
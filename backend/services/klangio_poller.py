@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from database import get_redis
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+_HISTORY_KEY = "klangio:stage_duration_ema"
+_HISTORY_ALPHA = 0.3
+_HISTORY_TTL = 60.0  # seconds an in-process copy of the history is trusted
+
+
+class PollTimeout(RuntimeError):
+    """A Klangio job did not finish within the wait timeout."""
+
+
+class _Tracked:
+    """An outstanding Klangio job and the waiters interested in it."""
+
+    def __init__(self, job_id: str, label: str, expected: float | None):
+        self.job_id = job_id
+        self.label = label
+        self.expected = expected
+        self.registered_at = time.monotonic()
+        self.overdue_polls = 0
+        self.last_status: str | None = None
+        self.result: tuple[str, str | None] | None = None
+        self.error: BaseException | None = None
+        self.done = threading.Event()
+        self.waiters = 0
+
+
+class KlangioPoller:
+    """One background thread that schedules polls of every outstanding
+    Klangio job, and a few threads that send them.
+
+    Each job is polled on its own schedule: while it is younger than the
+    historical duration of its stage the poller waits half of the expected
+    remaining time, and once it is overdue it backs off exponentially from
+    ``min_interval`` up to ``max_interval``. Waiters are woken as soon as a
+    job reaches a terminal status.
+
+    A status request can block for a long time (a budget wait, retries), so
+    requests run on ``workers`` threads and a slow one holds up only its own
+    job. A poll that fails with an error ``is_transient`` accepts is tried
+    again on the job's next tick; the wait timeout still bounds it.
+    """
+
+    def __init__(
+        self,
+        poll_status: Callable[[str], tuple[str, str | None]],
+        terminal: frozenset[str],
+        min_interval: float = 2.0,
+        max_interval: float = 15.0,
+        backoff: float = 1.6,
+        workers: int = 4,
+        is_transient: Callable[[BaseException], bool] = lambda exc: False,
+    ):
+        self._poll_status = poll_status
+        self._is_transient = is_transient
+        self._terminal = terminal
+        self._min = min_interval
+        self._max = max_interval
+        self._backoff = backoff
+        self._jobs: dict[str, _Tracked] = {}
+        self._heap: list[tuple[float, int, _Tracked]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._history: dict[str, float] = {}
+        self._history_loaded_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="klangio-poll")
+        self._thread = threading.Thread(target=self._run, name="klangio-poller", daemon=True)
+        self._thread.start()
+
+    # -- stage duration history ------------------------------------------
+
+    def _expected_duration(self, label: str) -> float | None:
+        now = time.monotonic()
+        if now - self._history_loaded_at > _HISTORY_TTL:
+            try:
+                raw = get_redis().hgetall(_HISTORY_KEY)
+                self._history.update({k.decode(): float(v) for k, v in raw.items()})
+            except Exception as exc:
+                logger.debug("Stage duration history unavailable: %s", exc)
+            self._history_loaded_at = now
+        return self._history.get(label)
+
+    def _record_duration(self, label: str, seconds: float) -> None:
+        prev = self._history.get(label)
+        ema = seconds if prev is None else (1 - _HISTORY_ALPHA) * prev + _HISTORY_ALPHA * seconds
+        self._history[label] = ema
+        try:
+            get_redis().hset(_HISTORY_KEY, label, round(ema, 2))
+        except Exception as exc:
+            logger.debug("Failed to persist stage duration: %s", exc)
+
+    # -- scheduling --------------------------------------------------------
+
+    def _next_delay(self, tracked: _Tracked) -> float:
+        elapsed = time.monotonic() - tracked.registered_at
+        if tracked.expected is not None and elapsed < tracked.expected:
+            delay = (tracked.expected - elapsed) / 2
+        else:
+            delay = self._min * self._backoff ** tracked.overdue_polls
+            tracked.overdue_polls += 1
+        return min(max(delay, self._min), self._max)
+
+    def _schedule(self, tracked: _Tracked, delay: float) -> None:
+        heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), tracked))
+        self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._cond.wait(timeout)
+                _, _, tracked = heapq.heappop(self._heap)
+                if self._jobs.get(tracked.job_id) is not tracked:
+                    continue  # every waiter gave up
+            # Rescheduled only once this poll is done, so a job is never
+            # polled twice at a time.
+            self._executor.submit(self._poll, tracked)
+
+    def _poll(self, tracked: _Tracked) -> None:
+        job_id = tracked.job_id
+        metrics.incr("klangio.poll.requests")
+        try:
+            status, error_msg = self._poll_status(job_id)
+        except Exception as exc:
+            if not self._is_transient(exc):
+                self._finish(tracked, error=exc)
+                return
+            metrics.incr("klangio.poll.errors")
+            logger.warning("Klangio %s %s: status poll failed (%s), trying again",
+                           tracked.label, job_id, exc)
+            delay = max(self._next_delay(tracked), getattr(exc, "retry_after", 0.0))
+            with self._cond:
+                self._schedule(tracked, delay)
+            return
+
+        if status != tracked.last_status:
+            logger.info("Klangio %s %s → %s%s", tracked.label, job_id, status,
+                        f" ({error_msg})" if error_msg else "")
+            tracked.last_status = status
+        if status in self._terminal:
+            if status == "COMPLETED":
+                self._record_duration(
+                    tracked.label, time.monotonic() - tracked.registered_at,
+                )
+            self._finish(tracked, result=(status, error_msg))
+        else:
+            with self._cond:
+                self._schedule(tracked, self._next_delay(tracked))
+
+    def _finish(
+        self, tracked: _Tracked, *,
+        result: tuple[str, str | None] | None = None,
+        error: BaseException | None = None,
+    ) -> None:
+        with self._cond:
+            if self._jobs.get(tracked.job_id) is tracked:
+                del self._jobs[tracked.job_id]
+        tracked.result = result
+        tracked.error = error
+        tracked.done.set()
+
+    # -- public API --------------------------------------------------------
+
+    def wait(
+        self, job_id: str, label: str, timeout: float,
+        cancel: threading.Event | None = None,
+    ) -> tuple[str, str | None]:
+        """Block until ``job_id`` reaches a terminal status.
+
+        Returns (status, error_message). Raises RuntimeError on timeout or
+        when ``cancel`` is set.
+        """
+        expected = self._expected_duration(label)
+        with self._cond:
+            tracked = self._jobs.get(job_id)
+            if tracked is None:
+                tracked = _Tracked(job_id, label, expected)
+                self._jobs[job_id] = tracked
+                self._schedule(tracked, 0)  # first poll right away
+            tracked.waiters += 1
+
+        deadline = time.monotonic() + timeout
+        try:
+            while not tracked.done.wait(min(0.5, max(deadline - time.monotonic(), 0))):
+                if cancel is not None and cancel.is_set():
+                    raise RuntimeError(f"Klangio {label} cancelled")
+                if time.monotonic() >= deadline:
+                    raise PollTimeout("Klangio job timed out")
+        finally:
+            with self._cond:
+                tracked.waiters -= 1
+                if tracked.waiters == 0 and self._jobs.get(job_id) is tracked:
+                    del self._jobs[job_id]
+
+        if tracked.error is not None:
+            raise tracked.error
+        assert tracked.result is not None
+        return tracked.result
+
+
+def expected_duration(label: str) -> float | None:
+    """Historical duration (EMA, seconds) of a Klangio stage, if known."""
+    try:
+        value = get_redis().hget(_HISTORY_KEY, label)
+    except Exception as exc:
+        logger.debug("Stage duration history unavailable: %s", exc)
+        return None
+    return float(value) if value is not None else None
+
+
+_poller: KlangioPoller | None = None
+_poller_pid: int | None = None
+_poller_lock = threading.Lock()
+
+
+def get_poller(factory: Callable[[], KlangioPoller]) -> KlangioPoller:
+    """Return this process's poller, creating it on first use (and after fork)."""
+    global _poller, _poller_pid
+    with _poller_lock:
+        if _poller is None or _poller_pid != os.getpid():
+            _poller = factory()
+            _poller_pid = os.getpid()
+        return _poller
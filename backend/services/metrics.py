@@ -0,0 +1,44 @@
+import logging
+import threading
+from collections import defaultdict
+
+from database import get_redis
+
+logger = logging.getLogger(__name__)
+
+_REDIS_KEY = "jazzlicklab:metrics"
+
+_lock = threading.Lock()
+_pending: dict[str, float] = defaultdict(float)
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Bump an in-process counter. Cheap; call freely on hot paths."""
+    with _lock:
+        _pending[name] += value
+
+
+def flush() -> None:
+    """Push in-process counter deltas to the shared Redis hash (best-effort).
+
+    Workers call this at the end of every job, so counters survive RQ's
+    fork-per-job work-horses.
+    """
+    with _lock:
+        deltas = dict(_pending)
+        _pending.clear()
+    if not deltas:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for name, value in deltas.items():
+            pipe.hincrbyfloat(_REDIS_KEY, name, value)
+        pipe.execute()
+    except Exception as exc:
+        logger.warning("Failed to flush metrics: %s", exc)
+
+
+def read_all() -> dict[str, float]:
+    """Cluster-wide counter totals."""
+    raw = get_redis().hgetall(_REDIS_KEY)
+    return {k.decode(): float(v) for k, v in sorted(raw.items())}
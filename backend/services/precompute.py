@@ -0,0 +1,206 @@
+"""Read artifacts precomputed after a job turns READY.
+
+Without them the first viewer of a job pays for the full-song MusicXML
+fallback, the offset-applied note and chord lists and any whole-song
+analysis. The precompute stage (workers/tasks.py) writes them to
+``data/jobs/{id}/derived/`` right after READY and again after every
+settings or chord edit, and the GET endpoints serve the files.
+
+Every change to a READY job's result bumps ``jobs.result_rev``. Files are
+named after the revision they were built from (``notes.3.json``) and
+``jobs.derived_rev`` records the last revision written. Readers use the
+files only while the two match; otherwise they compute inline, as before.
+"""
+import json
+import logging
+import os
+
+from sqlalchemy import func
+
+from config import settings
+from models import Job
+from schemas.analysis import AnalysisResponse
+from schemas.settings import JobSettings
+from schemas.transcription import ChordEvent, NoteEvent, TranscriptionResult
+from services.analysis import compute_coverage, detect_ii_v_i
+from services.artifacts import write_atomic
+from services.musicxml import cleanup_notes_for_notation, generate_musicxml
+
+logger = logging.getLogger(__name__)
+
+# Artifact name → file extension
+ARTIFACTS = {
+    "notes": "json",
+    "chords": "json",
+    "beats": "json",
+    "analysis": "json",
+    "score": "musicxml",
+}
+
+
+def derived_dir(job_id: str) -> str:
+    return os.path.join(settings.data_dir, "jobs", job_id, "derived")
+
+
+def artifact_path(job_id: str, name: str, rev: int) -> str:
+    return os.path.join(derived_dir(job_id), f"{name}.{rev}.{ARTIFACTS[name]}")
+
+
+def mark_changed(job: Job) -> None:
+    """Bump the job's result revision, in the same commit as the change.
+
+    Incremented in SQL so concurrent edits each get their own revision.
+    """
+    job.result_rev = func.coalesce(Job.result_rev, 0) + 1
+
+
+def load_result(result_json: dict) -> tuple[TranscriptionResult, JobSettings]:
+    """Transcription and settings of a result (raises ValidationError)."""
+    transcription = TranscriptionResult(**{
+        k: v for k, v in result_json.items()
+        if k in TranscriptionResult.model_fields
+    })
+    return transcription, JobSettings(**(result_json.get("settings") or {}))
+
+
+def display_notes(notes: list[NoteEvent], offset: float) -> list[NoteEvent]:
+    """Notes in display time (raw time minus the job's offset)."""
+    return [
+        NoteEvent(
+            pitch_midi=n.pitch_midi,
+            start_sec=n.start_sec - offset,
+            duration_sec=n.duration_sec,
+        )
+        for n in notes
+    ]
+
+
+def display_chords(chords: list[ChordEvent], offset: float) -> list[ChordEvent]:
+    return [
+        ChordEvent(
+            symbol=c.symbol,
+            start_sec=c.start_sec - offset,
+            end_sec=(c.end_sec - offset) if c.end_sec is not None else None,
+        )
+        for c in chords
+    ]
+
+
+def song_musicxml(transcription: TranscriptionResult, job_settings: JobSettings) -> str:
+    """MusicXML of the whole song, generated from the transcription."""
+    notes = cleanup_notes_for_notation(list(transcription.notes))
+    return generate_musicxml(
+        notes, list(transcription.chords),
+        bpm=job_settings.bpm or 120.0,
+        time_signature=job_settings.time_signature or "4/4",
+        grid=16,
+        key_sig=job_settings.key_signature,
+    )
+
+
+def _song_end(transcription: TranscriptionResult) -> float:
+    ends = [n.start_sec + n.duration_sec for n in transcription.notes]
+    ends += [c.end_sec if c.end_sec is not None else c.start_sec for c in transcription.chords]
+    return max(ends, default=0.0)
+
+
+def song_analysis(job_id: str, transcription: TranscriptionResult) -> AnalysisResponse:
+    """Coverage and ii-V-I analysis of the whole song (raw time, like the
+    per-selection analysis)."""
+    return AnalysisResponse(
+        job_id=job_id,
+        selection_id=None,
+        window_start_sec=0.0,
+        window_end_sec=_song_end(transcription),
+        metrics=compute_coverage(list(transcription.notes), list(transcription.chords)),
+        ii_v_i=detect_ii_v_i(list(transcription.chords)),
+    )
+
+
+def beat_grid(
+    job_id: str, result_json: dict, transcription: TranscriptionResult, job_settings: JobSettings,
+) -> dict:
+    """Beats in display time with their position in the bar (1 = downbeat).
+
+    Klangio's beat tracking when the job has it, otherwise a grid laid out
+    from the tempo and time signature starting at the offset.
+    """
+    offset = job_settings.offset_sec
+    try:
+        tracked = [(float(ts), int(dv)) for ts, dv in result_json.get("beat_tracking") or []]
+    except (TypeError, ValueError):
+        tracked = []
+
+    beats: list[dict] = []
+    source = None
+    if tracked:
+        source = "beat_tracking"
+        beats = [{"time_sec": round(ts - offset, 4), "beat": dv} for ts, dv in tracked]
+    elif job_settings.bpm:
+        source = "tempo"
+        numerator = int((job_settings.time_signature or "4/4").split("/")[0])
+        step = 60.0 / job_settings.bpm
+        count = int(max(0.0, _song_end(transcription) - offset) / step) + 1
+        beats = [{"time_sec": round(i * step, 4), "beat": i % numerator + 1} for i in range(count)]
+
+    return {
+        "job_id": job_id,
+        "bpm": job_settings.bpm,
+        "time_signature": job_settings.time_signature,
+        "offset_sec": offset,
+        "source": source,
+        "beats": beats,
+    }
+
+
+def _has_klangio_xml(result_json: dict) -> bool:
+    xml_path = (result_json.get("klangio_artifacts") or {}).get("xml_path")
+    return bool(xml_path) and os.path.isfile(xml_path)
+
+
+def build(job_id: str, result_json: dict) -> dict[str, bytes]:
+    """Every artifact of a READY result, serialised as served."""
+    transcription, job_settings = load_result(result_json)
+    offset = job_settings.offset_sec
+
+    def dump(payload: dict) -> bytes:
+        return json.dumps(payload, separators=(",", ":")).encode()
+
+    artifacts = {
+        "notes": dump({
+            "job_id": job_id,
+            "notes": [n.model_dump() for n in display_notes(transcription.notes, offset)],
+        }),
+        "chords": dump({
+            "job_id": job_id,
+            "chords": [c.model_dump() for c in display_chords(transcription.chords, offset)],
+        }),
+        "beats": dump(beat_grid(job_id, result_json, transcription, job_settings)),
+        "analysis": dump(song_analysis(job_id, transcription).model_dump()),
+    }
+    # /score serves Klangio's own MusicXML when there is one.
+    if not _has_klangio_xml(result_json):
+        artifacts["score"] = song_musicxml(transcription, job_settings).encode()
+    return artifacts
+
+
+def write(job_id: str, rev: int, artifacts: dict[str, bytes]) -> None:
+    os.makedirs(derived_dir(job_id), exist_ok=True)
+    for name, data in artifacts.items():
+        write_atomic(artifact_path(job_id, name, rev), data)
+    logger.info("Job %s: precomputed %s (rev %d)", job_id, ", ".join(artifacts), rev)
+
+
+def prune(job_id: str, rev: int) -> None:
+    """Delete artifacts of revisions older than ``rev``."""
+    try:
+        names = os.listdir(derived_dir(job_id))
+    except OSError:
+        return
+    for filename in names:
+        parts = filename.split(".")
+        if len(parts) == 3 and parts[1].isdigit() and int(parts[1]) < rev:
+            try:
+                os.remove(os.path.join(derived_dir(job_id), filename))
+            except OSError:
+                pass
@@ -0,0 +1,176 @@
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import redis
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+_KEY_PREFIX = "klangio:budget"
+_WARN_EVERY = 60.0  # seconds between "limiter unavailable" warnings
+
+# Atomically: drop expired leases, check the concurrency cap, refill the token
+# bucket and take one token + one lease. Uses the Redis clock so every worker
+# agrees on time. Returns {granted, retry_after_ms}.
+_ACQUIRE_LUA = """
+local bucket, leases = KEYS[1], KEYS[2]
+local rate, burst, max_conc = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local lease_id, lease_ttl = ARGV[4], tonumber(ARGV[5])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+redis.call('ZREMRANGEBYSCORE', leases, '-inf', now)
+if max_conc > 0 and redis.call('ZCARD', leases) >= max_conc then
+  return {0, 50}
+end
+
+local state = redis.call('HMGET', bucket, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+if tokens < 1 then
+  redis.call('HSET', bucket, 'tokens', tokens, 'ts', now)
+  return {0, math.ceil((1 - tokens) * 1000 / rate)}
+end
+
+redis.call('HSET', bucket, 'tokens', tokens - 1, 'ts', now)
+redis.call('PEXPIRE', bucket, 3600000)
+redis.call('ZADD', leases, now + lease_ttl, lease_id)
+redis.call('PEXPIRE', leases, 3600000)
+return {1, 0}
+"""
+
+
+class Budget:
+    """Cluster-wide allowance for one kind of Klangio request."""
+
+    def __init__(self, name: str, rate: float, burst: int, concurrency: int):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        # Threads in this process queue here before contending in Redis.
+        self.local = threading.BoundedSemaphore(concurrency) if concurrency > 0 else None
+
+
+def parse_budgets(spec: str) -> dict[str, Budget]:
+    """Parse "upload=2:5:4,poll=20:40:16" (rate/s : burst : max in flight)."""
+    budgets: dict[str, Budget] = {}
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, values = item.partition("=")
+        rate, burst, concurrency = values.split(":")
+        budgets[name] = Budget(name, float(rate), int(burst), int(concurrency))
+    return budgets
+
+
+class BudgetExhausted(RuntimeError):
+    """A request waited its whole timeout without getting a budget slot."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class KlangioGovernor:
+    """Redis-backed token bucket + concurrency semaphore per request kind.
+
+    Fails open: if Redis is unreachable, requests proceed unthrottled
+    (with a warning) rather than stalling ingest. ``exhausted`` is the
+    exception class (called with message and retry_after) raised when a
+    budget stays exhausted.
+    """
+
+    def __init__(
+        self, budgets: dict[str, Budget], get_redis: Callable[[], redis.Redis],
+        exhausted: Callable[[str, float], Exception] = BudgetExhausted,
+    ):
+        self._budgets = budgets
+        self._get_redis = get_redis
+        self._exhausted = exhausted
+        self._script = None
+        self._warned_at = 0.0
+
+    def _try_acquire(self, budget: Budget, lease_id: str, lease_ttl_ms: int) -> tuple[bool, float]:
+        if self._script is None:
+            self._script = self._get_redis().register_script(_ACQUIRE_LUA)
+        granted, retry_ms = self._script(
+            keys=[f"{_KEY_PREFIX}:{budget.name}:bucket", f"{_KEY_PREFIX}:{budget.name}:leases"],
+            args=[budget.rate, budget.burst, budget.concurrency, lease_id, lease_ttl_ms],
+        )
+        return bool(granted), retry_ms / 1000
+
+    @contextmanager
+    def acquire(self, kind: str, timeout: float, lease_ttl: float) -> Iterator[None]:
+        """Hold one ``kind`` slot for the duration of a request.
+
+        Waits (locally, then in Redis) up to ``timeout`` seconds; raises
+        ``exhausted`` when the budget stays exhausted. The Redis lease expires
+        after ``lease_ttl`` seconds so a killed worker cannot leak slots.
+        """
+        budget = self._budgets.get(kind)
+        if budget is None:
+            yield
+            return
+
+        t0 = time.monotonic()
+        deadline = t0 + timeout
+        if budget.local is not None and not budget.local.acquire(timeout=timeout):
+            raise self._exhausted(f"Klangio {kind} budget exhausted (local queue)", 0.0)
+        lease_id = str(uuid.uuid4())
+        leased = False
+        try:
+            while True:
+                try:
+                    leased, retry_after = self._try_acquire(budget, lease_id, int(lease_ttl * 1000))
+                except redis.RedisError as exc:
+                    if time.monotonic() - self._warned_at > _WARN_EVERY:
+                        logger.warning("Klangio rate limiter unavailable, not throttling: %s", exc)
+                        self._warned_at = time.monotonic()
+                    metrics.incr("klangio.budget.fail_open")
+                    break
+                if leased:
+                    break
+                if time.monotonic() + retry_after > deadline:
+                    raise self._exhausted(f"Klangio {kind} budget exhausted", retry_after)
+                time.sleep(max(retry_after, 0.02))
+
+            waited = time.monotonic() - t0
+            if waited > 0.05:
+                metrics.incr(f"klangio.budget.{kind}.waits")
+                metrics.incr(f"klangio.budget.{kind}.wait_seconds", waited)
+            yield
+        finally:
+            if leased:
+                try:
+                    self._get_redis().zrem(f"{_KEY_PREFIX}:{kind}:leases", lease_id)
+                except redis.RedisError:
+                    pass  # expires on its own
+            if budget.local is not None:
+                budget.local.release()
+
+    def utilisation(self) -> dict[str, dict]:
+        """Current in-flight count and bucket level per budget (cluster-wide)."""
+        r = self._get_redis()
+        now_ms = time.time() * 1000
+        out: dict[str, dict] = {}
+        for name, budget in self._budgets.items():
+            leases_key = f"{_KEY_PREFIX}:{name}:leases"
+            in_flight = r.zcount(leases_key, now_ms, "+inf")
+            tokens, ts = r.hmget(f"{_KEY_PREFIX}:{name}:bucket", "tokens", "ts")
+            level = float(budget.burst)
+            if tokens is not None and ts is not None:
+                level = min(budget.burst, float(tokens) + (now_ms - float(ts)) * budget.rate / 1000)
+            out[name] = {
+                "in_flight": in_flight,
+                "max_in_flight": budget.concurrency,
+                "utilisation": round(in_flight / budget.concurrency, 3) if budget.concurrency else None,
+                "tokens": round(level, 2),
+                "burst": budget.burst,
+                "rate_per_sec": budget.rate,
+            }
+        return out
@@ -1,18 +1,123 @@
+import hashlib
 import os
 import logging
+import shutil
 
-from fastapi import UploadFile
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from config import settings
+from services import audio_probe, blobstore
+from services.audio_probe import AudioInfo
 
 logger = logging.getLogger(__name__)
 
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_max_upload_bytes: int = int(os.getenv("UPLOAD_MAX_MB", "200")) * 1024 * 1024
 
-def save_audio(job_id: str, file: UploadFile) -> str:
+_CHUNK = 1024 * 1024
+# Multipart boundaries and the other form fields around the audio.
+_FORM_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload is over UPLOAD_MAX_MB."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"audio is larger than {limit // (1024 * 1024)} MB")
+        self.limit = limit
+
+
+class UploadSizeLimit:
+    """ASGI middleware: cut off ``POST {path}`` bodies past UPLOAD_MAX_MB.
+
+    Starlette spools a whole multipart upload to disk before the route
+    runs, so save_audio's own limit alone would only apply once an
+    oversized file has been received. A request whose Content-Length is
+    too large gets 413 before its body is read; one without (chunked) gets
+    413 as soon as it has sent too much.
+    """
+
+    def __init__(self, app: ASGIApp, path: str = "/jobs"):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        limit = _max_upload_bytes + _FORM_OVERHEAD
+        detail = str(UploadTooLarge(_max_upload_bytes))
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            await JSONResponse({"detail": detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited, send)
+
+
+def audio_extension(path: str, filename: str | None) -> tuple[str, AudioInfo | None]:
+    """Extension for an uploaded or imported file: from its probed container,
+    else the client's file name, else ``.mp3``."""
+    info = audio_probe.probe(path)
+    if info is not None and info.format in blobstore.FORMAT_EXTENSIONS:
+        return blobstore.FORMAT_EXTENSIONS[info.format], info
+    ext = os.path.splitext(filename or "")[1].lower()
+    return (ext if ext in blobstore.FORMAT_EXTENSIONS.values() else ".mp3"), info
+
+
+def save_audio(job_id: str, file: UploadFile) -> tuple[str, str, AudioInfo | None]:
+    """Write an upload to the job directory; returns (path, sha256, probe).
+
+    The upload is copied in 1 MB chunks to a ``.part`` file, hashed in the
+    same pass and renamed into place, so memory stays flat however large the
+    file is and a reader never sees a partial file. The file is named after
+    its real format (``audio.wav``) and is a link into the blob store, so an
+    upload identical to an earlier one takes no extra disk; the caller
+    records the reference (blobstore.ref). Raises UploadTooLarge (leaving
+    nothing behind) past UPLOAD_MAX_MB.
+    """
+    # UploadSizeLimit has cut off bodies far over the limit; this is exact.
+    if file.size is not None and file.size > _max_upload_bytes:
+        raise UploadTooLarge(_max_upload_bytes)
     job_dir = os.path.join(settings.data_dir, job_id)
     os.makedirs(job_dir, exist_ok=True)
-    audio_path = os.path.join(job_dir, "audio.mp3")
-    with open(audio_path, "wb") as f:
-        f.write(file.file.read())
-    logger.info("Saved audio for job %s -> %s", job_id, audio_path)
-    return audio_path
+    tmp = os.path.join(job_dir, "audio.part")
+    h = hashlib.sha256()
+    written = 0
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in iter(lambda: file.file.read(_CHUNK), b""):
+                written += len(chunk)
+                if written > _max_upload_bytes:
+                    raise UploadTooLarge(_max_upload_bytes)
+                h.update(chunk)
+                f.write(chunk)
+        ext, info = audio_extension(tmp, file.filename)
+        audio_path = os.path.join(job_dir, f"audio{ext}")
+        blobstore.put(tmp, h.hexdigest())
+        os.replace(tmp, audio_path)
+    except BaseException:
+        discard_audio(job_id)
+        raise
+    logger.info("Saved audio for job %s -> %s (%d bytes)", job_id, audio_path, written)
+    return audio_path, h.hexdigest(), info
+
+
+def discard_audio(job_id: str) -> None:
+    """Remove the directory of a job that was never created."""
+    shutil.rmtree(os.path.join(settings.data_dir, job_id), ignore_errors=True)
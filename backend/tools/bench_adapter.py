@@ -0,0 +1,105 @@
+"""Benchmark the Klangio transcription adapters on a large synthetic payload.
+
+Compares the dict adapter with the columnar one (from an in-memory payload
+and from the raw JSON file) on time and peak Python heap::
+
+    python tools/bench_adapter.py --song-sec 1800 --notes-per-beat 4 --polyphony 3
+
+The file variant parses incrementally only when ijson is installed.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import klangio_columnar  # noqa: E402
+from services.klangio import (  # noqa: E402
+    adapt_klangio_json_columnar,
+    adapt_klangio_json_to_transcription_result,
+)
+from tools import fake_klangio  # noqa: E402
+
+
+def _measure(label: str, fn: Callable[[], object]) -> object:
+    """Time one run, then repeat it under tracemalloc (which slows it) for
+    the peak heap."""
+    gc.collect()
+    t0 = time.perf_counter()
+    out = fn()
+    elapsed = time.perf_counter() - t0
+    del out
+    gc.collect()
+    tracemalloc.start()
+    out = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<38} {elapsed:8.2f}s  peak {peak / 2**20:8.1f} MiB")
+    return out
+
+
+def _load(path: str) -> dict:
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def _write_payload(args: argparse.Namespace) -> str:
+    """Synthesise a transcription and save it as JSON; returns the path."""
+    payload = fake_klangio.synth_transcription(
+        args.song_sec, args.tempo, args.notes_per_beat, args.polyphony, seed=1,
+    )
+    fd, path = tempfile.mkstemp(suffix=".json", prefix="bench_adapter_")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(payload, fh)
+    return path
+
+
+def _measure_decoded(path: str) -> None:
+    """The columnar adapter on an in-memory payload (freed on return)."""
+    payload = _load(path)
+    _measure("columnar adapter (decoded payload)", lambda: adapt_klangio_json_columnar(payload))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--song-sec", type=float, default=1800.0)
+    p.add_argument("--tempo", type=float, default=120.0)
+    p.add_argument("--notes-per-beat", type=int, default=4)
+    p.add_argument("--polyphony", type=int, default=3)
+    args = p.parse_args()
+
+    path = _write_payload(args)
+    print(f"payload: {os.path.getsize(path) / 2**20:.1f} MiB JSON, "
+          "incremental parser: "
+          + (f"ijson ({klangio_columnar.ijson.backend})" if klangio_columnar.ijson
+             else "none (json.load)"))
+
+    try:
+        legacy = _measure(
+            "dict adapter (json.load + adapt)",
+            lambda: adapt_klangio_json_to_transcription_result(_load(path)),
+        )
+        _measure_decoded(path)
+        columnar = _measure("columnar adapter (JSON file)", lambda: adapt_klangio_json_columnar(path))
+        notes = _measure("  + materialise notes", lambda: columnar["note_columns"].to_dicts())
+
+        cols = columnar["note_columns"]
+        print(f"notes: {len(cols)}  columns: {cols.nbytes / 2**20:.1f} MiB")
+        worst = max(
+            max(abs(a["start_sec"] - b["start_sec"]), abs(a["duration_sec"] - b["duration_sec"]))
+            for a, b in zip(legacy["notes"], notes)
+        )
+        print(f"max |Δt| vs dict adapter: {worst * 1000:.3f} ms")
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Benchmark the Klangio ingest pipeline against the local fake.
+
+Runs N run_pipeline() calls with C concurrent workers and reports wall-clock
+time, throughput and HTTP counters::
+
+    python tools/bench_ingest.py --jobs 20 --concurrency 5 --latency 2
+
+Use --base-url to target an already running fake (or staging) instead of
+starting one in-process.
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tools import fake_klangio  # noqa: E402
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--jobs", type=int, default=10)
+    p.add_argument("--concurrency", type=int, default=4)
+    p.add_argument("--instrument", default="piano")
+    p.add_argument("--latency", type=float, default=2.0,
+                   help="mean latency of every stage on the in-process fake")
+    p.add_argument("--upload-mb", type=float, default=5.0)
+    p.add_argument("--base-url", default=None)
+    args = p.parse_args()
+
+    base_url = args.base_url
+    if base_url is None:
+        fake_args = fake_klangio.parse_args(
+            ["--host", "127.0.0.1", "--port", "0", "--stem-sec", "1"]
+            + [f"--latency={stage}={args.latency}" for stage in fake_klangio.STAGES]
+        )
+        server = fake_klangio.serve(fake_args)
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    # services.klangio reads its configuration at import time.
+    os.environ["KLANGIO_BASE_URL"] = base_url
+    os.environ.setdefault("KLANGIO_API_KEY", "bench")
+    os.environ.setdefault("KLANGIO_POLL_INTERVAL_SEC", "1")
+    from services import klangio, metrics
+
+    logging.basicConfig(level=logging.WARNING)
+    workdir = Path(tempfile.mkdtemp(prefix="bench_ingest_"))
+    durations: list[float] = []
+
+    def one(i: int) -> None:
+        job_dir = workdir / str(i)
+        job_dir.mkdir()
+        audio = job_dir / "audio.mp3"
+        audio.write_bytes(os.urandom(int(args.upload_mb * 1024 * 1024)))
+        t0 = time.monotonic()
+        klangio.transcribe(str(audio), args.instrument)
+        durations.append(time.monotonic() - t0)
+
+    t0 = time.monotonic()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one, range(args.jobs)))
+    wall = time.monotonic() - t0
+
+    print(f"jobs={args.jobs} concurrency={args.concurrency} wall={wall:.1f}s "
+          f"throughput={args.jobs / wall * 60:.1f} jobs/min")
+    print(f"per-job: median={statistics.median(durations):.1f}s max={max(durations):.1f}s")
+    print("client counters:", json.dumps(dict(metrics._pending), sort_keys=True))
+    try:
+        with urllib.request.urlopen(f"{base_url}/_stats") as resp:
+            print("server requests:", resp.read().decode())
+    except OSError:
+        pass
+
+
+if __name__ == "__main__":
+    main()
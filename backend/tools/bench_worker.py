@@ -0,0 +1,94 @@
+"""Benchmark per-job worker overhead: forked work horse vs. warm process.
+
+Replays what each worker mode does around a job, without Redis. The job
+is a no-op that opens a DB session (when --db is given) and makes one
+Klangio status request against the in-process fake::
+
+    python tools/bench_worker.py --jobs 50
+    python tools/bench_worker.py --jobs 50 --db   # needs DATABASE_URL
+
+"fork" mirrors the stock RQ worker: the parent has only imported what
+workers/worker.py imports, and every job runs in a freshly forked child
+that resolves the task function (importing workers.tasks) and connects
+from scratch. "warm" resolves the function once and reuses the
+connections, as workers/warm_worker.py does.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tools import fake_klangio  # noqa: E402
+
+
+def _job(base_url: str, use_db: bool) -> None:
+    from rq.utils import import_attribute
+    import_attribute("workers.tasks.start_job")  # what RQ does for every job
+    from services import klangio
+    klangio.get_transport().request("GET", f"{base_url}/_stats", timeout=10)
+    if use_db:
+        from sqlalchemy import text
+        from database import SessionLocal
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT 1"))
+        finally:
+            db.close()
+
+
+def _fork_run(base_url: str, use_db: bool) -> float:
+    t0 = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _job(base_url, use_db)
+        except BaseException:
+            code = 1
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise SystemExit("job failed in the forked child")
+    return time.perf_counter() - t0
+
+
+def _warm_run(base_url: str, use_db: bool) -> float:
+    t0 = time.perf_counter()
+    _job(base_url, use_db)
+    return time.perf_counter() - t0
+
+
+def _report(label: str, times: list[float]) -> None:
+    ms = sorted(t * 1000 for t in times)
+    print(f"{label:<6} median {statistics.median(ms):8.2f} ms   "
+          f"p90 {ms[int(len(ms) * 0.9) - 1]:8.2f} ms   max {ms[-1]:8.2f} ms")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--jobs", type=int, default=30)
+    p.add_argument("--db", action="store_true", help="open a session and SELECT 1 per job")
+    args = p.parse_args()
+
+    server = fake_klangio.serve(fake_klangio.parse_args(["--host", "127.0.0.1", "--port", "0"]))
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    os.environ.setdefault("KLANGIO_API_KEY", "bench")
+
+    # What the stock worker process has imported before it forks.
+    import workers.queues  # noqa: F401
+
+    fork = [_fork_run(base_url, args.db) for _ in range(args.jobs)]
+    _warm_run(base_url, args.db)  # the warm process's first job pays the imports
+    warm = [_warm_run(base_url, args.db) for _ in range(args.jobs)]
+
+    print(f"{args.jobs} jobs, database {'on' if args.db else 'off'}")
+    _report("fork", fork)
+    _report("warm", warm)
+
+
+if __name__ == "__main__":
+    main()
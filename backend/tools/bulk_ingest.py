@@ -0,0 +1,141 @@
+"""Import a folder or ZIP archive of recordings through the bulk ingest API.
+
+A ZIP is uploaded as is; a folder is packed into a temporary uncompressed
+ZIP (audio is compressed already) and uploaded. With --server-local the
+folder is not uploaded: it is read on the server, relative to
+BULK_IMPORT_ROOT::
+
+    python tools/bulk_ingest.py ~/catalogue --instrument piano --watch
+    python tools/bulk_ingest.py catalogue/1959 --server-local --instrument bass
+
+Only the standard library is used, so it runs outside the backend image.
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+import zipfile
+
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".m4a", ".flac", ".ogg", ".aac")
+_CHUNK = 1024 * 1024
+
+
+def _request(base_url: str, method: str, path: str, body=None, headers: dict | None = None) -> dict:
+    url = urllib.parse.urlsplit(base_url)
+    conn_cls = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(url.netloc, timeout=300)
+    try:
+        conn.request(method, url.path.rstrip("/") + path, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        data = resp.read()
+        if resp.status >= 400:
+            sys.exit(f"{method} {path}: HTTP {resp.status}: {data.decode(errors='replace')}")
+        return json.loads(data)
+    finally:
+        conn.close()
+
+
+def _pack(directory: str) -> str:
+    """Audio files under ``directory`` in a temporary ZIP_STORED archive."""
+    fd, path = tempfile.mkstemp(prefix="bulk_ingest_", suffix=".zip")
+    os.close(fd)
+    count = 0
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+        for dirpath, dirnames, filenames in os.walk(directory):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for name in sorted(filenames):
+                if name.startswith(".") or not name.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                full = os.path.join(dirpath, name)
+                zf.write(full, os.path.relpath(full, directory))
+                count += 1
+    print(f"Packed {count} files from {directory}")
+    return path
+
+
+def _upload(base_url: str, archive: str, fields: dict[str, str], headers: dict) -> dict:
+    """POST /batches, streaming the archive from disk."""
+    boundary = uuid.uuid4().hex
+    head = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{k}"\r\n\r\n{v}\r\n'.encode()
+        for k, v in fields.items()
+    ) + (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="archive"; '
+        f'filename="{os.path.basename(archive)}"\r\nContent-Type: application/zip\r\n\r\n'
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    size = os.path.getsize(archive)
+
+    def body():
+        yield head
+        sent = 0
+        with open(archive, "rb") as fh:
+            for chunk in iter(lambda: fh.read(_CHUNK), b""):
+                sent += len(chunk)
+                print(f"\rUploading {sent / 2**20:.0f}/{size / 2**20:.0f} MiB", end="", flush=True)
+                yield chunk
+        print()
+        yield tail
+
+    return _request(base_url, "POST", "/batches", body(), {
+        **headers,
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(head) + size + len(tail)),
+    })
+
+
+def _watch(base_url: str, batch_id: str, interval: float) -> None:
+    while True:
+        batch = _request(base_url, "GET", f"/batches/{batch_id}")
+        counts = ", ".join(f"{k}={v}" for k, v in sorted(batch["jobs_by_status"].items()))
+        print(f"{batch['status']:<9} {batch['progress']:3d}%  files={batch['file_count']} "
+              f"duplicates={batch['duplicate_count']} rejected={len(batch['rejected'])}  {counts}")
+        unfinished = batch["file_count"] - sum(
+            n for s, n in batch["jobs_by_status"].items() if s in ("READY", "FAILED")
+        )
+        if batch["status"] == "FAILED" or (batch["status"] == "INGESTED" and unfinished == 0):
+            return
+        time.sleep(interval)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("source", help="ZIP archive or folder")
+    p.add_argument("--instrument", required=True)
+    p.add_argument("--lane", default="batch")
+    p.add_argument("--api", default=os.getenv("JAZZ_LICK_LAB_API", "http://localhost:8000"))
+    p.add_argument("--tenant", default=None, help="sent as X-Tenant-ID")
+    p.add_argument("--server-local", action="store_true",
+                   help="source is a folder on the server, relative to BULK_IMPORT_ROOT")
+    p.add_argument("--watch", action="store_true", help="poll progress until every job finishes")
+    p.add_argument("--interval", type=float, default=5.0)
+    args = p.parse_args()
+
+    headers = {"X-Tenant-ID": args.tenant} if args.tenant else {}
+    if args.server_local:
+        batch = _request(args.api, "POST", "/batches/manifest", json.dumps({
+            "directory": args.source, "instrument": args.instrument, "lane": args.lane,
+        }).encode(), {**headers, "Content-Type": "application/json"})
+    elif os.path.isdir(args.source):
+        archive = _pack(args.source)
+        try:
+            batch = _upload(args.api, archive,
+                            {"instrument": args.instrument, "lane": args.lane}, headers)
+        finally:
+            os.remove(archive)
+    else:
+        batch = _upload(args.api, args.source,
+                        {"instrument": args.instrument, "lane": args.lane}, headers)
+
+    print(f"Batch {batch['id']} created; GET /batches/{batch['id']} for progress")
+    if args.watch:
+        _watch(args.api, batch["id"], args.interval)
+
+
+if __name__ == "__main__":
+    main()
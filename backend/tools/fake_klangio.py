@@ -0,0 +1,323 @@
+"""Local stand-in for the Klangio API, for offline development and load tests.
+
+Implements the endpoints services/klangio.py uses, with configurable stage
+latency, failure rates and payload sizes::
+
+    python tools/fake_klangio.py --port 8090 \\
+        --latency transcription=20 --latency source-separation=30 \\
+        --failure-rate chord-recognition=0.1 --song-sec 240
+
+then point the worker at it with KLANGIO_BASE_URL=http://localhost:8090
+(any non-empty KLANGIO_API_KEY is accepted).
+"""
+import argparse
+import io
+import json
+import logging
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("fake_klangio")
+
+STAGES = ("transcription", "source-separation", "chord-recognition", "beat-tracking")
+
+_DEFAULT_LATENCY = {
+    "transcription": 20.0,
+    "source-separation": 30.0,
+    "chord-recognition": 10.0,
+    "beat-tracking": 8.0,
+}
+
+_JOB_PATH = re.compile(r"^/job/([\w-]+)/(status|json|xml|pdf|audio)$")
+
+_PROGRESSION = ["Dm7", "G7", "Cmaj7", "Cmaj7", "Em7", "A7", "Dm7", "G7"]
+_FIFTHS_BY_KEY = {"C": 0, "F": -1, "Bb": -2, "G": 1, "D": 2}
+
+
+# ---------------------------------------------------------------------------
+# Synthetic payloads
+# ---------------------------------------------------------------------------
+
+def synth_transcription(
+    song_sec: float, tempo: float = 120.0, notes_per_beat: int = 2,
+    polyphony: int = 1, seed: int = 0,
+) -> dict:
+    """Transcription JSON in the MusicInfo/Parts shape Klangio returns."""
+    rng = random.Random(seed)
+    beats_per_measure = 4
+    measure_sec = beats_per_measure * 60.0 / tempo
+    n_measures = max(1, int(song_sec / measure_sec))
+    slots = beats_per_measure * notes_per_beat
+    dur = 1.0 / slots
+
+    measures = []
+    pitch = 60
+    for _ in range(n_measures):
+        notes = []
+        for _ in range(slots):
+            if rng.random() < 0.1:
+                notes.append({"Midi": [-1], "Duration": dur})
+                continue
+            pitch = min(84, max(48, pitch + rng.choice((-4, -2, -1, 1, 2, 3, 5))))
+            chord = [pitch - 12 * i for i in range(polyphony)]
+            notes.append({"Midi": chord, "Duration": dur})
+        measures.append({"Voices": [{"Notes": notes}]})
+
+    return {
+        "MusicInfo": {
+            "Tempo": tempo,
+            "TimeSignature": f"{beats_per_measure}/4",
+            "AudioOffset": round(rng.uniform(0.0, 1.0), 3),
+        },
+        "Parts": [{"Measures": measures}],
+    }
+
+
+def synth_chords(song_sec: float, tempo: float = 120.0) -> list:
+    """Chord recognition JSON: [[start_sec, end_sec, symbol], ...]."""
+    measure_sec = 4 * 60.0 / tempo
+    chords = []
+    t, i = 0.0, 0
+    while t < song_sec:
+        chords.append([round(t, 3), round(min(t + measure_sec, song_sec), 3),
+                       _PROGRESSION[i % len(_PROGRESSION)]])
+        t += measure_sec
+        i += 1
+    return chords
+
+
+def synth_beats(song_sec: float, tempo: float = 120.0) -> list:
+    """Beat tracking JSON: [[timestamp_sec, beat_in_measure], ...]."""
+    beat_sec = 60.0 / tempo
+    return [[round(i * beat_sec, 3), float(i % 4 + 1)]
+            for i in range(int(song_sec / beat_sec))]
+
+
+def synth_musicxml(key: str = "C") -> bytes:
+    fifths = _FIFTHS_BY_KEY.get(key, 0)
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<score-partwise version="3.1"><part-list><score-part id="P1">'
+        "<part-name>Fake</part-name></score-part></part-list>"
+        '<part id="P1"><measure number="1"><attributes><divisions>1</divisions>'
+        f"<key><fifths>{fifths}</fifths></key>"
+        "<time><beats>4</beats><beat-type>4</beat-type></time></attributes>"
+        "<note><rest/><duration>4</duration></note></measure></part></score-partwise>\n"
+    ).encode()
+
+
+def synth_pdf(size_kb: int) -> bytes:
+    head = b"%PDF-1.4\n% fake klangio score\n"
+    return head + b"0" * max(0, size_kb * 1024 - len(head)) + b"\n%%EOF\n"
+
+
+def synth_wav(seconds: float, sample_rate: int = 44100, channels: int = 2) -> bytes:
+    """Silent 16-bit PCM WAV."""
+    data_len = int(seconds * sample_rate) * channels * 2
+    buf = io.BytesIO()
+    buf.write(b"RIFF" + struct.pack("<I", 36 + data_len) + b"WAVE")
+    buf.write(b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate,
+                                    sample_rate * channels * 2, channels * 2, 16))
+    buf.write(b"data" + struct.pack("<I", data_len))
+    buf.write(bytes(data_len))
+    return buf.getvalue()
+
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+class FakeKlangio:
+    """Job bookkeeping shared by all request handler threads."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.latency = {**_DEFAULT_LATENCY, **args.latency}
+        self.failure_rate = {stage: 0.0 for stage in STAGES} | args.failure_rate
+        self.rng = random.Random(args.seed)
+        self.jobs: dict[str, dict] = {}
+        self.lock = threading.Lock()
+        self.counts: dict[str, int] = {}
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def submit(self, stage: str, upload_bytes: int) -> str:
+        with self.lock:
+            mean = self.latency[stage]
+            duration = max(0.0, self.rng.gauss(mean, mean * self.args.jitter))
+            job_id = str(uuid.uuid4())
+            self.jobs[job_id] = {
+                "stage": stage,
+                "ready_at": time.monotonic() + duration,
+                "fails": self.rng.random() < self.failure_rate[stage],
+                "seed": self.rng.randrange(1 << 30),
+            }
+        logger.info("%s job %s (%d bytes uploaded, %.1fs)", stage, job_id, upload_bytes, duration)
+        return job_id
+
+    def status(self, job: dict) -> str:
+        if time.monotonic() < job["ready_at"]:
+            return "IN_PROGRESS"
+        return "FAILED" if job["fails"] else "COMPLETED"
+
+
+def _make_handler(fake: FakeKlangio) -> type[BaseHTTPRequestHandler]:
+    args = fake.args
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+        # Headers and body go out in separate writes; with Nagle on, every
+        # reused connection would wait ~40ms for the client's delayed ACK.
+        disable_nagle_algorithm = True
+
+        def log_message(self, fmt: str, *a) -> None:
+            logger.debug(fmt, *a)
+
+        def _send(self, status: int, body: bytes, content_type: str) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _json(self, status: int, obj) -> None:
+            self._send(status, json.dumps(obj).encode(), "application/json")
+
+        def _precheck(self) -> bool:
+            fake.count(f"{self.command} {urlsplit(self.path).path.split('/')[1]}")
+            if not self.headers.get("kl-api-key"):
+                self._json(401, {"detail": "missing kl-api-key"})
+                return False
+            if fake.rng.random() < args.http_error_rate:
+                self._json(503, {"detail": "injected failure"})
+                return False
+            return True
+
+        def do_POST(self) -> None:
+            # Always drain the upload so the connection can be reused.
+            length = int(self.headers.get("Content-Length") or 0)
+            remaining = length
+            while remaining:
+                remaining -= len(self.rfile.read(min(remaining, 1 << 16)))
+            if not self._precheck():
+                return
+            stage = urlsplit(self.path).path.strip("/")
+            if stage not in STAGES:
+                self._json(404, {"detail": f"unknown endpoint {stage!r}"})
+                return
+            self._json(200, {"job_id": fake.submit(stage, length)})
+
+        def do_GET(self) -> None:
+            if self.path == "/_stats":
+                with fake.lock:
+                    self._json(200, {"requests": dict(fake.counts), "jobs": len(fake.jobs)})
+                return
+            if not self._precheck():
+                return
+            parts = urlsplit(self.path)
+            match = _JOB_PATH.match(parts.path)
+            job = fake.jobs.get(match.group(1)) if match else None
+            if job is None:
+                self._json(404, {"detail": "job not found"})
+                return
+
+            what = match.group(2)
+            status = fake.status(job)
+            if what == "status":
+                body = {"status": status}
+                if status == "FAILED":
+                    body["error_message"] = "injected stage failure"
+                self._json(200, body)
+                return
+            if status != "COMPLETED":
+                self._json(409, {"detail": f"job is {status}"})
+                return
+
+            stage = job["stage"]
+            if what == "json":
+                if stage == "chord-recognition":
+                    self._json(200, synth_chords(args.song_sec, args.tempo))
+                elif stage == "beat-tracking":
+                    self._json(200, synth_beats(args.song_sec, args.tempo))
+                else:
+                    self._json(200, synth_transcription(
+                        args.song_sec, args.tempo, args.notes_per_beat,
+                        args.polyphony, job["seed"],
+                    ))
+            elif what == "xml":
+                self._send(200, synth_musicxml(args.key), "application/xml")
+            elif what == "pdf":
+                self._send(200, synth_pdf(args.pdf_kb), "application/pdf")
+            else:
+                stem = parse_qs(parts.query).get("stem_type", ["?"])[0]
+                logger.debug("stem download %s for %s", stem, match.group(1))
+                self._send(200, synth_wav(args.stem_sec), "audio/wav")
+
+    return Handler
+
+
+def _stage_map(values: list[str]) -> dict[str, float]:
+    out = {}
+    for item in values:
+        stage, _, value = item.partition("=")
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError(f"unknown stage {stage!r}; choose from {STAGES}")
+        out[stage] = float(value)
+    return out
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--port", type=int, default=8090)
+    p.add_argument("--latency", action="append", default=[], metavar="STAGE=SEC",
+                   help="mean processing time per stage")
+    p.add_argument("--jitter", type=float, default=0.2,
+                   help="latency standard deviation as a fraction of the mean")
+    p.add_argument("--failure-rate", action="append", default=[], metavar="STAGE=P",
+                   help="probability that a stage job ends FAILED")
+    p.add_argument("--http-error-rate", type=float, default=0.0,
+                   help="probability that any request gets an HTTP 503")
+    p.add_argument("--song-sec", type=float, default=180.0,
+                   help="length of the synthetic song (drives JSON payload size)")
+    p.add_argument("--tempo", type=float, default=120.0)
+    p.add_argument("--notes-per-beat", type=int, default=2)
+    p.add_argument("--polyphony", type=int, default=1)
+    p.add_argument("--key", default="C", choices=sorted(_FIFTHS_BY_KEY))
+    p.add_argument("--pdf-kb", type=int, default=200)
+    p.add_argument("--stem-sec", type=float, default=10.0,
+                   help="length of the silent stem WAV returned by /audio")
+    p.add_argument("--seed", type=int, default=None)
+    args = p.parse_args(argv)
+    args.latency = _stage_map(args.latency)
+    args.failure_rate = _stage_map(args.failure_rate)
+    return args
+
+
+def serve(args: argparse.Namespace) -> ThreadingHTTPServer:
+    """Start the fake in a background thread and return the server."""
+    server = ThreadingHTTPServer((args.host, args.port), _make_handler(FakeKlangio(args)))
+    threading.Thread(target=server.serve_forever, name="fake-klangio", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    cli_args = parse_args()
+    srv = serve(cli_args)
+    logger.info("Fake Klangio listening on %s:%d", cli_args.host, srv.server_port)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
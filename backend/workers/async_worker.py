@@ -0,0 +1,215 @@
+"""Asyncio worker: many pipeline stages at once in a single process.
+
+``workers/worker.py`` forks a work horse for each job and runs one job at a
+time, yet Klangio stages spend nearly all of that time waiting on uploads,
+polls and downloads. This worker consumes the same queues and keeps up to
+``WORKER_CONCURRENCY`` jobs in flight::
+
+    python workers/async_worker.py klangio default
+
+The event loop dequeues jobs, dispatches them and runs RQ housekeeping
+(scheduled retries, heartbeats, registry cleaning). The Klangio client is
+blocking, so every job runs on an executor thread through a fork-free RQ
+worker (a "slot"). Registries, retries and dependents therefore work as
+they do with the classic worker. Transcription adaptation goes to a
+process pool (workers/cpu_pool.py).
+"""
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from rq import SimpleWorker
+from rq.exceptions import DequeueTimeout
+from rq.job import Job as RQJob
+from rq.scheduler import RQScheduler
+from rq.timeouts import TimerDeathPenalty
+from rq.worker import WorkerStatus
+
+from config import settings
+from workers import cpu_pool
+from workers.fair_queue import FairQueue, FairWorker
+from workers.queues import ALL_QUEUES, lane_order, lane_queues
+from workers.warm_worker import preload
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+
+_concurrency = int(os.getenv("WORKER_CONCURRENCY", "32"))
+_cpu_processes = int(os.getenv("WORKER_CPU_PROCESSES", "2"))
+
+_DEQUEUE_TIMEOUT = 5      # seconds; also how quickly a shutdown is noticed
+_SCHEDULER_INTERVAL = 1   # seconds between moves of due retries onto queues
+_MAINTENANCE_INTERVAL = 60
+
+
+class _Slot(FairWorker, SimpleWorker):
+    """One concurrency slot, registered with RQ as a worker of its own.
+
+    Jobs run on executor threads, so timeouts use a timer (SIGALRM only
+    reaches the main thread) and signals are left to the event loop.
+    """
+
+    death_penalty_class = TimerDeathPenalty
+
+    def _install_signal_handlers(self):
+        pass
+
+
+class AsyncWorker:
+    def __init__(self, queue_names: list[str], connection: redis.Redis, concurrency: int):
+        self.connection = connection
+        self.queues = lane_queues(queue_names, connection)
+        self.lane_order = lane_order()
+        base = f"{socket.gethostname()}.{os.getpid()}"
+        self.slots = [
+            _Slot(self.queues, connection=connection, name=f"{base}.{i}", lane_order=self.lane_order)
+            for i in range(concurrency)
+        ]
+        self.scheduler = RQScheduler([q.name for q in self.queues], connection=connection)
+        self._jobs = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="job")
+        # BLPOP blocks, so dequeueing gets a thread of its own.
+        self._dequeuer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dequeue")
+        self._stop: asyncio.Event | None = None
+
+    # -- job execution (executor threads) ------------------------------------
+
+    def _dequeue(self) -> tuple[RQJob, FairQueue] | None:
+        try:
+            return FairQueue.dequeue_any(
+                self.lane_order.order(self.queues), _DEQUEUE_TIMEOUT,
+                connection=self.connection,
+                death_penalty_class=_Slot.death_penalty_class,
+            )
+        except DequeueTimeout:
+            return None
+
+    def _execute(self, slot: _Slot, job: RQJob, queue: FairQueue) -> None:
+        job.redis_server_version = slot.get_redis_server_version()
+        slot.execute_job(job, queue)
+        slot.heartbeat()
+
+    # -- housekeeping ---------------------------------------------------------
+
+    def _register(self) -> None:
+        for slot in self.slots:
+            slot.register_birth()
+            slot.set_state(WorkerStatus.IDLE)
+
+    def _unregister(self) -> None:
+        for slot in self.slots:
+            slot.register_death()
+        if self.scheduler.acquired_locks:
+            self.scheduler.release_locks()
+
+    def _run_scheduler(self) -> None:
+        """What ``work(with_scheduler=True)`` does in a separate process:
+        enqueue retries and other scheduled jobs that are due."""
+        if self.scheduler.should_reacquire_locks:
+            self.scheduler.acquire_locks()
+        if self.scheduler.acquired_locks:
+            self.scheduler.enqueue_scheduled_jobs()
+            self.scheduler.heartbeat()
+
+    def _maintain(self) -> None:
+        for slot in self.slots:
+            slot.heartbeat()
+        self.slots[0].clean_registries()
+
+    async def _housekeeping(self) -> None:
+        last_maintained = 0.0
+        while True:
+            try:
+                await asyncio.to_thread(self._run_scheduler)
+                if time.monotonic() - last_maintained >= _MAINTENANCE_INTERVAL:
+                    await asyncio.to_thread(self._maintain)
+                    last_maintained = time.monotonic()
+            except redis.RedisError as exc:
+                logger.warning("Worker housekeeping failed: %s", exc)
+            await asyncio.sleep(_SCHEDULER_INTERVAL)
+
+    # -- main loop ------------------------------------------------------------
+
+    def _request_stop(self) -> None:
+        if self._stop.is_set():
+            logger.warning("Second stop signal; exiting without waiting for jobs")
+            os._exit(1)
+        logger.info("Stopping: no new jobs, waiting for the running ones")
+        self._stop.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._request_stop)
+
+        await asyncio.to_thread(self._register)
+        logger.info("Async worker listening on %s, %d jobs at a time",
+                    ", ".join(q.name for q in self.queues), len(self.slots))
+        housekeeping = asyncio.create_task(self._housekeeping())
+        stopped = asyncio.create_task(self._stop.wait())
+        free = list(self.slots)
+        running: set[asyncio.Future] = set()
+
+        def release(fut: asyncio.Future, slot: _Slot) -> None:
+            running.discard(fut)
+            free.append(slot)
+            if fut.exception() is not None:  # RQ bookkeeping itself failed
+                logger.error("Slot %s: %s", slot.name, fut.exception())
+
+        connection_wait = 1.0
+        try:
+            while not self._stop.is_set():
+                if not free:
+                    await asyncio.wait(running | {stopped}, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                try:
+                    result = await loop.run_in_executor(self._dequeuer, self._dequeue)
+                except redis.ConnectionError as exc:
+                    logger.error("Could not reach Redis: %s; retrying in %.0fs", exc, connection_wait)
+                    await asyncio.sleep(connection_wait)
+                    connection_wait = min(connection_wait * 2, 60.0)
+                    continue
+                connection_wait = 1.0
+                if result is None:
+                    continue
+
+                job, queue = result
+                logger.info("%s: %s (%s)", queue.name, job.func_name, job.id)
+                slot = free.pop()
+                fut = loop.run_in_executor(self._jobs, self._execute, slot, job, queue)
+                running.add(fut)
+                fut.add_done_callback(lambda f, slot=slot: release(f, slot))
+
+            if running:
+                await asyncio.wait(running)
+        finally:
+            housekeeping.cancel()
+            stopped.cancel()
+            await asyncio.to_thread(self._unregister)
+            self._jobs.shutdown()
+            self._dequeuer.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # Queue names to consume, in priority order (default: all of them).
+    names = sys.argv[1:] or list(ALL_QUEUES)
+    conn = redis.from_url(settings.redis_url)
+    preload()
+    cpu_pool.start(_cpu_processes)
+    try:
+        asyncio.run(AsyncWorker(names, conn, _concurrency).run())
+    finally:
+        cpu_pool.shutdown()
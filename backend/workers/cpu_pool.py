@@ -0,0 +1,50 @@
+"""Process pool for the CPU-bound steps of a pipeline (transcription adaptation).
+
+Only the async worker starts one: there, many stages share a process and a
+long adaptation on one of its threads would hold the GIL and stall the rest.
+Elsewhere ``run`` calls the function inline.
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _init_process() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def start(processes: int) -> None:
+    """Route ``run`` calls through ``processes`` worker processes (0 = inline)."""
+    global _pool
+    if _pool is not None or processes <= 0:
+        return
+    # forkserver: forking a process with live threads and sockets is unsafe.
+    _pool = ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_process,
+    )
+    logger.info("CPU pool started with %d processes", processes)
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+        _pool = None
+
+
+def run(fn: Callable[..., Any], *args: Any) -> Any:
+    """``fn(*args)``, in the pool if one is running. ``fn`` and its
+    arguments must be picklable (a module-level function and plain data)."""
+    if _pool is None:
+        return fn(*args)
+    return _pool.submit(fn, *args).result()
@@ -0,0 +1,248 @@
+"""Fair sharing within a queue, weighted order across priority lanes.
+
+FairQueue serves each RQ queue round-robin across tenants. Every job gets
+a virtual finish tag, its cost past its tenant's previous tag (or past the
+current round if the tenant has nothing queued), and waits in a sorted set
+by tag next to the RQ list. Workers pop the lowest tag, so a tenant with 50
+queued stages delays a newcomer by about one stage, not 50. Enqueueing is
+O(log n) and never reorders the list. RQ re-enqueues dependents through
+the queue's own class, so later pipeline stages keep their place too.
+Jobs without a tenant, ``at_front`` pushes and scheduled retries stay in
+the RQ list, which is served first.
+
+The cost (``job.meta["cost"]``) is 1 unless workers/queues.py sets it from
+the recording's length. Then a short clip finishes, in virtual time,
+before a long set another tenant queued earlier, and runs first:
+shortest-job-first across tenants, first-come-first-served within one.
+
+Blocked workers wait on the RQ list and on a wake-up list that gets one
+entry per job in the sorted set.
+
+FairWorker consumes lanes (see workers/queues.py) in smooth weighted
+round-robin order and records how long jobs waited, per lane.
+"""
+import logging
+import math
+import threading
+import time
+from typing import Callable
+
+from rq import Queue, Worker
+from rq.exceptions import DequeueTimeout
+from rq.utils import as_text, utcnow
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+TENANT_META = "tenant"
+COST_META = "cost"
+
+# KEYS: queued zset (job -> tag), job cost hash (costs other than 1),
+#       tenant finish-tag zset, virtual-time key, wake-up list
+# ARGV: job id, tenant, cost
+_FAIR_PUSH = """
+local cost = tonumber(ARGV[3]) or 1
+local vt = tonumber(redis.call('GET', KEYS[4]) or '0')
+local finish = tonumber(redis.call('ZSCORE', KEYS[3], ARGV[2]) or '0')
+local tag = math.max(vt, finish) + cost
+redis.call('ZADD', KEYS[1], tag, ARGV[1])
+if cost ~= 1 then
+    redis.call('HSET', KEYS[2], ARGV[1], cost)
+end
+redis.call('ZADD', KEYS[3], tag, ARGV[2])
+redis.call('RPUSH', KEYS[5], '1')
+return tostring(tag)
+"""
+
+# KEYS: RQ queue list, then the _FAIR_PUSH keys
+_FAIR_POP = """
+local id = redis.call('LPOP', KEYS[1])
+if id then
+    return id
+end
+local popped = redis.call('ZPOPMIN', KEYS[2])
+if #popped == 0 then
+    redis.call('DEL', KEYS[6])  -- wake-ups left by removed jobs
+    return false
+end
+id = popped[1]
+local tag = tonumber(popped[2])
+local cost = tonumber(redis.call('HGET', KEYS[3], id) or '1')
+redis.call('HDEL', KEYS[3], id)
+redis.call('LPOP', KEYS[6])
+
+-- The round moves to where this job started; with nothing left queued,
+-- every tenant has been served and the next push starts a new one.
+local vt = tonumber(redis.call('GET', KEYS[5]) or '0')
+if redis.call('ZCARD', KEYS[2]) == 0 then
+    vt = math.max(vt, tag)
+else
+    vt = math.max(vt, tag - cost)
+end
+redis.call('SET', KEYS[5], vt)
+-- Forget tenants with nothing left in the queue.
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', vt)
+return id
+"""
+
+# The job being enqueued, for push_job_id (RQ only passes it the ID).
+_enqueuing = threading.local()
+
+
+def _fair_keys(queue_key: str) -> list[str]:
+    return [f"{queue_key}:fair:{name}" for name in ("queued", "cost", "tenants", "vt", "wake")]
+
+
+class FairQueue(Queue):
+    """RQ queue ordered round-robin by tenant (``job.meta["tenant"]``),
+    weighted by ``job.meta["cost"]``.
+
+    Jobs without a tenant, and ``at_front`` pushes, go where plain RQ puts
+    them, and are dequeued before tenant jobs.
+    """
+
+    def _enqueue_job(self, job, pipeline=None, at_front=False):
+        _enqueuing.job = job
+        try:
+            return super()._enqueue_job(job, pipeline=pipeline, at_front=at_front)
+        finally:
+            _enqueuing.job = None
+
+    def push_job_id(self, job_id, pipeline=None, at_front=False):
+        job = getattr(_enqueuing, "job", None)
+        meta = job.meta if job is not None and job.id == job_id else {}
+        tenant = meta.get(TENANT_META)
+        if tenant is None or at_front:
+            return super().push_job_id(job_id, pipeline=pipeline, at_front=at_front)
+        script = self.connection.register_script(_FAIR_PUSH)
+        script(
+            keys=_fair_keys(self.key),
+            args=[job_id, tenant, meta.get(COST_META, 1)],
+            client=pipeline if pipeline is not None else self.connection,
+        )
+
+    @classmethod
+    def lpop(cls, queue_keys, timeout, connection=None):
+        """Pop from the first of ``queue_keys`` that has a job: its RQ list,
+        else its lowest tag. Blocks up to ``timeout`` seconds if all are
+        empty (None: return None instead)."""
+        pop = connection.register_script(_FAIR_POP)
+        wake_keys = {_fair_keys(key)[4]: key for key in queue_keys}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            for queue_key in queue_keys:
+                job_id = pop(keys=[queue_key, *_fair_keys(queue_key)])
+                if job_id is not None:
+                    return queue_key, job_id
+            if timeout is None:
+                return None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DequeueTimeout(timeout, queue_keys)
+            result = connection.blpop([*queue_keys, *wake_keys], math.ceil(remaining))
+            if result is None:
+                raise DequeueTimeout(timeout, queue_keys)
+            key, value = as_text(result[0]), result[1]
+            if key not in wake_keys:
+                return key, value
+            # Put the wake-up back for whichever pop takes the job, and go
+            # round again so lane order still applies.
+            connection.rpush(key, value)
+
+    @classmethod
+    def lmove(cls, connection, queue_key, timeout):
+        # RQ uses this (and an intermediate list) for single-queue workers.
+        return cls.lpop([queue_key], timeout, connection=connection)
+
+    @property
+    def count(self) -> int:
+        return super().count + self.connection.zcard(_fair_keys(self.key)[0])
+
+    def get_job_ids(self, offset: int = 0, length: int = -1) -> list[str]:
+        """The RQ list, then tenant jobs in the order they will run."""
+        job_ids = super().get_job_ids(offset, length)
+        if length < 0 or len(job_ids) < length:
+            start = max(0, offset - self.connection.llen(self.key))
+            end = -1 if length < 0 else start + length - len(job_ids) - 1
+            job_ids += [as_text(job_id) for job_id in
+                        self.connection.zrange(_fair_keys(self.key)[0], start, end)]
+        return job_ids
+
+    def remove(self, job_or_id, pipeline=None):
+        job_id = job_or_id.id if isinstance(job_or_id, self.job_class) else job_or_id
+        queued, costs = _fair_keys(self.key)[:2]
+        connection = pipeline if pipeline is not None else self.connection
+        connection.zrem(queued, job_id)
+        connection.hdel(costs, job_id)
+        return super().remove(job_id, pipeline=pipeline)
+
+    def empty(self):
+        queued = _fair_keys(self.key)[0]
+        prefix = self.job_class.redis_job_namespace_prefix
+        job_ids = [as_text(job_id) for job_id in self.connection.zrange(queued, 0, -1)]
+        with self.connection.pipeline() as pipeline:
+            for job_id in job_ids:
+                pipeline.delete(prefix + job_id, f"{prefix}{job_id}:dependents")
+            pipeline.delete(*_fair_keys(self.key))
+            pipeline.execute()
+        return super().empty() + len(job_ids)
+
+
+class LaneOrder:
+    """Smooth weighted round-robin (as in nginx) over priority lanes.
+
+    With weights interactive=4, batch=1, five consecutive dequeues try batch
+    first once and interactive first four times. A lane that is empty falls
+    through to the next, so no lane waits while there is capacity.
+    """
+
+    def __init__(self, weights: dict[str, int], lane_of: Callable[[str], str]):
+        self._weights = weights
+        self.lane_of = lane_of  # queue name -> lane
+        self._current = {lane: 0 for lane in weights}
+        self._lock = threading.Lock()
+
+    def next(self) -> list[str]:
+        """Lanes in the order the next dequeue should try them."""
+        with self._lock:
+            total = sum(self._weights.values())
+            for lane, weight in self._weights.items():
+                self._current[lane] += weight
+            first = max(self._current, key=self._current.get)
+            self._current[first] -= total
+        rest = sorted((l for l in self._weights if l != first), key=lambda l: -self._weights[l])
+        return [first, *rest]
+
+    def order(self, queues: list[Queue]) -> list[Queue]:
+        """``queues`` reordered lane by lane; within a lane the given order
+        (e.g. cpu before klangio) is kept."""
+        rank = {lane: i for i, lane in enumerate(self.next())}
+        return sorted(queues, key=lambda q: rank.get(self.lane_of(q.name), len(rank)))
+
+
+def record_wait(job, lane: str) -> None:
+    """Count how long ``job`` sat in its queue, under ``queue.<lane>.*``."""
+    if job.enqueued_at is None:
+        return
+    waited = max(0.0, (utcnow() - job.enqueued_at).total_seconds())
+    metrics.incr(f"queue.{lane}.dequeued")
+    metrics.incr(f"queue.{lane}.wait_seconds", waited)
+
+
+class FairWorker(Worker):
+    """RQ worker over FairQueues that tries lanes in weighted order."""
+
+    queue_class = FairQueue
+
+    def __init__(self, queues, *args, lane_order: LaneOrder, **kwargs):
+        super().__init__(queues, *args, **kwargs)
+        self.lane_order = lane_order
+        self._ordered_queues = lane_order.order(self.queues)
+
+    def reorder_queues(self, reference_queue):
+        self._ordered_queues = self.lane_order.order(self.queues)
+
+    def prepare_job_execution(self, job, remove_from_intermediate_queue=False):
+        super().prepare_job_execution(job, remove_from_intermediate_queue)
+        record_wait(job, self.lane_order.lane_of(job.origin))
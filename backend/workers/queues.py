@@ -0,0 +1,213 @@
+"""RQ queue names and per-stage scheduling policy.
+
+Klangio stages spend their time waiting on the network; CPU stages are short
+and must not queue behind them. Each queue gets its own worker pool
+(``python workers/worker.py klangio`` / ``... cpu``) so the pools scale
+independently.
+
+Every queue also comes in priority lanes: interactive uploads use the plain
+name, batch imports ``<name>.batch``. Workers are given the plain names and
+consume all lanes of them in weighted order (workers/fair_queue.py).
+"""
+import math
+import os
+from dataclasses import dataclass
+from datetime import timedelta
+
+from rq import Retry
+
+from database import get_redis
+from workers.fair_queue import COST_META, TENANT_META, FairQueue, LaneOrder
+
+KLANGIO = "klangio"  # submissions, status polls, downloads
+CPU = "cpu"          # cache lookup, adaptation, settings detection
+DEFAULT = "default"  # anything else (and jobs enqueued before the split)
+
+ALL_QUEUES = (CPU, KLANGIO, DEFAULT)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+
+def _parse_weights(spec: str) -> dict[str, int]:
+    weights = {lane: 1 for lane in LANES}
+    for item in filter(None, (s.strip() for s in spec.split(","))):
+        lane, _, weight = item.partition("=")
+        if lane not in weights:
+            raise ValueError(f"Unknown queue lane {lane!r} in QUEUE_LANE_WEIGHTS")
+        weights[lane] = max(1, int(weight))
+    return weights
+
+
+def _parse_lanes(spec: str) -> frozenset[str]:
+    lanes = frozenset(filter(None, (s.strip() for s in spec.split(","))))
+    unknown = lanes - set(LANES)
+    if unknown:
+        raise ValueError(f"Unknown queue lanes in QUEUE_SJF_LANES: {sorted(unknown)}")
+    return lanes
+
+
+# Configuration (read from environment)
+_lane_weights = _parse_weights(os.getenv("QUEUE_LANE_WEIGHTS", "interactive=4,batch=1"))
+# Lanes ordered shortest-job-first by audio length (see workers/fair_queue.py)
+_sjf_lanes = _parse_lanes(os.getenv("QUEUE_SJF_LANES", ""))
+_max_stage_timeout = int(os.getenv("STAGE_TIMEOUT_MAX_SEC", str(3 * 3600)))
+
+# While Klangio is down a stage is parked as WAITING_UPSTREAM and RQ re-runs
+# it on this schedule (seconds); it resumes from the checkpoint each time.
+UPSTREAM_RETRY = Retry(max=6, interval=[30, 60, 120, 300, 600, 900])
+
+
+@dataclass(frozen=True)
+class StageSpec:
+    queue: str
+    timeout: int  # seconds (RQ job_timeout), for a recording of unknown length
+    retry: Retry | None = None
+    per_audio_min: int = 0  # extra timeout seconds per minute of audio
+
+
+STAGES: dict[str, StageSpec] = {
+    "start": StageSpec(CPU, 120),
+    "separation": StageSpec(KLANGIO, 600, UPSTREAM_RETRY, per_audio_min=60),
+    "transcription": StageSpec(KLANGIO, 600, UPSTREAM_RETRY, per_audio_min=60),
+    "artifacts": StageSpec(KLANGIO, 300, UPSTREAM_RETRY, per_audio_min=15),
+    "chords": StageSpec(KLANGIO, 300, UPSTREAM_RETRY, per_audio_min=30),
+    "beats": StageSpec(KLANGIO, 300, UPSTREAM_RETRY, per_audio_min=30),
+    "finalize": StageSpec(CPU, 300, per_audio_min=20),
+    "pdf": StageSpec(KLANGIO, 300, per_audio_min=10),
+    # Read artifacts of a READY job (services/precompute.py).
+    "precompute": StageSpec(CPU, 300, per_audio_min=10),
+    # Bulk import of a whole batch (services/bulk_ingest.py), keyed by batch ID.
+    "ingest": StageSpec(CPU, 4 * 3600),
+    # Automatic retry of a failed job, scheduled with backoff (services/failures.py).
+    "resume": StageSpec(CPU, 120),
+}
+# Not part of a job's pipeline run: a scheduled resume must not block a
+# manual retry, which supersedes it.
+_OUTSIDE_PIPELINE = ("ingest", "resume")
+
+
+def lane_queue_name(name: str, lane: str) -> str:
+    return name if lane == INTERACTIVE else f"{name}.{lane}"
+
+
+def lane_of(queue_name: str) -> str:
+    _, _, suffix = queue_name.rpartition(".")
+    return suffix if suffix in LANES else INTERACTIVE
+
+
+def lane_queues(names, connection=None) -> list[FairQueue]:
+    """Every lane of the named queues, e.g. klangio → klangio, klangio.batch."""
+    conn = connection or get_redis()
+    return [
+        FairQueue(lane_queue_name(name, lane), connection=conn)
+        for lane in LANES for name in names
+    ]
+
+
+def lane_order() -> LaneOrder:
+    return LaneOrder(_lane_weights, lane_of)
+
+
+def get_queue(name: str, lane: str = INTERACTIVE) -> FairQueue:
+    return FairQueue(lane_queue_name(name, lane), connection=get_redis())
+
+
+def stage_rq_id(job_id: str, stage: str) -> str:
+    """RQ job ID of one pipeline stage (the first stage reuses the job ID)."""
+    return job_id if stage == "start" else f"{job_id}:{stage}"
+
+
+def stage_of(rq_id: str) -> str:
+    """Pipeline stage of an RQ job ID (inverse of stage_rq_id)."""
+    _, sep, stage = rq_id.rpartition(":")
+    return stage if sep and stage in STAGES else "start"
+
+
+def pipeline_rq_ids(job_id: str) -> list[str]:
+    return [stage_rq_id(job_id, stage) for stage in STAGES if stage not in _OUTSIDE_PIPELINE]
+
+
+def stage_timeout(stage: str, audio_sec: float | None) -> int:
+    """RQ timeout of a stage for a recording of ``audio_sec`` seconds:
+    the base timeout plus the stage's cost per minute of audio, capped at
+    STAGE_TIMEOUT_MAX_SEC."""
+    spec = STAGES[stage]
+    if not audio_sec or not spec.per_audio_min:
+        return spec.timeout
+    scaled = spec.timeout + math.ceil(spec.per_audio_min * audio_sec / 60)
+    return max(spec.timeout, min(scaled, _max_stage_timeout))
+
+
+def _meta(lane: str, tenant: str | None, audio_sec: float | None) -> dict | None:
+    if not tenant:
+        return None
+    meta = {TENANT_META: tenant}
+    if audio_sec and lane in _sjf_lanes:
+        meta[COST_META] = max(1, math.ceil(audio_sec / 60))  # minutes of audio
+    return meta
+
+
+def enqueue_stage(
+    stage: str, func, job_id: str, *args, depends_on=None,
+    lane: str | None = None, tenant: str | None = None, audio_sec: float | None = None,
+):
+    """Enqueue one pipeline stage on its queue with its timeout and retry policy.
+
+    ``lane`` picks the priority lane (default interactive); stages of one
+    ``tenant`` are interleaved fairly with other tenants' in that lane.
+    ``audio_sec``, the recording's length if known, scales the timeout and,
+    in QUEUE_SJF_LANES, the stage's place in the queue.
+    """
+    spec = STAGES[stage]
+    lane = lane or INTERACTIVE
+    return get_queue(spec.queue, lane).enqueue(
+        func, job_id, *args,
+        job_id=stage_rq_id(job_id, stage),
+        job_timeout=stage_timeout(stage, audio_sec),
+        retry=spec.retry,
+        depends_on=depends_on,
+        meta=_meta(lane, tenant, audio_sec),
+    )
+
+
+def schedule_stage(
+    stage: str, func, job_id: str, delay_sec: float,
+    lane: str | None = None, tenant: str | None = None, audio_sec: float | None = None,
+):
+    """enqueue_stage in ``delay_sec`` seconds (RQ's scheduler, which every
+    worker runs, moves it to the queue when due)."""
+    spec = STAGES[stage]
+    lane = lane or INTERACTIVE
+    return get_queue(spec.queue, lane).enqueue_in(
+        timedelta(seconds=delay_sec), func, job_id,
+        job_id=stage_rq_id(job_id, stage),
+        job_timeout=stage_timeout(stage, audio_sec),
+        retry=spec.retry,
+        meta=_meta(lane, tenant, audio_sec),
+    )
+
+
+def enqueue_stage_many(
+    stage: str, func, audio_secs: dict[str, float | None],
+    lane: str | None = None, tenant: str | None = None,
+) -> None:
+    """enqueue_stage for many jobs at once (no dependencies), in one Redis
+    round trip. ``audio_secs`` maps each job ID to its recording's length,
+    if known."""
+    if not audio_secs:
+        return
+    spec = STAGES[stage]
+    lane = lane or INTERACTIVE
+    queue = get_queue(spec.queue, lane)
+    queue.enqueue_many([
+        FairQueue.prepare_data(
+            func, (job_id,),
+            job_id=stage_rq_id(job_id, stage),
+            timeout=stage_timeout(stage, audio_sec),
+            retry=spec.retry,
+            meta=_meta(lane, tenant, audio_sec),
+        )
+        for job_id, audio_sec in audio_secs.items()
+    ])
@@ -1,17 +1,71 @@
 import logging
 import os
 import statistics
+import threading
+import time
 import xml.etree.ElementTree as ET
-
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator
+
+import redis
+from rq import get_current_job
+from rq.exceptions import InvalidJobOperation, NoSuchJobError
+from rq.job import Job as RQJob, JobStatus
+from sqlalchemy.orm import Session, aliased
 from sqlalchemy.orm.attributes import flag_modified
 
-from config import settings
-from database import SessionLocal
-from models import Job
-from services.klangio import fetch_job_pdf, fetch_job_xml, transcribe
+from database import SessionLocal, get_redis
+from models import Batch, Job
+from services import (
+    blobstore, bulk_ingest, failures, job_events, klangio_cache, metrics, precompute,
+)
+from services.artifacts import PDF_FILENAME, ensure_klangio_pdf, klangio_dir as job_klangio_dir
+from services.audio_codec import compress_stem
+from services.checkpoint import PipelineCheckpoint
+from services.klangio import (
+    KlangioError,
+    build_result,
+    needs_separation,
+    payloads_from_checkpoint,
+    run_pipeline_stages,
+)
+from services.klangio_poller import expected_duration
+from workers import cpu_pool
+from workers.queues import (
+    KLANGIO,
+    STAGES,
+    enqueue_stage,
+    enqueue_stage_many,
+    pipeline_rq_ids,
+    schedule_stage,
+    stage_of,
+    stage_rq_id,
+)
 
 logger = logging.getLogger(__name__)
 
+# RQ pipeline stage → the Klangio DAG stages it runs (services/klangio.py).
+_KLANGIO_STAGE_STEPS: dict[str, list[str]] = {
+    "separation": ["separation"],
+    "transcription": ["transcription"],
+    "artifacts": ["transcription_json", "xml"],
+    "chords": ["chords"],
+    "beats": ["beats"],
+}
+# RQ stages the result can do without (best-effort Klangio DAG stages).
+_OPTIONAL_STAGES = frozenset({"chords", "beats"})
+
+# Main-chain RQ stages → (job status, progress % at start and end, Klangio
+# label whose historical duration drives progress in between). chords and
+# beats run alongside and do not report.
+_STAGE_PROGRESS: dict[str, tuple[str, int, int, str | None]] = {
+    "separation": ("SEPARATING", 5, 35, "source-separation"),
+    "transcription": ("TRANSCRIBING", 35, 80, "transcription"),
+    "artifacts": ("FETCHING_ARTIFACTS", 80, 95, None),
+}
+_PROGRESS_TICK_SEC = 2.0
+
 
 def _compute_settings_from_beats(beat_tracking: list) -> dict:
     """Derive bpm, offset_sec, time_signature from Klangio beat tracking.
@@ -105,7 +159,119 @@ def _auto_detect_settings(result: dict) -> dict:
     return settings
 
 
-def process_job(job_id: str) -> None:
+def _persist_checkpoint(job_id: str):
+    """Checkpoint persister: merges one stage's entry into pipeline_state
+    under a row lock, in its own short session (DAG threads and RQ stages
+    running in parallel all call it)."""
+    def persist(name: str, stage: dict) -> None:
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.id == job_id).with_for_update().first()
+            if job is None:
+                return
+            state = dict(job.pipeline_state or {})
+            state["stages"] = {**(state.get("stages") or {}), name: stage}
+            job.pipeline_state = state
+            db.commit()
+        finally:
+            db.close()
+    return persist
+
+
+def _load_checkpoint(job: Job) -> PipelineCheckpoint:
+    return PipelineCheckpoint(
+        job.pipeline_state, work_dir=job_klangio_dir(job.id), persist=_persist_checkpoint(job.id),
+    )
+
+
+def _set_status(db: Session, job: Job, status: str, progress: int | None = None) -> None:
+    """Commit a status change and push it to /jobs/{id}/events listeners."""
+    job.status = status
+    db.commit()
+    job_events.publish(job.id, status, progress, job.error)
+
+
+@contextmanager
+def _stage_progress(
+    job_id: str, status: str, start: int, end: int, label: str | None,
+) -> Iterator[None]:
+    """Publish interpolated progress while a Klangio stage runs, based on
+    how long that stage usually takes (see KlangioPoller)."""
+    expected = expected_duration(label) if label else None
+    if not expected:
+        yield
+        return
+    stop = threading.Event()
+
+    def tick() -> None:
+        t0 = time.monotonic()
+        last = start
+        while not stop.wait(_PROGRESS_TICK_SEC):
+            fraction = min((time.monotonic() - t0) / expected, 0.95)
+            progress = int(start + (end - start) * fraction)
+            if progress != last:
+                job_events.publish(job_id, status, progress)
+                last = progress
+
+    ticker = threading.Thread(target=tick, name="job-progress", daemon=True)
+    ticker.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        ticker.join()
+
+
+def _seed_checkpoint(checkpoint: PipelineCheckpoint, payloads: dict) -> None:
+    """Record a cached Klangio result as completed stages, so finalize_job
+    reads it exactly like a freshly ingested one."""
+    checkpoint.submitted("transcription", payloads["transcription_id"])
+    if isinstance(payloads["transcription"], str):  # the JSON file, undecoded
+        checkpoint.completed("transcription", artifact=payloads["transcription"])
+    else:
+        checkpoint.completed("transcription", payload=payloads["transcription"])
+    for name in ("chords", "beats"):
+        checkpoint.completed(name, payload=payloads[name])
+    if payloads.get("stem_path"):
+        checkpoint.completed("separation", artifact=payloads["stem_path"])
+    if payloads.get("xml_path"):
+        checkpoint.completed("xml", artifact=payloads["xml_path"])
+
+
+def _key_from_musicxml(job_id: str, xml_path: str) -> str | None:
+    """Extract key signature from Klangio MusicXML."""
+    try:
+        tree = ET.parse(xml_path).getroot()
+        fifths_el = tree.find(".//{http://www.musicxml.org/ns/musicxml}key/{http://www.musicxml.org/ns/musicxml}fifths")
+        if fifths_el is None:
+            fifths_el = tree.find(".//key/fifths")
+        if fifths_el is not None:
+            from services.theory import fifths_to_key
+            detected_key = fifths_to_key(int(fifths_el.text))
+            if detected_key:
+                logger.info("Job %s: extracted key signature: %s", job_id, detected_key)
+                return detected_key
+    except Exception as parse_exc:
+        logger.warning("Job %s: failed to parse key from XML: %s", job_id, parse_exc)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Pipeline stages (each one an RQ job; see workers/queues.py)
+#
+#   start (cpu) ─┬─ [separation] → transcription → artifacts ─┬─ finalize (cpu)
+#                ├─ chords ────────────────────────────────────┤
+#                └─ beats ─────────────────────────────────────┘
+# ---------------------------------------------------------------------------
+
+def _route(job: Job) -> dict:
+    """Priority lane, tenant and audio length for enqueue_stage."""
+    return {"lane": job.lane, "tenant": job.tenant, "audio_sec": job.audio_duration_sec}
+
+
+def start_job(job_id: str) -> None:
+    """First stage: reuse a cached Klangio result, or schedule the Klangio
+    stages; either way finalize_job runs once they are done."""
     db = SessionLocal()
     job = None
     try:
@@ -114,60 +280,161 @@ def process_job(job_id: str) -> None:
             logger.error("Job %s not found", job_id)
             return
 
-        job.status = "TRANSCRIBING"
-        db.commit()
-        logger.info("Job %s: TRANSCRIBING", job_id)
+        job.error = None
+        first = "separation" if needs_separation(job.instrument) else "transcription"
+        _set_status(db, job, _STAGE_PROGRESS[first][0], 0)
+        logger.info("Job %s: %s", job_id, job.status)
+
+        # Identical audio + options were transcribed before: skip Klangio.
+        cache_key = klangio_cache.cache_key(job.audio_path, job.instrument, job.audio_sha256)
+        cached = klangio_cache.restore(cache_key, job.audio_path, job_klangio_dir(job_id))
+        if cached is not None:
+            logger.info("Job %s: reusing cached Klangio result", job_id)
+            _set_status(db, job, "FETCHING_ARTIFACTS", 95)
+            _seed_checkpoint(_load_checkpoint(job), cached[0])
+            enqueue_stage("finalize", finalize_job, job_id, cache_key, **_route(job))
+            return
+
+        if job.pipeline_state:
+            logger.info("Job %s: resuming from checkpoint", job_id)
+        route = _route(job)
+        transcription_deps = None
+        if needs_separation(job.instrument):
+            transcription_deps = enqueue_stage(
+                "separation", run_klangio_stage, job_id, "separation", **route,
+            )
+        transcription = enqueue_stage(
+            "transcription", run_klangio_stage, job_id, "transcription",
+            depends_on=transcription_deps, **route,
+        )
+        artifacts = enqueue_stage(
+            "artifacts", run_klangio_stage, job_id, "artifacts", depends_on=transcription, **route,
+        )
+        chords = enqueue_stage("chords", run_klangio_stage, job_id, "chords", **route)
+        beats = enqueue_stage("beats", run_klangio_stage, job_id, "beats", **route)
+        enqueue_stage(
+            "finalize", finalize_job, job_id, cache_key,
+            depends_on=[artifacts, chords, beats], **route,
+        )
+    except Exception as exc:
+        _fail_pipeline(db, job, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
 
-        result = transcribe(job.audio_path, job.instrument)
+def process_job(job_id: str) -> None:
+    """Entry point of jobs enqueued before the pipeline was split into stages."""
+    start_job(job_id)
 
-        # Fetch Klangio artifacts (best-effort)
-        klangio_tid = result.get("klangio_transcription_id")
-        if klangio_tid:
-            klangio_dir = os.path.join(settings.data_dir, "jobs", job_id, "klangio")
-            os.makedirs(klangio_dir, exist_ok=True)
-            artifacts: dict = {"klangio_job_id": klangio_tid}
 
-            try:
-                xml_bytes = fetch_job_xml(klangio_tid)
-                xml_path = os.path.join(klangio_dir, "transcription.musicxml")
-                with open(xml_path, "wb") as f:
-                    f.write(xml_bytes)
-                artifacts["xml_path"] = xml_path
-                artifacts["has_xml"] = True
-                logger.info("Job %s: saved Klangio XML (%d bytes)", job_id, len(xml_bytes))
-
-                # Extract key signature from Klangio MusicXML
-                try:
-                    tree = ET.fromstring(xml_bytes)
-                    fifths_el = tree.find(".//{http://www.musicxml.org/ns/musicxml}key/{http://www.musicxml.org/ns/musicxml}fifths")
-                    if fifths_el is None:
-                        fifths_el = tree.find(".//key/fifths")
-                    if fifths_el is not None:
-                        from services.theory import fifths_to_key
-                        detected_key = fifths_to_key(int(fifths_el.text))
-                        if detected_key:
-                            artifacts["key_signature"] = detected_key
-                            logger.info("Job %s: extracted key signature: %s", job_id, detected_key)
-                except Exception as parse_exc:
-                    logger.warning("Job %s: failed to parse key from XML: %s", job_id, parse_exc)
-            except Exception as exc:
-                logger.warning("Job %s: failed to fetch Klangio XML: %s", job_id, exc)
+def run_klangio_stage(job_id: str, stage: str) -> None:
+    """Network-bound stage: run some Klangio DAG stages, recording their
+    results in the job's checkpoint."""
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job or job.status == "FAILED":
+            return
+
+        def run() -> None:
+            run_pipeline_stages(
+                job.audio_path, job.instrument, _load_checkpoint(job),
+                _KLANGIO_STAGE_STEPS[stage], artifact_dir=job_klangio_dir(job_id),
+                audio_sec=job.audio_duration_sec,
+            )
 
+        if stage in _STAGE_PROGRESS:
+            status, start, end, label = _STAGE_PROGRESS[stage]
+            if stage == "transcription" and not needs_separation(job.instrument):
+                start = 5
+            _set_status(db, job, status, start)
+            with _stage_progress(job_id, status, start, end, label):
+                run()
+        else:
+            run()
+        logger.info("Job %s: Klangio stage %s done", job_id, stage)
+
+    except KlangioError as exc:
+        rq_job = get_current_job()
+        if not exc.transient or rq_job is None or not rq_job.retries_left:
+            if stage in _OPTIONAL_STAGES:
+                # finalize runs once this RQ job ends; the gap stays on record.
+                logger.warning("Job %s: giving up on optional stage %s, continuing without it: %s",
+                               job_id, stage, exc)
+                checkpoint = _load_checkpoint(job)
+                for name in _KLANGIO_STAGE_STEPS[stage]:
+                    checkpoint.skipped(name, str(exc))
+                metrics.incr(f"jobs.skipped_stages.{stage}")
+                return
+            _fail_pipeline(db, job, exc)
+            return
+        logger.warning("Job %s: Klangio unavailable during %s (%s); parked, %d retries left",
+                       job_id, stage, exc, rq_job.retries_left)
+        if stage in _STAGE_PROGRESS:
             try:
-                pdf_bytes = fetch_job_pdf(klangio_tid)
-                pdf_path = os.path.join(klangio_dir, "transcription.pdf")
-                with open(pdf_path, "wb") as f:
-                    f.write(pdf_bytes)
-                artifacts["pdf_path"] = pdf_path
-                artifacts["has_pdf"] = True
-                logger.info("Job %s: saved Klangio PDF (%d bytes)", job_id, len(pdf_bytes))
-            except Exception as exc:
-                logger.warning("Job %s: failed to fetch Klangio PDF: %s", job_id, exc)
-
-            result["klangio_artifacts"] = artifacts
+                _set_status(db, job, "WAITING_UPSTREAM")
+            except Exception:
+                db.rollback()
+                logger.exception("Job %s: could not record WAITING_UPSTREAM", job_id)
+        raise  # RQ reschedules the stage per its retry policy
+    except Exception as exc:
+        _fail_pipeline(db, job, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
+
+def finalize_job(job_id: str, cache_key: str) -> None:
+    """CPU stage: turn the checkpointed Klangio payloads into the job result."""
+    db = SessionLocal()
+    job = None
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            logger.error("Job %s not found", job_id)
+            return
+
+        klangio_dir = job_klangio_dir(job_id)
+        checkpoint = _load_checkpoint(job)
+        payloads = payloads_from_checkpoint(job.audio_path, job.instrument, checkpoint)
+        stem_path = payloads["stem_path"]
+        if stem_path and stem_path.endswith(".wav"):
+            payloads["stem_path"] = compress_stem(stem_path)
+            if payloads["stem_path"] != stem_path:
+                checkpoint.completed("separation", artifact=payloads["stem_path"])
+        paths = {"xml_path": payloads["xml_path"]} if payloads["xml_path"] else {}
+        # A PDF left over from an earlier attempt is still good.
+        pdf_path = os.path.join(klangio_dir, PDF_FILENAME)
+        if os.path.isfile(pdf_path):
+            paths["pdf_path"] = pdf_path
+        # Into the blob store first, so the cache entry links the same copy.
+        for role, path in (("stem", payloads["stem_path"]), ("xml", paths.get("xml_path")),
+                           ("pdf", paths.get("pdf_path"))):
+            if path and os.path.isfile(path):
+                blobstore.ref(db, job_id, role, path)
+        klangio_cache.store(cache_key, payloads, paths)
+
+        result = cpu_pool.run(build_result, payloads)
+
+        artifacts: dict = {
+            "klangio_job_id": payloads["transcription_id"],
+            "cache_key": cache_key,
+            **paths,
+        }
+        if "xml_path" in paths:
+            artifacts["has_xml"] = True
+            detected_key = _key_from_musicxml(job_id, paths["xml_path"])
+            if detected_key:
+                artifacts["key_signature"] = detected_key
+        if "pdf_path" in paths:
+            artifacts["has_pdf"] = True
+        result["klangio_artifacts"] = artifacts
 
         job.result_json = result
         job.status = "READY"
+        precompute.mark_changed(job)
 
         # Auto-detect settings (only if user hasn't already set them)
         existing_settings = result.get("settings") or {}
@@ -183,16 +450,300 @@ def process_job(job_id: str) -> None:
                 logger.info("Job %s: auto-populated settings", job_id)
 
         db.commit()
+        job_events.publish(job_id, "READY", 100)
         logger.info("Job %s: READY", job_id)
+        share_result(db, job)
+        enqueue_precompute(job)
+
+        # The PDF is only needed by /jobs/{id}/pdf, so it is fetched after
+        # READY (that endpoint queues it again if this fetch failed).
+        if "pdf_path" not in paths:
+            enqueue_stage("pdf", fetch_pdf_artifact, job_id, **_route(job))
 
     except Exception as exc:
-        logger.exception("Job %s failed: %s", job_id, exc)
+        _fail_pipeline(db, job, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
+
+def share_result(db: Session, job: Job) -> None:
+    """Make the in-batch duplicates of a READY job READY with a copy of its
+    result (see services/bulk_ingest.py)."""
+    duplicates = db.query(Job).filter(Job.duplicate_of == job.id, Job.status != "READY").all()
+    for dup in duplicates:
+        dup.result_json = dict(job.result_json)
+        dup.error = None
+        dup.status = "READY"
+        precompute.mark_changed(dup)
+    if duplicates:
+        db.commit()
+        for dup in duplicates:
+            job_events.publish(dup.id, "READY", 100)
+            enqueue_precompute(dup)
+        logger.info("Job %s: result shared with %d duplicates", job.id, len(duplicates))
+
+
+def _fail_pipeline(db: Session, job: Job | None, exc: Exception) -> None:
+    """Classify the failure and either schedule an automatic retry (the job
+    waits as WAITING_UPSTREAM) or mark the job FAILED, a dead letter. Then
+    cancel the stages still waiting on this one (RQ would otherwise keep
+    them deferred forever)."""
+    logger.exception("Job %s failed: %s", job.id if job else "?", exc)
+    rq_job = get_current_job()
+    stage = stage_of(rq_job.id) if rq_job is not None else None
+    failure = failures.classify(exc, upstream_stage=stage in STAGES and STAGES[stage].queue == KLANGIO)
+    try:
+        if job is not None:
+            job.error = str(exc)
+            job.failure_class = failure
+            job.failed_stage = stage
+            if not _schedule_retry(job, failure, exc):
+                _set_status(db, job, "FAILED")
+                for dup in db.query(Job).filter(Job.duplicate_of == job.id, Job.status != "READY"):
+                    dup.error = job.error
+                    _set_status(db, dup, "FAILED")
+                metrics.incr(f"jobs.dead_letters.{failure}")
+                logger.warning("Job %s: dead letter (%s in %s)", job.id, failure, stage)
+            else:
+                _set_status(db, job, "WAITING_UPSTREAM")
+    except Exception:
+        db.rollback()
+        logger.exception("Job %s: could not record failure", job.id)
+
+    pending = list(rq_job.dependent_ids) if rq_job is not None else []
+    seen: set[str] = set()
+    while pending:
+        dep_id = pending.pop()
+        if dep_id in seen:
+            continue
+        seen.add(dep_id)
         try:
-            if job is not None:
-                job.status = "FAILED"
-                job.error = str(exc)
-                db.commit()
-        except Exception:
-            pass
+            dep = RQJob.fetch(dep_id, connection=get_redis())
+            pending.extend(dep.dependent_ids)
+            if dep.get_status() == JobStatus.DEFERRED:
+                dep.cancel()
+        except (NoSuchJobError, InvalidJobOperation):
+            continue
+
+
+def _schedule_retry(job: Job, failure: str, exc: Exception) -> bool:
+    """Schedule resume_job with backoff if ``failure`` is retryable and the
+    job has automatic retries left."""
+    delay = failures.retry_delay(failure, job.retry_count or 0, exc)
+    if delay is None:
+        return False
+    try:
+        schedule_stage("resume", resume_job, job.id, delay, **_route(job))
+    except redis.RedisError as exc:
+        logger.warning("Job %s: could not schedule a retry: %s", job.id, exc)
+        return False
+    job.retry_count = (job.retry_count or 0) + 1
+    job.next_retry_at = datetime.utcnow() + timedelta(seconds=delay)
+    metrics.incr(f"jobs.auto_retries.{failure}")
+    logger.info("Job %s: %s in %s, retry %d in %.0fs",
+                job.id, failure, job.failed_stage, job.retry_count, delay)
+    return True
+
+
+def requeue_job(db: Session, job: Job, reset_retries: bool = True) -> list[Job]:
+    """Reset a failed job and its failed duplicates to CREATED and enqueue
+    its first stage. Completed stages are not run again: start_job resumes
+    from the checkpoint, with the audio already on disk.
+
+    Returns the duplicates that were reset with it.
+    """
+    job.status = "CREATED"
+    job.error = None
+    job.failure_class = None
+    job.failed_stage = None
+    job.next_retry_at = None
+    if reset_retries:
+        job.retry_count = 0
+    waiting = db.query(Job).filter(Job.duplicate_of == job.id, Job.status == "FAILED").all()
+    for dup in waiting:
+        dup.status = "CREATED"
+        dup.error = None
+    db.commit()
+    enqueue_stage("start", start_job, job.id, **_route(job))
+    for retried in (job, *waiting):
+        job_events.publish(retried.id, "CREATED", 0)
+    return waiting
+
+
+_ACTIVE_RQ_STATUSES = {
+    JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED, JobStatus.SCHEDULED,
+}
+
+
+def pipeline_active(job_id: str) -> bool:
+    """Whether any pipeline stage of the job is queued, running or waiting."""
+    stages = RQJob.fetch_many(pipeline_rq_ids(job_id), connection=get_redis())
+    return any(s is not None and s.get_status() in _ACTIVE_RQ_STATUSES for s in stages)
+
+
+def resume_job(job_id: str) -> None:
+    """Scheduled automatic retry of a job that failed on a retryable error."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        # Superseded by a manual retry or requeue.
+        if not job or job.status != "WAITING_UPSTREAM" or job.next_retry_at is None:
+            return
+        if pipeline_active(job_id):
+            # Stages of the failed run are still finishing (e.g. chords).
+            schedule_stage("resume", resume_job, job_id, 30, **_route(job))
+            return
+        logger.info("Job %s: automatic retry %d, resuming from checkpoint",
+                    job_id, job.retry_count or 0)
+        requeue_job(db, job, reset_retries=False)
+    except Exception as exc:
+        logger.exception("Job %s: automatic retry failed: %s", job_id, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
+
+def fetch_pdf_artifact(job_id: str) -> None:
+    """Background post-READY step: download the Klangio PDF for a job."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job or not job.result_json:
+            return
+        artifacts = dict(job.result_json.get("klangio_artifacts") or {})
+        if artifacts.get("has_pdf") or not artifacts.get("klangio_job_id"):
+            return
+
+        pdf_path = ensure_klangio_pdf(job_id, artifacts["klangio_job_id"])
+        blobstore.ref(db, job_id, "pdf", pdf_path)
+        if artifacts.get("cache_key"):
+            klangio_cache.attach(artifacts["cache_key"], "pdf", pdf_path)
+
+        db.refresh(job)
+        artifacts = {**(job.result_json.get("klangio_artifacts") or {}),
+                     "pdf_path": pdf_path, "has_pdf": True}
+        job.result_json = {**job.result_json, "klangio_artifacts": artifacts}
+        flag_modified(job, "result_json")
+        db.commit()
+    except Exception as exc:
+        logger.warning("Job %s: failed to fetch Klangio PDF: %s", job_id, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
+
+def enqueue_pdf_fetch(job: Job) -> None:
+    """Queue fetch_pdf_artifact for a READY job unless it is already queued
+    or running."""
+    rq_job = RQJob.fetch_many([stage_rq_id(job.id, "pdf")], connection=get_redis())[0]
+    if rq_job is not None and rq_job.get_status() in _ACTIVE_RQ_STATUSES:
+        return
+    enqueue_stage("pdf", fetch_pdf_artifact, job.id, **_route(job))
+
+
+def enqueue_precompute(job: Job) -> None:
+    """Queue precompute_artifacts after a change to a READY job's result.
+
+    Best effort: until it has run, readers compute inline.
+    """
+    try:
+        enqueue_stage("precompute", precompute_artifacts, job.id, **_route(job))
+    except redis.RedisError as exc:
+        logger.warning("Job %s: could not enqueue precompute: %s", job.id, exc)
+
+
+def precompute_artifacts(job_id: str) -> None:
+    """Background post-READY step: write the read artifacts for the job's
+    current result revision (services/precompute.py)."""
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job or job.status != "READY" or not job.result_json or job.result_rev is None:
+            return
+        rev = job.result_rev
+        if job.derived_rev == rev:
+            return
+
+        artifacts = cpu_pool.run(precompute.build, job_id, job.result_json)
+        precompute.write(job_id, rev, artifacts)
+        # An edit made meanwhile has bumped result_rev and queued its own run.
+        current = db.query(Job).filter(Job.id == job_id, Job.result_rev == rev) \
+            .update({Job.derived_rev: rev}, synchronize_session=False)
+        db.commit()
+        if current:
+            precompute.prune(job_id, rev)
+    except Exception as exc:
+        logger.warning("Job %s: failed to precompute artifacts: %s", job_id, exc)
+    finally:
+        db.close()
+        metrics.flush()
+
+
+def _settle_duplicates(db: Session, batch_id: str) -> None:
+    """Catch up duplicates inserted after their primary job had already
+    finished (finalize_job only sees the duplicates that existed then)."""
+    primary = aliased(Job)
+    finished = db.query(primary).join(Job, Job.duplicate_of == primary.id).filter(
+        Job.batch_id == batch_id,
+        Job.status == "CREATED",
+        primary.status.in_(("READY", "FAILED")),
+    ).distinct().all()
+    for job in finished:
+        if job.status == "READY":
+            share_result(db, job)
+            continue
+        for dup in db.query(Job).filter(Job.duplicate_of == job.id, Job.status == "CREATED"):
+            dup.error = job.error
+            _set_status(db, dup, "FAILED")
+
+
+def ingest_batch(batch_id: str) -> None:
+    """Import the files of a bulk batch and enqueue their jobs (see
+    services/bulk_ingest.py). Safe to re-run: it resumes where it stopped."""
+    db = SessionLocal()
+    try:
+        batch = db.query(Batch).filter(Batch.id == batch_id).first()
+        if not batch:
+            logger.error("Batch %s not found", batch_id)
+            return
+
+        def enqueue(audio_secs: dict[str, float | None]) -> None:
+            enqueue_stage_many("start", start_job, audio_secs, lane=batch.lane, tenant=batch.tenant)
+
+        # Jobs committed by an earlier attempt that died before enqueueing them.
+        stranded = dict(
+            db.query(Job.id, Job.audio_duration_sec).filter(
+                Job.batch_id == batch_id, Job.duplicate_of.is_(None), Job.status == "CREATED",
+            ).all()
+        )
+        if stranded:
+            queued = RQJob.fetch_many(list(stranded), connection=get_redis())
+            enqueue({
+                job_id: audio_sec
+                for (job_id, audio_sec), rq_job in zip(stranded.items(), queued) if rq_job is None
+            })
+
+        if batch.source == "zip":
+            files = bulk_ingest.zip_files(batch.archive_path)
+        else:
+            manifest = batch.manifest or {}
+            files = bulk_ingest.directory_files(manifest["directory"], manifest.get("items"))
+        bulk_ingest.ingest(db, batch, files, enqueue)
+        _settle_duplicates(db, batch_id)
+
+        batch.status = "INGESTED"
+        db.commit()
+        if batch.archive_path and os.path.isfile(batch.archive_path):
+            os.remove(batch.archive_path)
+    except Exception as exc:
+        logger.exception("Batch %s: ingest failed: %s", batch_id, exc)
+        db.rollback()
+        batch = db.query(Batch).filter(Batch.id == batch_id).first()
+        if batch is not None:
+            batch.status = "FAILED"
+            batch.error = str(exc)
+            db.commit()
     finally:
         db.close()
+        metrics.flush()
@@ -0,0 +1,136 @@
+"""Warm worker: jobs run in a long-lived process instead of a fresh fork.
+
+The stock RQ worker forks a work horse per job. The horse imports
+workers.tasks and all of services/ for its one job, opens a new Postgres
+connection and a new keep-alive connection to Klangio, then exits and
+takes them with it, along with in-process state such as the Klangio
+poll-duration history.
+
+With ``WORKER_MODE=warm``, workers/worker.py supervises a child process
+instead. The child preloads the task modules, opens the DB pool and runs
+jobs in-process (RQ's SimpleWorker), so all of that is paid once. Leaks
+then accumulate, so the child is recycled. After every job it compares
+its RSS with the level after its first job. Once it has grown by
+``WORKER_RECYCLE_MB`` (or ``WORKER_MAX_JOBS`` jobs have run) it stops
+between jobs, and the supervisor starts a fresh one.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import resource
+import signal
+import time
+
+import redis
+from rq import SimpleWorker
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import settings
+from database import engine
+from services import metrics
+from workers.fair_queue import FairWorker
+from workers.queues import lane_order, lane_queues
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Configuration (read from environment)
+# ---------------------------------------------------------------------------
+_recycle_bytes = int(os.getenv("WORKER_RECYCLE_MB", "256")) * 1024 * 1024
+_max_jobs = int(os.getenv("WORKER_MAX_JOBS", "0"))  # 0 = no limit
+
+# Modules a job would otherwise import on first use.
+_PRELOAD = ("workers.tasks", "services.theory", "services.klangio_columnar")
+_RESTART_DELAY = 5.0  # seconds before replacing a child that crashed
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process (peak RSS where /proc is missing)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def preload() -> None:
+    """Import the task modules and open a pooled DB connection."""
+    t0 = time.perf_counter()
+    for name in _PRELOAD:
+        importlib.import_module(name)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except SQLAlchemyError as exc:
+        logger.warning("Could not warm the database pool: %s", exc)
+    logger.info("Preloaded in %.2fs, RSS %.0f MiB", time.perf_counter() - t0, rss_bytes() / 2**20)
+
+
+class WarmWorker(FairWorker, SimpleWorker):
+    """FairWorker that runs jobs in its own process and stops itself once
+    its memory has grown too much."""
+
+    def __init__(self, *args, recycle_bytes: int, max_jobs: int, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recycle_bytes = recycle_bytes
+        self.max_jobs = max_jobs
+        self.jobs_run = 0
+        self.baseline_rss: int | None = None
+
+    def execute_job(self, job, queue):
+        super().execute_job(job, queue)
+        self.jobs_run += 1
+        rss = rss_bytes()
+        # Measured after the first job, when lazy imports and pools are warm.
+        if self.baseline_rss is None:
+            self.baseline_rss = rss
+            return
+        grown = rss - self.baseline_rss
+        if grown > self.recycle_bytes or (self.max_jobs and self.jobs_run >= self.max_jobs):
+            logger.info("Recycling after %d jobs (RSS grew %.0f MiB)", self.jobs_run, grown / 2**20)
+            metrics.incr("worker.recycled")
+            metrics.flush()
+            self._stop_requested = True
+
+
+def _run_child(names: list[str]) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    preload()
+    conn = redis.from_url(settings.redis_url)
+    worker = WarmWorker(
+        lane_queues(names, conn), connection=conn, lane_order=lane_order(),
+        recycle_bytes=_recycle_bytes, max_jobs=_max_jobs,
+    )
+    worker.work(with_scheduler=True)
+
+
+def supervise(names: list[str]) -> None:
+    """Keep one warm child running over ``names`` until SIGTERM (passed on
+    to the child, which finishes its current job) or SIGINT (which the
+    terminal already sends the child too)."""
+    # spawn: a clean interpreter, not a copy of this one.
+    ctx = multiprocessing.get_context("spawn")
+    stopping = False
+    child = None
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        if signum == signal.SIGTERM and child is not None and child.pid is not None:
+            os.kill(child.pid, signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while not stopping:
+        child = ctx.Process(target=_run_child, args=(names,), name="warm-worker")
+        child.start()
+        child.join()
+        if not stopping and child.exitcode != 0:
+            logger.error("Warm worker exited with %s; restarting in %.0fs",
+                         child.exitcode, _RESTART_DELAY)
+            time.sleep(_RESTART_DELAY)
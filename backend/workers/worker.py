@@ -1,9 +1,17 @@
 import logging
+import os
+import sys
 
 import redis
-from rq import Worker, Queue
 
 from config import settings
+from workers.fair_queue import FairWorker
+from workers.queues import ALL_QUEUES, lane_order, lane_queues
+from workers.warm_worker import supervise
+
+# Configuration (read from environment): "fork" runs every job in a fresh
+# work horse, "warm" in a long-lived, recycled process (workers/warm_worker.py).
+_mode = os.getenv("WORKER_MODE", "fork")
 
 logging.basicConfig(
     level=logging.INFO,
@@ -11,7 +19,13 @@ logging.basicConfig(
 )
 
 if __name__ == "__main__":
+    # Queue names to consume, in priority order (default: all of them), e.g.
+    # `python workers/worker.py cpu` for a pool that only runs CPU stages.
+    # Every priority lane of each is consumed.
+    names = sys.argv[1:] or list(ALL_QUEUES)
+    if _mode == "warm":
+        supervise(names)
+        sys.exit(0)
     conn = redis.from_url(settings.redis_url)
-    queues = [Queue("default", connection=conn)]
-    worker = Worker(queues, connection=conn)
+    worker = FairWorker(lane_queues(names, conn), connection=conn, lane_order=lane_order())
     worker.work(with_scheduler=True)
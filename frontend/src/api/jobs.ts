@@ -8,7 +8,16 @@ export interface Job {
   instrument: string;
   audio_path: string;
   created_at: string;
-  result_json: Record<string, unknown> | null;
+  result_json?: Record<string, unknown> | null;
+  error: string | null;
+  settings?: JobSettings | null;
+  progress?: number | null;
+}
+
+export interface JobEvent {
+  job_id: string;
+  status: string;
+  progress: number | null;
   error: string | null;
 }
 
@@ -73,15 +82,77 @@ export interface JobSettings {
 
 /* ── API calls ─────────────────────────────────────── */
 
-export async function createJob(file: File, instrument?: string): Promise<Job> {
+/**
+ * A fresh Idempotency-Key. `crypto.randomUUID` only exists in secure
+ * contexts (HTTPS or localhost); over plain HTTP a v4 UUID is built from
+ * `crypto.getRandomValues`, which is available everywhere.
+ */
+export function newIdempotencyKey(): string {
+  if (typeof crypto.randomUUID === "function") return crypto.randomUUID();
+  const bytes = crypto.getRandomValues(new Uint8Array(16));
+  bytes[6] = (bytes[6] & 0x0f) | 0x40; // version 4
+  bytes[8] = (bytes[8] & 0x3f) | 0x80; // RFC 4122 variant
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+/**
+ * Upload audio and create a job. Pass the same `idempotencyKey` when
+ * resubmitting the same upload (e.g. after a network error) and the server
+ * returns the job it already created instead of a second one.
+ */
+export async function createJob(
+  file: File,
+  instrument?: string,
+  idempotencyKey: string = newIdempotencyKey()
+): Promise<Job> {
   const form = new FormData();
   form.append("audio", file);
   if (instrument) form.append("instrument", instrument);
-  return apiFetch<Job>("/jobs", { method: "POST", body: form });
+  return apiFetch<Job>("/jobs", {
+    method: "POST",
+    body: form,
+    headers: { "Idempotency-Key": idempotencyKey },
+  });
+}
+
+/**
+ * Fetch a job. With `fields`, only those are returned (`?fields=`): the
+ * status fields alone are served from Redis, and leaving out `result_json`
+ * skips loading the transcription.
+ */
+export async function getJob(jobId: string, fields?: string[]): Promise<Job> {
+  const query = fields ? `?fields=${fields.join(",")}` : "";
+  return apiFetch<Job>(`/jobs/${jobId}${query}`);
 }
 
-export async function getJob(jobId: string): Promise<Job> {
-  return apiFetch<Job>(`/jobs/${jobId}`);
+/**
+ * Subscribe to status/progress pushed by the server (Server-Sent Events).
+ * Returns an unsubscribe function. `onUnavailable` fires when the stream
+ * cannot be used, so the caller can fall back to polling.
+ */
+export function subscribeJobEvents(
+  jobId: string,
+  onEvent: (event: JobEvent) => void,
+  onUnavailable: () => void
+): () => void {
+  const source = new EventSource(`${BASE_URL}/jobs/${jobId}/events`);
+  let failures = 0;
+  source.addEventListener("status", (e) => {
+    failures = 0;
+    const event = JSON.parse((e as MessageEvent).data) as JobEvent;
+    onEvent(event);
+    if (event.status === "READY" || event.status === "FAILED") source.close();
+  });
+  source.onerror = () => {
+    // EventSource reconnects by itself; give up after repeated failures.
+    failures += 1;
+    if (source.readyState === EventSource.CLOSED || failures >= 3) {
+      source.close();
+      onUnavailable();
+    }
+  };
+  return () => source.close();
 }
 
 export function getAudioUrl(jobId: string): string {
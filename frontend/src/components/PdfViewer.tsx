@@ -1,12 +1,47 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 
 interface Props {
   pdfUrl: string;
 }
 
+// The backend answers 202 while the worker is still downloading the PDF.
+const RETRY_MS = 5000;
+
 export default function PdfViewer({ pdfUrl }: Props) {
   const [error, setError] = useState(false);
-  const [loading, setLoading] = useState(true);
+  const [src, setSrc] = useState<string | null>(null);
+
+  useEffect(() => {
+    let cancelled = false;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    let objectUrl: string | null = null;
+
+    const load = async () => {
+      try {
+        const res = await fetch(pdfUrl);
+        if (cancelled) return;
+        if (res.status === 202) {
+          timer = setTimeout(load, RETRY_MS);
+          return;
+        }
+        if (!res.ok) {
+          setError(true);
+          return;
+        }
+        objectUrl = URL.createObjectURL(await res.blob());
+        if (!cancelled) setSrc(objectUrl);
+      } catch {
+        if (!cancelled) setError(true);
+      }
+    };
+    load();
+
+    return () => {
+      cancelled = true;
+      if (timer) clearTimeout(timer);
+      if (objectUrl) URL.revokeObjectURL(objectUrl);
+    };
+  }, [pdfUrl]);
 
   if (error) {
     return (
@@ -16,21 +51,15 @@ export default function PdfViewer({ pdfUrl }: Props) {
     );
   }
 
+  if (!src) {
+    return <p className="text-sm text-muted py-4 text-center">Loading PDF...</p>;
+  }
+
   return (
-    <>
-      {loading && (
-        <p className="text-sm text-muted py-4 text-center">Loading PDF...</p>
-      )}
-      <iframe
-        src={pdfUrl}
-        className="w-full border border-border rounded bg-white"
-        style={{ height: 700, display: loading ? "none" : "block" }}
-        onLoad={() => setLoading(false)}
-        onError={() => {
-          setLoading(false);
-          setError(true);
-        }}
-      />
-    </>
+    <iframe
+      src={src}
+      className="w-full border border-border rounded bg-white"
+      style={{ height: 700 }}
+    />
   );
 }
@@ -15,6 +15,7 @@ import PracticePackPanel from "../components/PracticePackPanel";
 import Button from "../components/Button";
 import {
   getJob,
+  subscribeJobEvents,
   getAudioUrl,
   getStemAudioUrl,
   type Job,
@@ -30,6 +31,10 @@ const ALL_KEYS = [
 
 const STEM_INSTRUMENTS = new Set(["bass", "piano", "guitar", "vocals", "drums"]);
 
+// JobPage loads notes separately, so result_json is never requested.
+const VIEW_FIELDS = ["id", "status", "instrument", "created_at", "error", "settings"];
+const STATUS_FIELDS = ["status", "error", "progress"];
+
 const DEFAULT_SETTINGS: JobSettings = {
   bpm: null,
   offset_sec: 0,
@@ -40,6 +45,7 @@ const DEFAULT_SETTINGS: JobSettings = {
 export default function JobPage() {
   const { jobId } = useParams<{ jobId: string }>();
   const [job, setJob] = useState<Job | null>(null);
+  const [progress, setProgress] = useState<number | null>(null);
   const [error, setError] = useState("");
   const [regionStart, setRegionStart] = useState<number | null>(null);
   const [regionEnd, setRegionEnd] = useState<number | null>(null);
@@ -70,33 +76,43 @@ export default function JobPage() {
   );
   const playheadRef = useRef<ReturnType<typeof setInterval> | null>(null);
 
-  // Poll job status
+  // Track job status: pushed over SSE, with polling as the fallback
   useEffect(() => {
     if (!jobId) return;
     let active = true;
+    let unsubscribe: (() => void) | null = null;
+
+    function applyJob(j: Job) {
+      setJob(j);
+      // Initialize settings from job response
+      if (j.status === "READY") {
+        const s = j.settings;
+        if (s) {
+          setSettings({
+            bpm: s.bpm ?? null,
+            offset_sec: s.offset_sec ?? 0,
+            time_signature: s.time_signature ?? "4/4",
+            key_signature: s.key_signature ?? null,
+          });
+          if (s.key_signature) {
+            setPreviewKey(s.key_signature);
+          }
+        }
+      }
+    }
 
     async function poll() {
       while (active) {
         try {
-          const j = await getJob(jobId!);
+          const j = await getJob(jobId!, STATUS_FIELDS);
           if (!active) break;
-          setJob(j);
-          // Initialize settings from job response
+          setProgress(j.progress ?? null);
           if (j.status === "READY") {
-            const s = (j as unknown as Record<string, unknown>).settings as JobSettings | null;
-            if (s) {
-              setSettings({
-                bpm: s.bpm ?? null,
-                offset_sec: s.offset_sec ?? 0,
-                time_signature: s.time_signature ?? "4/4",
-                key_signature: s.key_signature ?? null,
-              });
-              if (s.key_signature) {
-                setPreviewKey(s.key_signature);
-              }
-            }
+            applyJob(await getJob(jobId!, VIEW_FIELDS));
+            break;
           }
-          if (j.status === "READY" || j.status === "FAILED") break;
+          setJob((prev) => (prev ? { ...prev, status: j.status, error: j.error } : prev));
+          if (j.status === "FAILED") break;
         } catch (err) {
           if (!active) break;
           setError(err instanceof Error ? err.message : "Failed to load job");
@@ -106,9 +122,44 @@ export default function JobPage() {
       }
     }
 
-    poll();
+    async function track() {
+      try {
+        const j = await getJob(jobId!, VIEW_FIELDS);
+        if (!active) return;
+        applyJob(j);
+        if (j.status === "READY" || j.status === "FAILED") return;
+      } catch (err) {
+        if (active) setError(err instanceof Error ? err.message : "Failed to load job");
+        return;
+      }
+      if (typeof EventSource === "undefined") {
+        poll();
+        return;
+      }
+      unsubscribe = subscribeJobEvents(
+        jobId!,
+        (event) => {
+          if (!active) return;
+          setProgress(event.progress);
+          if (event.status === "READY") {
+            // The result and detected settings are loaded once, at the end.
+            getJob(jobId!, VIEW_FIELDS)
+              .then((j) => active && applyJob(j))
+              .catch((err) => active && setError(err instanceof Error ? err.message : "Failed to load job"));
+          } else {
+            setJob((prev) => (prev ? { ...prev, status: event.status, error: event.error } : prev));
+          }
+        },
+        () => {
+          if (active) poll();
+        }
+      );
+    }
+
+    track();
     return () => {
       active = false;
+      unsubscribe?.();
     };
   }, [jobId]);
 
@@ -202,7 +253,10 @@ export default function JobPage() {
   const isReady = job?.status === "READY";
   const statusLabel: Record<string, string> = {
     CREATED: "Queued",
+    SEPARATING: "Separating instrument...",
     TRANSCRIBING: "Transcribing...",
+    FETCHING_ARTIFACTS: "Preparing score...",
+    WAITING_UPSTREAM: "Transcription service unavailable, retrying shortly...",
     READY: "Ready",
     FAILED: "Failed",
   };
@@ -228,6 +282,14 @@ export default function JobPage() {
               <span className="inline-block h-3 w-3 rounded-full bg-ink/30 animate-pulse" />
             )}
           </div>
+          {progress != null && job.status !== "FAILED" && (
+            <div className="mt-3 h-1.5 w-full rounded-full bg-ink/10">
+              <div
+                className="h-1.5 rounded-full bg-ink/50 transition-all"
+                style={{ width: `${progress}%` }}
+              />
+            </div>
+          )}
           {job.error && (
             <p className="text-sm text-red-700 mt-2">{job.error}</p>
           )}
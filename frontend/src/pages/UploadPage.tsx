@@ -4,13 +4,16 @@ import PageShell from "../components/PageShell";
 import Panel from "../components/Panel";
 import Button from "../components/Button";
 import ErrorBox from "../components/ErrorBox";
-import { createJob } from "../api/jobs";
+import { createJob, newIdempotencyKey } from "../api/jobs";
 
 const INSTRUMENTS = ["bass", "piano", "guitar", "vocals", "drums"] as const;
 
 export default function UploadPage() {
   const navigate = useNavigate();
   const fileRef = useRef<HTMLInputElement>(null);
+  // One key per chosen file and instrument, so resubmitting after a failed
+  // request cannot create a second job.
+  const idempotencyKey = useRef<string | null>(null);
   const [instrument, setInstrument] = useState("bass");
   const [uploading, setUploading] = useState(false);
   const [error, setError] = useState("");
@@ -24,8 +27,9 @@ export default function UploadPage() {
     }
     setError("");
     setUploading(true);
+    idempotencyKey.current ??= newIdempotencyKey();
     try {
-      const job = await createJob(file, instrument || undefined);
+      const job = await createJob(file, instrument || undefined, idempotencyKey.current);
       navigate(`/jobs/${job.id}`);
     } catch (err) {
       setError(err instanceof Error ? err.message : "Upload failed");
@@ -54,6 +58,7 @@ export default function UploadPage() {
                 ref={fileRef}
                 type="file"
                 accept="audio/*"
+                onChange={() => (idempotencyKey.current = null)}
                 className="block w-full text-sm text-muted file:mr-3 file:px-3 file:py-1.5 file:rounded file:border file:border-border file:bg-transparent file:text-ink file:text-sm file:cursor-pointer"
               />
             </div>
@@ -61,7 +66,10 @@ export default function UploadPage() {
               <label className="block text-sm mb-1">Instrument</label>
               <select
                 value={instrument}
-                onChange={(e) => setInstrument(e.target.value)}
+                onChange={(e) => {
+                  idempotencyKey.current = null;
+                  setInstrument(e.target.value);
+                }}
                 className="w-full border border-border rounded px-3 py-2 text-sm bg-transparent text-ink cursor-pointer"
               >
                 {INSTRUMENTS.map((inst) => (